@@ -0,0 +1,8 @@
+# Define variables
+source .env
+db_root_directory='./data/dev/dev_databases' # UPDATE THIS WITH THE PATH TO THE PARENT DIRECTORY OF THE DATABASES
+socket_path="${INDEX_SERVER_SOCKET:-./data/index_server.sock}"
+
+# Run the Python script with the defined variables
+python3 -u ./src/index_server.py --db_root_directory "${db_root_directory}" \
+                                 --socket_path "${socket_path}"
@@ -0,0 +1,12 @@
+# Define variables
+source .env
+data_path='./data/dev/dev.json' # UPDATE THIS WITH THE PATH TO THE TARGET DATASET
+db_root_directory='./data/dev/dev_databases' # UPDATE THIS WITH THE PATH TO THE PARENT DIRECTORY OF THE DATABASES
+num_workers=4
+timeout=120
+
+# Run the Python script with the defined variables
+python3 -u ./src/precompute_gold.py --data_path "${data_path}" \
+                                    --db_root_directory "${db_root_directory}" \
+                                    --num_workers "${num_workers}" \
+                                    --timeout "${timeout}"
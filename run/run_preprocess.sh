@@ -6,6 +6,12 @@ verbose=true
 signature_size=100
 n_gram=3
 threshold=0.01
+num_workers=1
+parallel_mode="database" # Options: database (several databases at once) or column (the tables of one database in parallel)
+incremental=false # Set to true to only re-index the columns and description files that changed since the last run
+ngram_index=false # Set to true to also build the exact n-gram index used by retrieve_entity with value_index: ngram
+value_fts=true # Set to false to skip the FTS5 index of text values used to check the literals of SQL queries
+shadow_db_rows=1000 # Comma-separated rows per table of the shadow databases used for candidate triage, empty to skip
 
 # Run the Python script with the defined variables
 python3 -u ./src/preprocess.py --db_root_directory "${db_root_directory}" \
@@ -13,4 +19,10 @@ python3 -u ./src/preprocess.py --db_root_directory "${db_root_directory}" \
                               --n_gram "${n_gram}" \
                               --threshold "${threshold}" \
                               --db_id "${db_id}" \
-                              --verbose "${verbose}"
+                              --num_workers "${num_workers}" \
+                              --parallel_mode "${parallel_mode}" \
+                              --shadow_db_rows "${shadow_db_rows}" \
+                              --verbose "${verbose}" \
+                              $( [ "${incremental}" = true ] && echo --incremental ) \
+                              $( [ "${ngram_index}" = true ] && echo --ngram_index ) \
+                              $( [ "${value_fts}" = false ] && echo --skip_value_fts )
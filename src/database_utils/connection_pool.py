@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from queue import LifoQueue, Empty, Full
+from threading import Lock
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 8))
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 1 << 30))
+MEMORY_BUDGET_BYTES = int(os.getenv("SQLITE_MEMORY_BUDGET_MB", 0)) * (1 << 20)
+MEMORY_REPLICA_MAX_BYTES = int(os.getenv("SQLITE_MEMORY_REPLICA_MAX_MB", 512)) * (1 << 20)
+# Only for database files known to be frozen: immutable connections skip locking and ignore the WAL.
+IMMUTABLE = os.getenv("SQLITE_IMMUTABLE", "0") == "1"
+
+FileSignature = Tuple[int, int, int, int]
+
+def database_file_signature(db_path: Union[str, Path]) -> FileSignature:
+    """
+    Identifies the version of a database file by its size and modification time and those of its WAL.
+
+    Commits in WAL mode only touch the `-wal` file until a checkpoint, so the main file alone does
+    not reveal them.
+
+    Args:
+        db_path (Union[str, Path]): The path to the database file.
+
+    Returns:
+        FileSignature: The size and modification time of the file and of its WAL, zeros if there is no WAL.
+    """
+    stat = os.stat(db_path)
+    try:
+        wal_stat = os.stat(f"{db_path}-wal")
+        wal_signature = (wal_stat.st_size, wal_stat.st_mtime_ns)
+    except FileNotFoundError:
+        wal_signature = (0, 0)
+    return (stat.st_size, stat.st_mtime_ns, *wal_signature)
+
+class ConnectionPool:
+    """
+    A pool of read-only SQLite connections for a single database file.
+
+    Connections are opened with a read-only URI. With `immutable`, meant for database files that
+    never change during a run, SQLite also skips file locking and change detection. The pool watches
+    the size and modification time of the file and its WAL, and drops its idle connections when the
+    database changes on disk.
+
+    With `in_memory`, the database is copied once with the backup API into an in-memory replica
+    on SQLite's memdb VFS and every connection reads from RAM. Unlike a shared-cache database,
+    each connection keeps its own page cache and locks, so readers run concurrently. An anchor
+    connection keeps the replica alive for as long as the pool is open.
+
+    Attributes:
+        db_path (str): The path to the database file.
+        max_size (int): The maximum number of idle connections kept open.
+        in_memory (bool): Whether connections read from an in-memory replica.
+        immutable (bool): Whether connections are opened with `immutable=1`.
+        memory_bytes (int): The size of the in-memory replica, or 0.
+    """
+
+    def __init__(self, db_path: Union[str, Path], max_size: int = POOL_SIZE, in_memory: bool = False,
+                 immutable: bool = IMMUTABLE):
+        self.db_path = str(db_path)
+        self.max_size = max_size
+        self.in_memory = in_memory
+        self.immutable = immutable
+        self.memory_bytes = 0
+        self._idle: LifoQueue = LifoQueue(maxsize=max_size)
+        self._lock = Lock()
+        self._file_signature = self._get_file_signature()
+        self._anchor: Optional[sqlite3.Connection] = None
+        self._memory_uri: Optional[str] = None
+        if in_memory:
+            self._load_replica()
+
+    def _get_file_signature(self) -> FileSignature:
+        return database_file_signature(self.db_path)
+
+    def _file_uri(self) -> str:
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        return f"{uri}&immutable=1" if self.immutable else uri
+
+    def _load_replica(self) -> None:
+        """Copies the database file into a new in-memory database shared through the memdb VFS."""
+        size = self._file_signature[0]
+        # The name is unique per file version, so connections still reading an old replica are unaffected.
+        version = ":".join(map(str, self._file_signature))
+        name = hashlib.sha1(f"{os.path.realpath(self.db_path)}:{version}".encode("utf-8")).hexdigest()
+        # A name starting with "/" makes the memdb database visible to every connection of this process.
+        memory_uri = f"file:/replica_{name}?vfs=memdb"
+        anchor = sqlite3.connect(memory_uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(self._file_uri(), uri=True)
+        try:
+            source.backup(anchor)
+        finally:
+            source.close()
+        if self._anchor is not None:
+            self._anchor.close()
+        self._anchor = anchor
+        self._memory_uri = memory_uri
+        self.memory_bytes = size
+        logging.info(f"Loaded in-memory replica of {self.db_path} ({size / (1 << 20):.1f} MB)")
+
+    def _open(self) -> sqlite3.Connection:
+        """Opens a new tuned, read-only connection to the database."""
+        if self.in_memory:
+            conn = sqlite3.connect(self._memory_uri, uri=True, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            return conn
+        uri = self._file_uri()
+        conn = sqlite3.connect(uri, uri=True, timeout=60, check_same_thread=False)
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return conn
+
+    def _refresh_if_changed(self) -> None:
+        """Closes the idle connections if the database file changed since they were opened."""
+        signature = self._get_file_signature()
+        if signature == self._file_signature:
+            return
+        with self._lock:
+            if signature == self._file_signature:
+                return
+            logging.info(f"Database file changed, resetting connection pool: {self.db_path}")
+            self._file_signature = signature
+            self._close_idle()
+            if self.in_memory:
+                self._load_replica()
+
+    def _close_idle(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait()[1].close()
+            except Empty:
+                break
+
+    def acquire(self) -> Tuple[FileSignature, sqlite3.Connection]:
+        """
+        Takes an idle connection from the pool, opening a new one if none is available.
+
+        Returns:
+            Tuple[FileSignature, sqlite3.Connection]: The file signature the connection was opened against and the connection.
+        """
+        self._refresh_if_changed()
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return self._file_signature, self._open()
+
+    def release(self, entry: Tuple[FileSignature, sqlite3.Connection]) -> None:
+        """
+        Returns a connection to the pool, closing it if the pool is full or the file changed.
+
+        Args:
+            entry (Tuple[FileSignature, sqlite3.Connection]): The entry returned by `acquire`.
+        """
+        signature, conn = entry
+        if signature != self._file_signature or conn.in_transaction:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(entry)
+        except Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Context manager yielding a pooled connection and returning it afterwards."""
+        entry = self.acquire()
+        try:
+            yield entry[1]
+        finally:
+            self.release(entry)
+
+    def close(self) -> None:
+        """Closes all idle connections and releases the in-memory replica."""
+        with self._lock:
+            self._close_idle()
+            if self._anchor is not None:
+                self._anchor.close()
+                self._anchor = None
+                self.memory_bytes = 0
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_pid: Optional[int] = None
+_pools_lock = Lock()
+
+def _get_pools() -> Dict[str, ConnectionPool]:
+    """Returns this process's pools; pools inherited through fork hold connections the child must not use."""
+    global _pools, _pools_pid
+    if _pools_pid != os.getpid():
+        with _pools_lock:
+            if _pools_pid != os.getpid():
+                _pools = {}
+                _pools_pid = os.getpid()
+    return _pools
+
+def get_connection_pool(db_path: Union[str, Path]) -> ConnectionPool:
+    """
+    Returns the process-wide connection pool for a database, creating it on first use.
+
+    Args:
+        db_path (Union[str, Path]): The path to the database file.
+
+    Returns:
+        ConnectionPool: The connection pool for the database.
+    """
+    key = str(db_path)
+    pools = _get_pools()
+    pool = pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = pools.get(key)
+            if pool is None:
+                if not os.path.exists(key):
+                    raise FileNotFoundError(f"Database file does not exist: {key}")
+                pool = ConnectionPool(key)
+                pools[key] = pool
+    return pool
+
+def load_memory_replica(db_path: Union[str, Path]) -> bool:
+    """
+    Switches a database to an in-memory replica if it fits the size threshold and memory budget.
+
+    The replica is used by every subsequent `get_connection_pool` call in this process. Databases
+    that are too large, or would exceed SQLITE_MEMORY_BUDGET_MB, keep their file-backed pool.
+
+    Args:
+        db_path (Union[str, Path]): The path to the database file.
+
+    Returns:
+        bool: Whether the database is served from memory.
+    """
+    if MEMORY_BUDGET_BYTES <= 0:
+        return False
+    key = str(db_path)
+    pools = _get_pools()
+    with _pools_lock:
+        pool = pools.get(key)
+        if pool is not None and pool.in_memory:
+            return True
+        size = os.path.getsize(key)
+        in_use = sum(other.memory_bytes for other in pools.values())
+        if size > MEMORY_REPLICA_MAX_BYTES or in_use + size > MEMORY_BUDGET_BYTES:
+            logging.info(f"Serving {key} from disk: {size / (1 << 20):.1f} MB does not fit the in-memory replica limits")
+            return False
+        try:
+            pools[key] = ConnectionPool(key, in_memory=True)
+        except sqlite3.Error as e:
+            logging.error(f"Could not load an in-memory replica of {key}: {e}")
+            return False
+    if pool is not None:
+        pool.close()
+    return True
+
+def release_memory_replica(db_path: Union[str, Path]) -> None:
+    """
+    Frees the in-memory replica of a database; later connections are file-backed again.
+
+    Args:
+        db_path (Union[str, Path]): The path to the database file.
+    """
+    pools = _get_pools()
+    with _pools_lock:
+        pool = pools.get(str(db_path))
+        if pool is None or not pool.in_memory:
+            return
+        del pools[str(db_path)]
+    pool.close()
+
+def close_all_pools() -> None:
+    """Closes the idle connections of every pool in this process."""
+    pools = _get_pools()
+    with _pools_lock:
+        for pool in pools.values():
+            pool.close()
+        pools.clear()
@@ -0,0 +1,89 @@
+import json
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from database_utils.db_info import get_db_schema
+from database_utils.db_values.signatures import load_array, save_array
+from database_utils.db_catalog.preprocess import EMBEDDING_FUNCTION, EMBEDDING_MODEL, EMBEDDING_MODEL_ID
+
+class ColumnEmbeddings(NamedTuple):
+    """The embeddings of a database's `table`.`column` strings, one row per column."""
+    columns: List[Tuple[str, str]]
+    embeddings: np.ndarray
+
+    def rows(self) -> Dict[Tuple[str, str], int]:
+        """Returns the row of each (table, column)."""
+        return {column: row for row, column in enumerate(self.columns)}
+
+def column_string(table_name: str, column_name: str) -> str:
+    """Returns the string a column name is embedded as."""
+    return f"`{table_name}`.`{column_name}`"
+
+def _paths(db_directory_path: str) -> Tuple[Path, Path]:
+    db_id = Path(db_directory_path).name
+    preprocessed_path = Path(db_directory_path) / "preprocessed"
+    return preprocessed_path / f"{db_id}_column_embeddings.npy", preprocessed_path / f"{db_id}_column_embeddings.json"
+
+def _is_current_model(model: str) -> bool:
+    # Files saved before models were identified with their provider record the bare model name.
+    return model in (EMBEDDING_MODEL_ID, EMBEDDING_MODEL)
+
+def load_db_column_embeddings(db_directory_path: str) -> ColumnEmbeddings:
+    """
+    Memory-maps the column-name embeddings of a database.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+
+    Returns:
+        ColumnEmbeddings: The embedded columns and their (num_columns, dimension) embedding matrix.
+
+    Raises:
+        ValueError: If the embeddings were computed with another embedding model.
+    """
+    embeddings_path, columns_path = _paths(db_directory_path)
+    with open(columns_path, "r") as file:
+        metadata = json.load(file)
+    if not _is_current_model(metadata["model"]):
+        raise ValueError(f"The column embeddings of {Path(db_directory_path).name} were computed with {metadata['model']}, not {EMBEDDING_MODEL_ID}")
+    return ColumnEmbeddings([tuple(column) for column in metadata["columns"]], load_array(embeddings_path))
+
+def make_db_column_embeddings(db_directory_path: str) -> None:
+    """
+    Embeds the `table`.`column` string of every column of the database and saves the embedding matrix.
+
+    The embeddings of columns already saved with the same embedding model are reused, so only new
+    columns are embedded when the preprocessing is rerun.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+    """
+    db_id = Path(db_directory_path).name
+    embeddings_path, columns_path = _paths(db_directory_path)
+    schema = get_db_schema(str(Path(db_directory_path) / f"{db_id}.sqlite"))
+    columns = [(table_name, column_name) for table_name, column_names in schema.items() for column_name in column_names]
+
+    previous: Dict[Tuple[str, str], np.ndarray] = {}
+    if columns_path.exists():
+        try:
+            saved = load_db_column_embeddings(db_directory_path)
+            previous = {column: saved.embeddings[row] for column, row in saved.rows().items()}
+        except (ValueError, OSError) as e:
+            logging.info(f"Recomputing the column embeddings of {db_id}: {e}")
+    missing = [column for column in columns if column not in previous]
+    if missing:
+        embedded = EMBEDDING_FUNCTION.embed_documents([column_string(*column) for column in missing])
+        previous.update(zip(missing, (np.asarray(embedding, dtype=np.float32) for embedding in embedded)))
+    elif set(previous) == set(columns):
+        logging.info(f"Column embeddings of {db_id} are up to date")
+        return
+
+    embeddings_path.parent.mkdir(exist_ok=True)
+    columns_path.unlink(missing_ok=True)
+    save_array(embeddings_path, np.array([previous[column] for column in columns], dtype=np.float32))
+    # Written last, so its presence marks a complete set of files.
+    with open(columns_path, "w") as file:
+        json.dump({"model": EMBEDDING_MODEL_ID, "columns": columns}, file)
+    logging.info(f"Column embeddings of {db_id}: {len(missing)} of {len(columns)} columns embedded")
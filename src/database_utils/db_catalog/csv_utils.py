@@ -1,7 +1,48 @@
 import pandas as pd
 from pathlib import Path
 import logging
-from typing import Dict
+from typing import Dict, Optional
+
+def load_table_description(csv_file: Path, use_value_description: bool) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Loads the column descriptions of one table from its CSV file.
+
+    Args:
+        csv_file (Path): The path to the table's description CSV file.
+        use_value_description (bool): Whether to include value descriptions.
+
+    Returns:
+        Optional[Dict[str, Dict[str, str]]]: The descriptions keyed by lower-cased column name, or None if the file could not be read.
+    """
+    encoding_types = ['utf-8-sig', 'cp1252']
+    for encoding_type in encoding_types:
+        try:
+            column_descriptions = {}
+            table_description_df = pd.read_csv(csv_file, index_col=False, encoding=encoding_type)
+            for _, row in table_description_df.iterrows():
+                column_name = row['original_column_name']
+                expanded_column_name = row.get('column_name', '').strip() if pd.notna(row.get('column_name', '')) else ""
+                column_description = row.get('column_description', '').replace('\n', ' ').replace("commonsense evidence:", "").strip() if pd.notna(row.get('column_description', '')) else ""
+                data_format = row.get('data_format', '').strip() if pd.notna(row.get('data_format', '')) else ""
+                value_description = ""
+                if use_value_description and pd.notna(row.get('value_description', '')):
+                    value_description = row['value_description'].replace('\n', ' ').replace("commonsense evidence:", "").strip()
+                    if value_description.lower().startswith("not useful"):
+                        value_description = value_description[10:].strip()
+                
+                column_descriptions[column_name.lower().strip()] = {
+                    "original_column_name": column_name,
+                    "column_name": expanded_column_name,
+                    "column_description": column_description,
+                    "data_format": data_format,
+                    "value_description": value_description
+                }
+            logging.info(f"Loaded descriptions from {csv_file} with encoding {encoding_type}")
+            return column_descriptions
+        except Exception:
+            continue
+    logging.warning(f"Could not read descriptions from {csv_file}")
+    return None
 
 def load_tables_description(db_directory_path: str, use_value_description: bool) -> Dict[str, Dict[str, Dict[str, str]]]:
     """
@@ -14,7 +55,6 @@ def load_tables_description(db_directory_path: str, use_value_description: bool)
     Returns:
         Dict[str, Dict[str, Dict[str, str]]]: A dictionary containing table descriptions.
     """
-    encoding_types = ['utf-8-sig', 'cp1252']
     description_path = Path(db_directory_path) / "database_description"
     
     if not description_path.exists():
@@ -24,36 +64,7 @@ def load_tables_description(db_directory_path: str, use_value_description: bool)
     table_description = {}
     for csv_file in description_path.glob("*.csv"):
         table_name = csv_file.stem.lower().strip()
-        table_description[table_name] = {}
-        could_read = False
-        for encoding_type in encoding_types:
-            try:
-                table_description_df = pd.read_csv(csv_file, index_col=False, encoding=encoding_type)
-                for _, row in table_description_df.iterrows():
-                    column_name = row['original_column_name']
-                    expanded_column_name = row.get('column_name', '').strip() if pd.notna(row.get('column_name', '')) else ""
-                    column_description = row.get('column_description', '').replace('\n', ' ').replace("commonsense evidence:", "").strip() if pd.notna(row.get('column_description', '')) else ""
-                    data_format = row.get('data_format', '').strip() if pd.notna(row.get('data_format', '')) else ""
-                    value_description = ""
-                    if use_value_description and pd.notna(row.get('value_description', '')):
-                        value_description = row['value_description'].replace('\n', ' ').replace("commonsense evidence:", "").strip()
-                        if value_description.lower().startswith("not useful"):
-                            value_description = value_description[10:].strip()
-                    
-                    table_description[table_name][column_name.lower().strip()] = {
-                        "original_column_name": column_name,
-                        "column_name": expanded_column_name,
-                        "column_description": column_description,
-                        "data_format": data_format,
-                        "value_description": value_description
-                    }
-                logging.info(f"Loaded descriptions from {csv_file} with encoding {encoding_type}")
-                could_read = True
-                break
-            except Exception:
-                continue
-    if not could_read:
-        logging.warning(f"Could not read descriptions from {csv_file}")
+        table_description[table_name] = load_table_description(csv_file, use_value_description) or {}
     return table_description
 
 def load_tables_concatenated_description(db_directory_path: str, use_value_description: bool) -> Dict[str, Dict[str, str]]:
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 import logging
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
 from langchain.schema.document import Document
@@ -10,7 +11,9 @@ from google.oauth2 import service_account
 from google.cloud import aiplatform
 import vertexai
 
-from database_utils.db_catalog.csv_utils import load_tables_description
+from llm.embeddings import embedding_model_id, get_embedding_client
+from database_utils.db_catalog.csv_utils import load_table_description
+from database_utils.index_manifest import load_manifest, save_manifest_section, fingerprint_file
 
 load_dotenv(override=True)
 
@@ -28,9 +31,46 @@ if GCP_CREDENTIALS and GCP_PROJECT and GCP_REGION:
 
 
 # EMBEDDING_FUNCTION = VertexAIEmbeddings(model_name="text-embedding-004")#OpenAIEmbeddings(model="text-embedding-3-large")
-EMBEDDING_FUNCTION = VertexAIEmbeddings(model_name="text-embedding-004")
+EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_PROVIDER = "vertexai"
+EMBEDDING_MODEL_ID = embedding_model_id(EMBEDDING_MODEL, EMBEDDING_PROVIDER)
+EMBEDDING_FUNCTION = get_embedding_client(model=EMBEDDING_MODEL, provider=EMBEDDING_PROVIDER)
 
 
+def _table_documents(table_name: str, columns: Dict[str, Dict[str, str]], use_value_description: bool) -> Tuple[List[Document], List[str]]:
+    """
+    Creates the documents of a table's column descriptions.
+
+    Args:
+        table_name (str): The name of the table.
+        columns (Dict[str, Dict[str, str]]): The descriptions of the table's columns.
+        use_value_description (bool): Whether to include value descriptions.
+
+    Returns:
+        Tuple[List[Document], List[str]]: The documents and their ids, stable across rebuilds.
+    """
+    docs = []
+    ids = []
+    for column_name, column_info in columns.items():
+        metadata = {
+            "table_name": table_name,
+            "original_column_name": column_name,
+            "column_name": column_info.get('column_name', ''),
+            "column_description": column_info.get('column_description', ''),
+            "value_description": column_info.get('value_description', '') if use_value_description else ""
+        }
+        for key in ['column_name', 'column_description', 'value_description']:
+            if column_info.get(key, '').strip():
+                docs.append(Document(page_content=column_info[key], metadata=metadata))
+                ids.append(f"{table_name}/{column_name}/{key}")
+    return docs, ids
+
+def _description_files(db_directory_path: str) -> Dict[str, Path]:
+    description_path = Path(db_directory_path) / "database_description"
+    if not description_path.exists():
+        return {}
+    return {csv_file.name: csv_file for csv_file in sorted(description_path.glob("*.csv"))}
+
 def make_db_context_vec_db(db_directory_path: str, **kwargs) -> None:
     """
     Creates a context vector database for the specified database directory.
@@ -41,22 +81,17 @@ def make_db_context_vec_db(db_directory_path: str, **kwargs) -> None:
             - use_value_description (bool): Whether to include value descriptions (default is True).
     """
     db_id = Path(db_directory_path).name
+    use_value_description = kwargs.get("use_value_description", True)
 
-    table_description = load_tables_description(db_directory_path, kwargs.get("use_value_description", True))
     docs = []
-    
-    for table_name, columns in table_description.items():
-        for column_name, column_info in columns.items():
-            metadata = {
-                "table_name": table_name,
-                "original_column_name": column_name,
-                "column_name": column_info.get('column_name', ''),
-                "column_description": column_info.get('column_description', ''),
-                "value_description": column_info.get('value_description', '') if kwargs.get("use_value_description", True) else ""
-            }
-            for key in ['column_name', 'column_description', 'value_description']:
-                if column_info.get(key, '').strip():
-                    docs.append(Document(page_content=column_info[key], metadata=metadata))
+    ids = []
+    files = {}
+    for file_name, csv_file in _description_files(db_directory_path).items():
+        table_name = csv_file.stem.lower().strip()
+        table_docs, table_ids = _table_documents(table_name, load_table_description(csv_file, use_value_description) or {}, use_value_description)
+        docs += table_docs
+        ids += table_ids
+        files[file_name] = {"fingerprint": fingerprint_file(csv_file), "ids": table_ids}
     
     logging.info(f"Creating context vector database for {db_id}")
     vector_db_path = Path(db_directory_path) / "context_vector_db"
@@ -66,6 +101,60 @@ def make_db_context_vec_db(db_directory_path: str, **kwargs) -> None:
 
     vector_db_path.mkdir(exist_ok=True)
 
-    Chroma.from_documents(docs, EMBEDDING_FUNCTION, persist_directory=str(vector_db_path))
+    Chroma.from_documents(docs, EMBEDDING_FUNCTION, ids=ids, persist_directory=str(vector_db_path))
+    save_manifest_section(db_directory_path, "context_vector_db", {"use_value_description": use_value_description, "files": files})
 
     logging.info(f"Context vector database created at {vector_db_path}")
+
+def update_db_context_vec_db(db_directory_path: str, **kwargs) -> None:
+    """
+    Updates the context vector database to the current description CSV files, rebuilding it only if needed.
+
+    Each description file is fingerprinted and compared with the index manifest; only the documents
+    of changed files are deleted and re-embedded, and the documents of removed files are deleted.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+        **kwargs: Additional keyword arguments, including:
+            - use_value_description (bool): Whether to include value descriptions (default is True).
+    """
+    db_id = Path(db_directory_path).name
+    use_value_description = kwargs.get("use_value_description", True)
+    vector_db_path = Path(db_directory_path) / "context_vector_db"
+    previous = load_manifest(db_directory_path).get("context_vector_db")
+    if previous is None or previous["use_value_description"] != use_value_description or not vector_db_path.exists():
+        logging.info(f"No up-to-date context vector database manifest for {db_id}, rebuilding it")
+        make_db_context_vec_db(db_directory_path, **kwargs)
+        return
+
+    files = {}
+    stale_ids = []
+    docs = []
+    ids = []
+    for file_name, csv_file in _description_files(db_directory_path).items():
+        fingerprint = fingerprint_file(csv_file)
+        previous_file = previous["files"].get(file_name)
+        if previous_file is not None and previous_file["fingerprint"] == fingerprint:
+            files[file_name] = previous_file
+            continue
+        if previous_file is not None:
+            stale_ids += previous_file["ids"]
+        table_name = csv_file.stem.lower().strip()
+        table_docs, table_ids = _table_documents(table_name, load_table_description(csv_file, use_value_description) or {}, use_value_description)
+        docs += table_docs
+        ids += table_ids
+        files[file_name] = {"fingerprint": fingerprint, "ids": table_ids}
+    for file_name, previous_file in previous["files"].items():
+        if file_name not in files:
+            stale_ids += previous_file["ids"]
+    if not stale_ids and not docs:
+        logging.info(f"Context vector database of {db_id} is up to date")
+        return
+
+    vector_db = Chroma(persist_directory=str(vector_db_path), embedding_function=EMBEDDING_FUNCTION)
+    if stale_ids:
+        vector_db.delete(ids=stale_ids)
+    if docs:
+        vector_db.add_documents(docs, ids=ids)
+    save_manifest_section(db_directory_path, "context_vector_db", {"use_value_description": use_value_description, "files": files})
+    logging.info(f"Context vector database of {db_id} updated: {len(stale_ids)} documents deleted and {len(docs)} embedded")
@@ -0,0 +1,82 @@
+import numpy as np
+from functools import lru_cache
+from datasketch import MinHash
+from datasketch.hashfunc import sha1_hash32
+from typing import Dict, List, Sequence
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+MAX_BATCH_SHINGLES = 1 << 15
+
+class BatchMinHasher:
+    """
+    Computes the MinHash signatures of many strings at once.
+
+    The signatures are identical to those of a `datasketch.MinHash` with the same `num_perm` and
+    seed updated with every UTF-8 encoded n-gram of the string. Shingles shared by several strings
+    of a batch are hashed once, the permutations of all shingles are applied as one matrix
+    operation, and the minimum over each string's shingles is taken with `np.minimum.reduceat`.
+
+    Attributes:
+        signature_size (int): The size of the MinHash signatures.
+        n_gram (int): The length of the shingles.
+        permutations (np.ndarray): The (a, b) parameters of the permutations, shared with `MinHash`.
+    """
+
+    def __init__(self, signature_size: int, n_gram: int, seed: int = 1):
+        self.signature_size = signature_size
+        self.n_gram = n_gram
+        self.permutations = MinHash(num_perm=signature_size, seed=seed).permutations
+
+    def _shingles(self, string: str) -> List[str]:
+        return [string[i:i + self.n_gram] for i in range(len(string) - self.n_gram + 1)]
+
+    def hashvalues(self, strings: Sequence[str]) -> np.ndarray:
+        """
+        Computes the signatures of the strings.
+
+        Args:
+            strings (Sequence[str]): The strings to hash.
+
+        Returns:
+            np.ndarray: The (len(strings), signature_size) uint64 signature matrix.
+        """
+        signatures = np.full((len(strings), self.signature_size), MAX_HASH, dtype=np.uint64)
+        start = 0
+        while start < len(strings):
+            shingle_index: Dict[str, int] = {}
+            shingle_ids: List[int] = []
+            counts: List[int] = []
+            end = start
+            while end < len(strings) and (end == start or len(shingle_ids) < MAX_BATCH_SHINGLES):
+                shingles = self._shingles(strings[end])
+                counts.append(len(shingles))
+                for shingle in shingles:
+                    shingle_ids.append(shingle_index.setdefault(shingle, len(shingle_index)))
+                end += 1
+            if shingle_ids:
+                signatures[start:end] = self._min_permuted(shingle_index, shingle_ids, counts)
+            start = end
+        return signatures
+
+    def _min_permuted(self, shingle_index: Dict[str, int], shingle_ids: List[int], counts: List[int]) -> np.ndarray:
+        """Computes the signatures of one batch from the ids of each string's shingles, in order."""
+        a, b = self.permutations
+        hashes = np.fromiter((sha1_hash32(shingle.encode('utf8')) for shingle in shingle_index), dtype=np.uint64, count=len(shingle_index))
+        # The same wrapping uint64 arithmetic as `MinHash.update`.
+        permuted = np.bitwise_and((hashes[:, None] * a[None, :] + b[None, :]) % MERSENNE_PRIME, MAX_HASH)
+        counts = np.array(counts, dtype=np.int64)
+        signatures = np.full((len(counts), self.signature_size), MAX_HASH, dtype=np.uint64)
+        non_empty = counts > 0
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        signatures[non_empty] = np.minimum.reduceat(permuted[np.array(shingle_ids)], offsets[non_empty], axis=0)
+        return signatures
+
+    def minhash(self, hashvalues: np.ndarray) -> MinHash:
+        """Wraps a signature in a `MinHash` without recomputing the permutations."""
+        return MinHash(num_perm=self.signature_size, hashvalues=hashvalues, permutations=self.permutations)
+
+@lru_cache(maxsize=None)
+def get_batch_minhasher(signature_size: int, n_gram: int) -> BatchMinHasher:
+    """Returns the shared hasher of a signature size and n-gram length."""
+    return BatchMinHasher(signature_size, n_gram)
@@ -0,0 +1,291 @@
+import json
+import hashlib
+import logging
+import numpy as np
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from database_utils.db_values.signatures import MinHashSignatures, load_array, save_array, value_index_path
+
+def _gram_key(gram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(gram.encode("utf8"), digest_size=8).digest(), "little")
+
+def _grams(string: str, n_gram: int) -> List[str]:
+    return list(dict.fromkeys(string[i:i + n_gram] for i in range(len(string) - n_gram + 1)))
+
+def encode_varints(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encodes non-negative integers as LEB128 varints, 7 bits per byte with a continuation bit.
+
+    Args:
+        values (np.ndarray): The integers to encode.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The encoded uint8 bytes and the number of bytes of each value.
+    """
+    values = values.astype(np.uint64)
+    num_bytes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        num_bytes += values >= np.uint64(1 << shift)
+    starts = np.cumsum(num_bytes) - num_bytes
+    encoded = np.zeros(int(num_bytes.sum()), dtype=np.uint8)
+    for position in range(int(num_bytes.max(initial=0))):
+        mask = num_bytes > position
+        byte = (values[mask] >> np.uint64(7 * position)) & np.uint64(0x7F)
+        byte |= np.where(num_bytes[mask] > position + 1, np.uint64(0x80), np.uint64(0))
+        encoded[starts[mask] + position] = byte
+    return encoded, num_bytes
+
+def decode_varints(encoded: np.ndarray) -> np.ndarray:
+    """
+    Decodes the varints written by `encode_varints`.
+
+    Args:
+        encoded (np.ndarray): The encoded uint8 bytes.
+
+    Returns:
+        np.ndarray: The decoded integers.
+    """
+    encoded = np.asarray(encoded)
+    if len(encoded) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero((encoded & 0x80) == 0)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    positions = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    # The 7-bit groups of a value occupy disjoint bits, so summing them assembles the value.
+    return np.add.reduceat((encoded & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64), starts)
+
+class NgramIndex:
+    """
+    An inverted index from the n-grams of a database's values to the values containing them.
+
+    The values are the rows of the database's `MinHashSignatures`, and the n-grams are the shingles
+    the MinHashes are computed from, so the index answers the same question as the LSH exactly:
+    the values with the highest Jaccard similarity between their n-gram set and the keyword's.
+    Every n-gram is identified by a 64-bit hash, kept in a sorted array, and its posting list of
+    rows is delta-encoded as varints in one byte array. All arrays are memory-mapped on load.
+
+    Attributes:
+        signatures (MinHashSignatures): The values the rows refer to.
+        n_gram (int): The length of the n-grams.
+        gram_keys (np.ndarray): The sorted uint64 hashes of the n-grams.
+        posting_offsets (np.ndarray): The start of each n-gram's posting list in `postings`, followed by the total length.
+        postings (np.ndarray): The delta- and varint-encoded posting lists.
+        gram_counts (np.ndarray): The number of distinct n-grams of each row.
+    """
+
+    def __init__(self, signatures: MinHashSignatures, n_gram: int, gram_keys: np.ndarray, posting_offsets: np.ndarray,
+                 postings: np.ndarray, gram_counts: np.ndarray):
+        self.signatures = signatures
+        self.n_gram = n_gram
+        self.gram_keys = gram_keys
+        self.posting_offsets = posting_offsets
+        self.postings = postings
+        self.gram_counts = gram_counts
+
+    @classmethod
+    def build(cls, signatures: MinHashSignatures, n_gram: int) -> "NgramIndex":
+        """
+        Indexes the live rows of the signatures.
+
+        The (n-gram, row) pairs of each column are collected in compact uint64 arrays and
+        concatenated, so building takes 16 bytes per pair rather than two Python integers.
+
+        Args:
+            signatures (MinHashSignatures): The values to index.
+            n_gram (int): The length of the n-grams.
+
+        Returns:
+            NgramIndex: The index.
+        """
+        gram_keys_of: Dict[str, int] = {}
+        gram_counts = np.zeros(len(signatures), dtype=np.int32)
+        live_rows = signatures.live_rows()
+        live_column_ids = np.asarray(signatures.column_ids)[live_rows]
+        column_keys: List[np.ndarray] = [np.zeros(0, dtype=np.uint64)]
+        column_rows: List[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+        for column_id in np.unique(live_column_ids).tolist():
+            rows = live_rows[live_column_ids == column_id]
+            keys = array("Q")
+            for row in rows.tolist():
+                grams = _grams(signatures.entry(row)[2], n_gram)
+                gram_counts[row] = len(grams)
+                keys.extend(gram_keys_of[gram] if gram in gram_keys_of else gram_keys_of.setdefault(gram, _gram_key(gram)) for gram in grams)
+            column_keys.append(np.frombuffer(keys, dtype=np.uint64))
+            column_rows.append(np.repeat(rows.astype(np.int64), gram_counts[rows]))
+        pair_keys = np.concatenate(column_keys)
+        pair_rows = np.concatenate(column_rows)
+        del column_keys, column_rows, gram_keys_of
+        order = np.lexsort((pair_rows, pair_keys))
+        pair_keys, pair_rows = pair_keys[order], pair_rows[order]
+
+        gram_keys, first_pairs = np.unique(pair_keys, return_index=True)
+        is_first = np.zeros(len(pair_rows), dtype=bool)
+        is_first[first_pairs] = True
+        deltas = np.where(is_first, pair_rows, pair_rows - np.concatenate(([0], pair_rows[:-1])))
+        postings, num_bytes = encode_varints(deltas)
+        byte_ends = np.cumsum(num_bytes)
+        posting_offsets = np.concatenate(([0], byte_ends[np.concatenate((first_pairs[1:], [len(pair_rows)])) - 1])) if len(pair_rows) else np.zeros(1, dtype=np.int64)
+        return cls(signatures, n_gram, gram_keys, posting_offsets.astype(np.int64), postings, gram_counts)
+
+    def _rows(self, gram: str) -> np.ndarray:
+        key = np.uint64(_gram_key(gram))
+        position = np.searchsorted(self.gram_keys, key)
+        if position == len(self.gram_keys) or self.gram_keys[position] != key:
+            return np.zeros(0, dtype=np.int64)
+        start, end = self.posting_offsets[position], self.posting_offsets[position + 1]
+        return np.cumsum(decode_varints(self.postings[start:end])).astype(np.int64)
+
+    def query(self, keyword: str, top_n: int = 10) -> List[Tuple[int, float]]:
+        """
+        Finds the rows whose n-gram sets are most similar to the keyword's.
+
+        Args:
+            keyword (str): The keyword to search for.
+            top_n (int): The number of rows to return.
+
+        Returns:
+            List[Tuple[int, float]]: The rows and their Jaccard similarity, most similar first and ties by row.
+        """
+        grams = _grams(keyword, self.n_gram)
+        if not grams or top_n <= 0:
+            return []
+        rows, overlaps = np.unique(np.concatenate([self._rows(gram) for gram in grams]), return_counts=True)
+        if len(rows) == 0:
+            return []
+        similarities = overlaps / (len(grams) + self.gram_counts[rows] - overlaps)
+        if len(rows) > top_n:
+            selected = np.argpartition(-similarities, top_n - 1)[:top_n]
+            # Rows tied with the last selected one are kept, so that ties are broken by row.
+            cutoff = similarities[selected].min()
+            selected = np.flatnonzero(similarities >= cutoff)
+            rows, similarities = rows[selected], similarities[selected]
+        order = np.lexsort((rows, -similarities))[:top_n]
+        return list(zip(rows[order].tolist(), similarities[order].tolist()))
+
+    @staticmethod
+    def _paths(preprocessed_path: Path, db_id: str) -> Dict[str, Path]:
+        return {
+            name: preprocessed_path / f"{db_id}_ngram_{name}.npy"
+            for name in ("keys", "posting_offsets", "postings", "gram_counts")
+        }
+
+    @staticmethod
+    def exists(preprocessed_path: Path, db_id: str) -> bool:
+        return (preprocessed_path / f"{db_id}_ngram_index.json").exists()
+
+    @staticmethod
+    def saved_settings(preprocessed_path: Path, db_id: str) -> Optional[Dict[str, int]]:
+        """Returns the n-gram size and number of rows of the saved index, or None if there is none."""
+        if not NgramIndex.exists(preprocessed_path, db_id):
+            return None
+        with open(preprocessed_path / f"{db_id}_ngram_index.json", "r") as file:
+            return json.load(file)
+
+    def save(self, preprocessed_path: Path, db_id: str) -> None:
+        """
+        Saves the index next to the signatures it refers to.
+
+        Args:
+            preprocessed_path (Path): The preprocessed directory of the database.
+            db_id (str): The database identifier.
+        """
+        paths = self._paths(preprocessed_path, db_id)
+        (preprocessed_path / f"{db_id}_ngram_index.json").unlink(missing_ok=True)
+        save_array(paths["keys"], self.gram_keys)
+        save_array(paths["posting_offsets"], self.posting_offsets)
+        save_array(paths["postings"], self.postings)
+        save_array(paths["gram_counts"], self.gram_counts)
+        # Written last, so its presence marks a complete set of files.
+        with open(preprocessed_path / f"{db_id}_ngram_index.json", "w") as file:
+            json.dump({"n_gram": self.n_gram, "num_rows": len(self.signatures)}, file)
+
+    @classmethod
+    def load(cls, preprocessed_path: Path, db_id: str) -> "NgramIndex":
+        """
+        Memory-maps the index saved by `save` and the signatures it refers to.
+
+        Args:
+            preprocessed_path (Path): The preprocessed directory of the database.
+            db_id (str): The database identifier.
+
+        Returns:
+            NgramIndex: The index.
+
+        Raises:
+            ValueError: If the signatures changed since the index was built.
+        """
+        with open(preprocessed_path / f"{db_id}_ngram_index.json", "r") as file:
+            metadata = json.load(file)
+        signatures = MinHashSignatures.load(preprocessed_path, db_id)
+        if len(signatures) != metadata["num_rows"]:
+            raise ValueError(f"The n-gram index of {db_id} is outdated, rerun the preprocessing")
+        paths = cls._paths(preprocessed_path, db_id)
+        return cls(
+            signatures=signatures,
+            n_gram=metadata["n_gram"],
+            gram_keys=load_array(paths["keys"]),
+            posting_offsets=load_array(paths["posting_offsets"]),
+            postings=load_array(paths["postings"]),
+            gram_counts=load_array(paths["gram_counts"]),
+        )
+
+def make_db_ngram_index(db_directory_path: str, n_gram: int) -> None:
+    """
+    Builds the n-gram index of a database from the values of its preprocessed signatures.
+
+    Nothing is done if the current signatures already have an index of the same n-gram size, which
+    saving the LSH keeps up to date.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+        n_gram (int): The length of the n-grams.
+    """
+    db_id = Path(db_directory_path).name
+    preprocessed_path = value_index_path(db_directory_path)
+    signatures = MinHashSignatures.load(preprocessed_path, db_id)
+    if NgramIndex.saved_settings(preprocessed_path, db_id) == {"n_gram": n_gram, "num_rows": len(signatures)}:
+        logging.info(f"N-gram index for {db_id} is up to date")
+        return
+    index = NgramIndex.build(signatures, n_gram)
+    index.save(preprocessed_path, db_id)
+    logging.info(f"N-gram index for {db_id}: {len(index.gram_keys)} n-grams, {len(index.postings)} bytes of postings")
+
+def load_db_ngram_index(db_directory_path: str) -> NgramIndex:
+    """
+    Loads the n-gram index of a database.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+
+    Returns:
+        NgramIndex: The index.
+    """
+    db_id = Path(db_directory_path).name
+    try:
+        return NgramIndex.load(value_index_path(db_directory_path), db_id)
+    except Exception as e:
+        logging.error(f"Error loading the n-gram index for {db_id}: {e}")
+        raise e
+
+def query_ngram_index_many(index: NgramIndex, keywords: List[str], top_n: int = 10) -> List[Dict[str, Dict[str, List[str]]]]:
+    """
+    Queries the n-gram index for the values most similar to each of the given keywords.
+
+    Args:
+        index (NgramIndex): The n-gram index.
+        keywords (List[str]): The keywords to search for.
+        top_n (int, optional): The number of top results to return per keyword.
+
+    Returns:
+        List[Dict[str, Dict[str, List[str]]]]: For each keyword, a dictionary containing its top similar values.
+    """
+    results: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+    for keyword in dict.fromkeys(keywords):
+        similar_values: Dict[str, Dict[str, List[str]]] = {}
+        for row, _ in index.query(keyword, top_n):
+            table_name, column_name, value = index.signatures.entry(row)
+            similar_values.setdefault(table_name, {}).setdefault(column_name, []).append(value)
+        results[keyword] = similar_values
+    return [results[keyword] for keyword in keywords]
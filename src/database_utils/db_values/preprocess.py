@@ -1,93 +1,177 @@
+import os
+import sys
+import shutil
+import time
 import pickle
-from datasketch import MinHash, MinHashLSH
+import sqlite3
+import multiprocessing
+import numpy as np
+from datasketch import MinHashLSH
 from pathlib import Path
 from tqdm import tqdm
 import logging
-from typing import Dict, List, Any, Tuple
+from typing import Dict, Iterable, Iterator, List, Any, NamedTuple, Optional, Tuple
 
-from database_utils.execution import execute_sql
+from database_utils.execution import execute_sql, FETCH_BATCH_SIZE
+from database_utils.connection_pool import get_connection_pool
+from database_utils.db_values.signatures import MinHashSignatures, SignatureBuilder, value_index_path
+from database_utils.db_values.ngram_index import NgramIndex
+from database_utils.db_values.batch_minhash import get_batch_minhasher
+from database_utils.index_manifest import load_manifest, save_manifest_section, fingerprint_values
+from database_utils.db_values.search import load_db_lsh
 
-def _get_unique_values(db_path: str) -> Dict[str, Dict[str, List[str]]]:
+COLUMN_VALUES_MAX_BYTES = int(os.getenv("LSH_COLUMN_VALUES_MAX_MB", 256)) * (1 << 20)
+SET_ENTRY_BYTES = 16
+
+class ColumnShard(NamedTuple):
+    """The distinct values of one indexed column and their (len(values), signature_size) signature matrix."""
+    table_name: str
+    column_name: str
+    values: List[str]
+    hashvalues: np.ndarray
+
+def _get_text_columns(db_path: str) -> Dict[str, List[str]]:
     """
-    Retrieves unique text values from the database excluding primary keys.
+    Lists the text columns whose values are indexed, excluding primary keys and identifier-like columns.
 
     Args:
         db_path (str): The path to the SQLite database file.
 
     Returns:
-        Dict[str, Dict[str, List[str]]]: A dictionary containing unique values for each table and column.
+        Dict[str, List[str]]: The columns of every table in schema order, keyed by table name.
     """
     table_names = [table[0] for table in execute_sql(db_path, "SELECT name FROM sqlite_master WHERE type='table';", fetch="all")]
-    primary_keys = []
+    table_columns = {table_name: execute_sql(db_path, f"PRAGMA table_info('{table_name}')", fetch="all") for table_name in table_names}
+    primary_keys = {column[1].lower() for columns in table_columns.values() for column in columns if column[5] > 0}
 
-    for table_name in table_names:
-        columns = execute_sql(db_path, f"PRAGMA table_info('{table_name}')", fetch="all")
-        for column in columns:
-            if column[5] > 0:  # Check if it's a primary key
-                column_name = column[1]
-                if column_name.lower() not in [c.lower() for c in primary_keys]:
-                    primary_keys.append(column_name)
-    
-    unique_values: Dict[str, Dict[str, List[str]]] = {}
+    text_columns: Dict[str, List[str]] = {}
     for table_name in table_names:
         if table_name == "sqlite_sequence":
             continue
-        logging.info(f"Processing {table_name}")
-        columns = [col[1] for col in execute_sql(db_path, f"PRAGMA table_info('{table_name}')", fetch="all") if ("TEXT" in col[2] and col[1].lower() not in [c.lower() for c in primary_keys])]
-        table_values: Dict[str, List[str]] = {}
-        
-        for column in columns:
+        text_columns[table_name] = []
+        for col in table_columns[table_name]:
+            column = col[1]
+            if "TEXT" not in col[2] or column.lower() in primary_keys:
+                continue
             if any(keyword in column.lower() for keyword in ["_id", " id", "url", "email", "web", "time", "phone", "date", "address"]) or column.endswith("Id"):
                 continue
+            text_columns[table_name].append(column)
+    return text_columns
+
+class _ColumnScan:
+    """
+    Collects the distinct values and length statistics of one column during a table scan.
+
+    A column is indexed if it is a name column with less than 5M characters of distinct values,
+    if its distinct values have less than 2M characters and an average length below 25, or if it
+    has less than 100 distinct values. Collection stops as soon as the column can no longer
+    qualify or its values exceed COLUMN_VALUES_MAX_BYTES.
+    """
 
+    def __init__(self, table_name: str, column_name: str):
+        self.table_name = table_name
+        self.column_name = column_name
+        self.is_name = "name" in column_name.lower()
+        self.values: Optional[set] = set()
+        self.sum_of_lengths = 0
+        self.memory_bytes = 0
+
+    def add(self, values: Iterable[Any]) -> None:
+        if self.values is None:
+            return
+        new_values = {str(value) for value in values if value is not None} - self.values
+        if not new_values:
+            return
+        self.values |= new_values
+        self.sum_of_lengths += sum(len(value) for value in new_values)
+        self.memory_bytes += sum(sys.getsizeof(value) for value in new_values) + SET_ENTRY_BYTES * len(new_values)
+        if len(self.values) >= 100 and self.sum_of_lengths >= (5000000 if self.is_name else 2000000):
+            self.values = None
+        elif self.memory_bytes > COLUMN_VALUES_MAX_BYTES:
+            logging.warning(f"Skipping {self.table_name}.{self.column_name}: its distinct values exceed {COLUMN_VALUES_MAX_BYTES / (1 << 20):g} MB")
+            self.values = None
+
+    def result(self) -> Optional[List[str]]:
+        """Returns the distinct values if the column is indexed, otherwise None."""
+        if not self.values:
+            return None
+        count_distinct = len(self.values)
+        average_length = self.sum_of_lengths / count_distinct
+        logging.info(f"Column: {self.column_name}, sum_of_lengths: {self.sum_of_lengths}, count_distinct: {count_distinct}, average_length: {average_length}")
+        if (self.is_name and self.sum_of_lengths < 5000000) or (self.sum_of_lengths < 2000000 and average_length < 25) or count_distinct < 100:
+            return sorted(self.values)
+        return None
+
+def _scan_table(db_path: str, table_name: str, columns: List[str]) -> List[Tuple[str, List[str]]]:
+    """
+    Retrieves the distinct values of the indexed columns of a table in a single scan.
+
+    Args:
+        db_path (str): The path to the SQLite database file.
+        table_name (str): The name of the table.
+        columns (List[str]): The candidate text columns of the table.
+
+    Returns:
+        List[Tuple[str, List[str]]]: The indexed columns and their distinct values, in column order.
+    """
+    if not columns:
+        return []
+    logging.info(f"Processing {table_name}")
+    scans = [_ColumnScan(table_name, column) for column in columns]
+    try:
+        with get_connection_pool(db_path).connection() as conn:
+            cursor = conn.execute(f"SELECT {', '.join(f'`{column}`' for column in columns)} FROM `{table_name}`")
             try:
-                result = execute_sql(db_path, f"""
-                    SELECT SUM(LENGTH(unique_values)), COUNT(unique_values)
-                    FROM (
-                        SELECT DISTINCT `{column}` AS unique_values
-                        FROM `{table_name}`
-                        WHERE `{column}` IS NOT NULL
-                    ) AS subquery
-                """, fetch="one", timeout = 480)
-            except:
-                result = 0, 0
-
-            sum_of_lengths, count_distinct = result
-            if sum_of_lengths is None or count_distinct == 0:
-                continue
+                while True:
+                    rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                    if not rows:
+                        break
+                    for scan, column_values in zip(scans, zip(*rows)):
+                        scan.add(column_values)
+                    if all(scan.values is None for scan in scans):
+                        break
+            finally:
+                cursor.close()
+    except sqlite3.Error as e:
+        logging.error(f"Error scanning {table_name}: {e}")
+        return []
+    results = [(scan.column_name, scan.result()) for scan in scans]
+    return [(column, values) for column, values in results if values is not None]
+
+def _get_unique_values(db_path: str) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Retrieves unique text values from the database excluding primary keys.
 
-            average_length = sum_of_lengths / count_distinct
-            logging.info(f"Column: {column}, sum_of_lengths: {sum_of_lengths}, count_distinct: {count_distinct}, average_length: {average_length}")
-            
-            if ("name" in column.lower() and sum_of_lengths < 5000000) or (sum_of_lengths < 2000000 and average_length < 25) or count_distinct < 100:
-                logging.info(f"Fetching distinct values for {column}")
-                try:
-                    values = [str(value[0]) for value in execute_sql(db_path, f"SELECT DISTINCT `{column}` FROM `{table_name}` WHERE `{column}` IS NOT NULL", fetch="all", timeout = 480)]
-                except:
-                    values = []
-                logging.info(f"Number of different values: {len(values)}")
-                table_values[column] = values
-        
-        unique_values[table_name] = table_values
+    Args:
+        db_path (str): The path to the SQLite database file.
 
-    return unique_values
+    Returns:
+        Dict[str, Dict[str, List[str]]]: A dictionary containing unique values for each table and column.
+    """
+    return {
+        table_name: dict(_scan_table(db_path, table_name, columns))
+        for table_name, columns in _get_text_columns(db_path).items()
+    }
 
-def _create_minhash(signature_size: int, string: str, n_gram: int) -> MinHash:
+def _make_table_shards(db_path: str, table_name: str, columns: List[str], signature_size: int, n_gram: int) -> List[ColumnShard]:
     """
-    Creates a MinHash object for a given string.
+    Extracts the distinct values of a table's columns and computes their signatures.
 
     Args:
+        db_path (str): The path to the SQLite database file.
+        table_name (str): The name of the table.
+        columns (List[str]): The candidate text columns of the table.
         signature_size (int): The size of the MinHash signature.
-        string (str): The input string to create the MinHash for.
         n_gram (int): The n-gram size for the MinHash.
 
     Returns:
-        MinHash: The MinHash object for the input string.
+        List[ColumnShard]: The indexed columns' values and signatures.
     """
-    m = MinHash(num_perm=signature_size)
-    for d in [string[i:i + n_gram] for i in range(len(string) - n_gram + 1)]:
-        m.update(d.encode('utf8'))
-    return m
+    hasher = get_batch_minhasher(signature_size, n_gram)
+    return [
+        ColumnShard(table_name, column, values, hasher.hashvalues(values))
+        for column, values in _scan_table(db_path, table_name, columns)
+    ]
 
 def skip_column(column_name: str, column_values: List[str]) -> bool:
     """
@@ -106,74 +190,247 @@ def skip_column(column_name: str, column_values: List[str]) -> bool:
     average_length = sum_of_lengths / len(column_values)
     return (sum_of_lengths > 50000) and (average_length > 20)
 
-def make_lsh(unique_values: Dict[str, Dict[str, List[str]]], signature_size: int, n_gram: int, threshold: float, verbose: bool = True) -> Tuple[MinHashLSH, Dict[str, Tuple[MinHash, str, str, str]]]:
+def _index_signatures(signatures: MinHashSignatures, n_gram: int, threshold: float) -> MinHashLSH:
     """
-    Creates a MinHash LSH from unique values.
+    Inserts every live row of the signatures into a new LSH keyed by row.
 
     Args:
-        unique_values (Dict[str, Dict[str, List[str]]]): The dictionary of unique values.
-        signature_size (int): The size of the MinHash signature.
-        n_gram (int): The n-gram size for the MinHash.
+        signatures (MinHashSignatures): The signatures.
+        n_gram (int): The n-gram size the signatures were computed with.
         threshold (float): The threshold for the MinHash LSH.
-        verbose (bool): Whether to display progress information.
 
     Returns:
-        Tuple[MinHashLSH, Dict[str, Tuple[MinHash, str, str, str]]]: The MinHash LSH object and the dictionary of MinHashes.
+        MinHashLSH: The MinHash LSH object.
     """
+    signature_size = signatures.hashvalues.shape[1]
     lsh = MinHashLSH(threshold=threshold, num_perm=signature_size)
-    minhashes: Dict[str, Tuple[MinHash, str, str, str]] = {}
-    try:
-        total_unique_values = sum(len(column_values) for table_values in unique_values.values() for column_values in table_values.values())
-        logging.info(f"Total unique values: {total_unique_values}")
-        
-        progress_bar = tqdm(total=total_unique_values, desc="Creating LSH") if verbose else None
-        
-        for table_name, table_values in unique_values.items():
-            for column_name, column_values in table_values.items():
-                if column_name.lower() == "doctype":
-                    print("="*20)
-                    print("Doctype found")
-                    print("="*20)
-                logging.info(f"Processing {table_name} - {column_name} - {len(column_values)}")
-                
-                for id, value in enumerate(column_values):
-                    minhash = _create_minhash(signature_size, value, n_gram)
-                    minhash_key = f"{table_name}_{column_name}_{id}"
-                    minhashes[minhash_key] = (minhash, table_name, column_name, value)
-                    lsh.insert(minhash_key, minhash)
-                    
-                    if verbose:
-                        progress_bar.update(1)
-        
-        if verbose:
-            progress_bar.close()
-    except Exception as e:
-        logging.error(f"Error creating LSH: {e}")
+    hasher = get_batch_minhasher(signature_size, n_gram)
+    for row in signatures.live_rows().tolist():
+        lsh.insert(row, hasher.minhash(signatures.hashvalues[row]))
+    return lsh
+
+def _shard_signatures(shards: Iterable[ColumnShard], signature_size: int) -> MinHashSignatures:
+    """Concatenates the signatures of column shards in order, dropping each shard's signature matrix once it is copied."""
+    builder = SignatureBuilder(signature_size)
+    for shard in shards:
+        builder.add(shard.table_name, shard.column_name, shard.values, shard.hashvalues)
+    return builder.build()
+
+def _make_shards(db_path: str, text_columns: Dict[str, List[str]], signature_size: int, n_gram: int,
+                 num_workers: int, verbose: bool) -> Iterator[ColumnShard]:
+    """
+    Extracts and hashes the columns of a database, in a process pool if num_workers > 1.
+
+    Every table is a task that scans the table once for all its columns and hashes each column's
+    values into a shard of its own. The shards are yielded as soon as their table is done, in
+    schema order, so the caller can append them to the signature arrays instead of collecting all
+    of them first.
+
+    Args:
+        db_path (str): The path to the SQLite database file.
+        text_columns (Dict[str, List[str]]): The candidate text columns of every table.
+        signature_size (int): The size of the MinHash signature.
+        n_gram (int): The n-gram size for the MinHash.
+        num_workers (int): The number of worker processes.
+        verbose (bool): Whether to display progress information.
+
+    Yields:
+        ColumnShard: The shards in schema order.
+    """
+    jobs = [(db_path, table_name, columns, signature_size, n_gram) for table_name, columns in text_columns.items() if columns]
+    progress_bar = tqdm(total=len(jobs), desc="Hashing tables") if verbose else None
+    if num_workers > 1:
+        with multiprocessing.Pool(num_workers) as pool:
+            for shards in pool.imap(_make_table_shards_star, jobs):
+                if verbose:
+                    progress_bar.update(1)
+                yield from shards
+    else:
+        for job in jobs:
+            shards = _make_table_shards(*job)
+            if verbose:
+                progress_bar.update(1)
+            yield from shards
+    if verbose:
+        progress_bar.close()
+
+def _make_table_shards_star(job: Tuple[str, str, List[str], int, int]) -> List[ColumnShard]:
+    return _make_table_shards(*job)
+
+LEGACY_VALUE_INDEX_FILES = ("lsh.pkl", "minhashes.pkl", "unique_values.pkl", "value_columns.json", "signatures.npy",
+                            "value_column_ids.npy", "value_offsets.npy", "value_bytes.npy", "ngram_index.json",
+                            "ngram_keys.npy", "ngram_posting_offsets.npy", "ngram_postings.npy", "ngram_gram_counts.npy")
+
+def _save_lsh(db_directory_path: str, lsh: MinHashLSH, signatures: MinHashSignatures,
+              unique_values: Dict[str, Dict[str, List[str]]], settings: Dict[str, Any]) -> None:
+    """
+    Saves the LSH, its signatures and the unique values as a new version, and records them in the index manifest.
+
+    The files are written to a new directory under `preprocessed/{db_id}_lsh_versions`, which the
+    pointer file `preprocessed/{db_id}_lsh_version` is switched to last, so a crash never leaves a
+    mix of old and new files. If the previous version had an n-gram index, it is rebuilt for the new
+    signatures in the same directory. The previous version is kept for readers that still use it,
+    and older ones are deleted.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+        lsh (MinHashLSH): The MinHash LSH object.
+        signatures (MinHashSignatures): The signatures of the values in the LSH.
+        unique_values (Dict[str, Dict[str, List[str]]]): The dictionary of unique values.
+        settings (Dict[str, Any]): The signature size, n-gram size and threshold the LSH was built with.
+    """
+    db_id = Path(db_directory_path).name
+    preprocessed_path = Path(db_directory_path) / "preprocessed"
+    previous_path = value_index_path(db_directory_path)
+    versions_path = preprocessed_path / f"{db_id}_lsh_versions"
+    versions_path.mkdir(parents=True, exist_ok=True)
+    version = 1 + max((int(path.name) for path in versions_path.iterdir() if path.name.isdigit()), default=0)
+    version_path = versions_path / str(version)
+    version_path.mkdir()
+
+    with open(version_path / f"{db_id}_unique_values.pkl", "wb") as file:
+        pickle.dump(unique_values, file)
+    logging.info("Saved unique values")
+    signatures.save(version_path, db_id)
+    with open(version_path / f"{db_id}_lsh.pkl", "wb") as file:
+        pickle.dump(lsh, file)
+    previous_ngram_index = NgramIndex.saved_settings(previous_path, db_id)
+    if previous_ngram_index is not None:
+        # The n-gram index refers to rows of the signatures, so it is rebuilt for the new ones.
+        NgramIndex.build(signatures, previous_ngram_index["n_gram"]).save(version_path, db_id)
+        logging.info(f"Rebuilt the n-gram index of {db_id}")
+
+    pointer_path = preprocessed_path / f"{db_id}_lsh_version"
+    tmp_pointer_path = pointer_path.with_suffix(".tmp")
+    tmp_pointer_path.write_text(str(version))
+    os.replace(tmp_pointer_path, pointer_path)
+
+    if previous_path == preprocessed_path:
+        for name in LEGACY_VALUE_INDEX_FILES:
+            (preprocessed_path / f"{db_id}_{name}").unlink(missing_ok=True)
+    for path in versions_path.iterdir():
+        if path not in (version_path, previous_path):
+            shutil.rmtree(path, ignore_errors=True)
     
-    return lsh, minhashes
+    save_manifest_section(db_directory_path, "lsh", {
+        "settings": settings,
+        "columns": [
+            [table_name, column_name, fingerprint_values(values)]
+            for table_name, table_values in unique_values.items()
+            for column_name, values in table_values.items()
+        ],
+    })
 
-def make_db_lsh(db_directory_path: str, **kwargs: Any) -> None:
+def make_db_lsh(db_directory_path: str, signature_size: int, n_gram: int, threshold: float, verbose: bool = True, num_workers: int = 1) -> None:
     """
     Creates a MinHash LSH for the database and saves the results.
 
+    Each table is scanned once for the distinct values of all its columns. With more than one
+    worker, tables are scanned and hashed in a process pool. Each column's signatures are appended
+    to the signature arrays as soon as it is hashed, and the LSH is built from the arrays.
+
     Args:
         db_directory_path (str): The path to the database directory.
-        **kwargs (Any): Additional arguments for the LSH creation.
+        signature_size (int): The size of the MinHash signature.
+        n_gram (int): The n-gram size for the MinHash.
+        threshold (float): The threshold for the MinHash LSH.
+        verbose (bool): Whether to display progress information.
+        num_workers (int): The number of processes hashing columns in parallel.
     """
     db_id = Path(db_directory_path).name
     preprocessed_path = Path(db_directory_path) / "preprocessed"
     preprocessed_path.mkdir(exist_ok=True)
+    db_path = str(Path(db_directory_path) / f"{db_id}.sqlite")
+    start_time = time.time()
     
-    unique_values = _get_unique_values(str(Path(db_directory_path) / f"{db_id}.sqlite"))
+    text_columns = _get_text_columns(db_path)
+    unique_values: Dict[str, Dict[str, List[str]]] = {table_name: {} for table_name in text_columns}
+    builder = SignatureBuilder(signature_size)
+    for shard in _make_shards(db_path, text_columns, signature_size, n_gram, num_workers, verbose):
+        unique_values[shard.table_name][shard.column_name] = shard.values
+        builder.add(shard.table_name, shard.column_name, shard.values, shard.hashvalues)
     logging.info("Unique values obtained")
+    signatures = builder.build()
+    lsh = _index_signatures(signatures, n_gram, threshold)
     
-    with open(preprocessed_path / f"{db_id}_unique_values.pkl", "wb") as file:
-        pickle.dump(unique_values, file)
-    logging.info("Saved unique values")
+    _save_lsh(db_directory_path, lsh, signatures, unique_values,
+              {"signature_size": signature_size, "n_gram": n_gram, "threshold": threshold})
     
-    lsh, minhashes = make_lsh(unique_values, **kwargs)
+    elapsed_time = time.time() - start_time
+    num_columns = sum(len(table_values) for table_values in unique_values.values())
+    logging.info(f"LSH for {db_id}: {len(signatures)} values from {num_columns} columns in {elapsed_time:.1f}s "
+                 f"({len(signatures) / max(elapsed_time, 1e-9):.0f} values/s, {num_workers} workers)")
+
+def update_db_lsh(db_directory_path: str, signature_size: int, n_gram: int, threshold: float, verbose: bool = True, num_workers: int = 1) -> None:
+    """
+    Updates the MinHash LSH of the database to its current values, rebuilding it only if needed.
+
+    The distinct values of every column are fingerprinted and compared with the index manifest.
+    Only the values added to changed columns are hashed and inserted, the values that disappeared
+    are removed from the LSH, and the rows of unchanged columns are kept as they are. Removed rows
+    stay in the signature files until they make up half of them, when the signatures are compacted
+    and the LSH is rebuilt from them without re-hashing.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+        signature_size (int): The size of the MinHash signature.
+        n_gram (int): The n-gram size for the MinHash.
+        threshold (float): The threshold for the MinHash LSH.
+        verbose (bool): Whether to display progress information.
+        num_workers (int): The number of processes hashing columns in parallel on a full rebuild.
+    """
+    db_id = Path(db_directory_path).name
+    preprocessed_path = value_index_path(db_directory_path)
+    db_path = str(Path(db_directory_path) / f"{db_id}.sqlite")
+    settings = {"signature_size": signature_size, "n_gram": n_gram, "threshold": threshold}
+    previous = load_manifest(db_directory_path).get("lsh")
+    if (previous is None or previous["settings"] != settings or not (preprocessed_path / f"{db_id}_lsh.pkl").exists()
+            or not MinHashSignatures.exists(preprocessed_path, db_id)):
+        logging.info(f"No up-to-date LSH manifest for {db_id}, rebuilding the LSH")
+        make_db_lsh(db_directory_path, signature_size, n_gram, threshold, verbose, num_workers)
+        return
+    start_time = time.time()
     
-    with open(preprocessed_path / f"{db_id}_lsh.pkl", "wb") as file:
-        pickle.dump(lsh, file)
-    with open(preprocessed_path / f"{db_id}_minhashes.pkl", "wb") as file:
-        pickle.dump(minhashes, file)
+    unique_values = _get_unique_values(db_path)
+    current = {
+        (table_name, column_name): fingerprint_values(values)
+        for table_name, table_values in unique_values.items()
+        for column_name, values in table_values.items()
+    }
+    previous_columns = {(table_name, column_name): fingerprint for table_name, column_name, fingerprint in previous["columns"]}
+    changed = [column for column, fingerprint in current.items() if previous_columns.get(column) != fingerprint]
+    dropped = [column for column in previous_columns if column not in current]
+    if not changed and not dropped:
+        logging.info(f"LSH for {db_id} is up to date")
+        return
+    
+    lsh, signatures = load_db_lsh(db_directory_path)
+    hasher = get_batch_minhasher(signature_size, n_gram)
+    removed_rows: List[int] = []
+    added_shards: List[ColumnShard] = []
+    for table_name, column_name in dropped:
+        removed_rows.extend(signatures.column_rows(table_name, column_name).values())
+    for table_name, column_name in changed:
+        previous_rows = signatures.column_rows(table_name, column_name)
+        values = unique_values[table_name][column_name]
+        value_set = set(values)
+        removed_rows.extend(row for value, row in previous_rows.items() if value not in value_set)
+        added_values = [value for value in values if value not in previous_rows]
+        added_shards.append(ColumnShard(table_name, column_name, added_values, hasher.hashvalues(added_values)))
+    
+    num_previous_rows = len(signatures)
+    signatures = signatures.extend(_shard_signatures(added_shards, signature_size))
+    for row in removed_rows:
+        lsh.remove(row)
+    signatures.remove(removed_rows)
+    for row in range(num_previous_rows, len(signatures)):
+        lsh.insert(row, hasher.minhash(signatures.hashvalues[row]))
+    num_added = len(signatures) - num_previous_rows
+    if 2 * len(signatures.live_rows()) < len(signatures):
+        logging.info(f"Compacting the signatures of {db_id}")
+        signatures = signatures.compact()
+        lsh = _index_signatures(signatures, n_gram, threshold)
+    
+    _save_lsh(db_directory_path, lsh, signatures, unique_values, settings)
+    logging.info(f"LSH for {db_id} updated in {time.time() - start_time:.1f}s: {len(changed)} changed and {len(dropped)} dropped columns, "
+                 f"{num_added} values added and {len(removed_rows)} removed")
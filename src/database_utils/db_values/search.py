@@ -1,58 +1,108 @@
 import pickle
-from datasketch import MinHash, MinHashLSH
+import numpy as np
+from datasketch import MinHashLSH
 from pathlib import Path
 import logging
 from typing import Dict, Tuple, List
 
-from database_utils.db_values.preprocess import _create_minhash
+from database_utils.db_values.batch_minhash import get_batch_minhasher
+from database_utils.db_values.signatures import MinHashSignatures, value_index_path
 
 ### Database value similarity ###
 
-def _jaccard_similarity(m1: MinHash, m2: MinHash) -> float:
+def load_db_lsh(db_directory_path: str) -> Tuple[MinHashLSH, MinHashSignatures]:
     """
-    Computes the Jaccard similarity between two MinHash objects.
+    Loads the LSH and MinHash signatures from the preprocessed files in the specified directory.
 
-    Args:
-        m1 (MinHash): The first MinHash object.
-        m2 (MinHash): The second MinHash object.
-
-    Returns:
-        float: The Jaccard similarity between the two MinHash objects.
-    """
-    return m1.jaccard(m2)
-
-def load_db_lsh(db_directory_path: str) -> Tuple[MinHashLSH, Dict[str, Tuple[MinHash, str, str, str]]]:
-    """
-    Loads the LSH and MinHashes from the preprocessed files in the specified directory.
+    The signature files are memory-mapped; databases preprocessed before they existed are loaded
+    from the pickled MinHashes and converted.
 
     Args:
         db_directory_path (str): The path to the database directory.
 
     Returns:
-        Tuple[MinHashLSH, Dict[str, Tuple[MinHash, str, str, str]]]: The LSH object and the dictionary of MinHashes.
+        Tuple[MinHashLSH, MinHashSignatures]: The LSH object and the signatures.
 
     Raises:
         Exception: If there is an error loading the LSH or MinHashes.
     """
     db_id = Path(db_directory_path).name
+    preprocessed_path = value_index_path(db_directory_path)
     try:
-        with open(Path(db_directory_path) / "preprocessed" / f"{db_id}_lsh.pkl", "rb") as file:
+        with open(preprocessed_path / f"{db_id}_lsh.pkl", "rb") as file:
             lsh = pickle.load(file)
-        with open(Path(db_directory_path) / "preprocessed" / f"{db_id}_minhashes.pkl", "rb") as file:
-            minhashes = pickle.load(file)
-        return lsh, minhashes
+        if MinHashSignatures.exists(preprocessed_path, db_id):
+            signatures = MinHashSignatures.load(preprocessed_path, db_id)
+        else:
+            with open(preprocessed_path / f"{db_id}_minhashes.pkl", "rb") as file:
+                signatures = MinHashSignatures.from_minhashes(pickle.load(file))
+        return lsh, signatures
     except Exception as e:
         logging.error(f"Error loading LSH for {db_id}: {e}")
         raise e
 
-def query_lsh(lsh: MinHashLSH, minhashes: Dict[str, Tuple[MinHash, str, str, str]], keyword: str, 
+def _top_rows(signatures: MinHashSignatures, rows: np.ndarray, query_hashvalues: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Selects the candidate rows most similar to the query, most similar first.
+
+    Args:
+        signatures (MinHashSignatures): The signatures of the values in the LSH.
+        rows (np.ndarray): The candidate rows returned by the LSH.
+        query_hashvalues (np.ndarray): The signature of the query.
+        top_n (int): The number of rows to select.
+
+    Returns:
+        np.ndarray: The selected rows.
+    """
+    similarities = signatures.jaccard(rows, query_hashvalues)
+    if len(rows) > top_n:
+        selected = np.argpartition(-similarities, top_n - 1)[:top_n]
+        rows, similarities = rows[selected], similarities[selected]
+    return rows[np.argsort(-similarities, kind="stable")]
+
+def query_lsh_many(lsh: MinHashLSH, signatures: MinHashSignatures, keywords: List[str],
+                   signature_size: int = 100, n_gram: int = 3, top_n: int = 10) -> List[Dict[str, Dict[str, List[str]]]]:
+    """
+    Queries the LSH for the values similar to each of the given keywords.
+
+    The keywords are hashed in one batch and each keyword's candidates are re-ranked with a single
+    vectorized comparison against the signature matrix.
+
+    Args:
+        lsh (MinHashLSH): The LSH object.
+        signatures (MinHashSignatures): The signatures of the values in the LSH.
+        keywords (List[str]): The keywords to search for.
+        signature_size (int, optional): The size of the MinHash signature.
+        n_gram (int, optional): The n-gram size for the MinHash.
+        top_n (int, optional): The number of top results to return per keyword.
+
+    Returns:
+        List[Dict[str, Dict[str, List[str]]]]: For each keyword, a dictionary containing its top similar values.
+    """
+    hasher = get_batch_minhasher(signature_size, n_gram)
+    unique_keywords = list(dict.fromkeys(keywords))
+    results: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+    for keyword, query_hashvalues in zip(unique_keywords, hasher.hashvalues(unique_keywords)):
+        rows = signatures.rows(lsh.query(hasher.minhash(query_hashvalues)))
+        similar_values_trimmed: Dict[str, Dict[str, List[str]]] = {}
+        for row in _top_rows(signatures, rows, query_hashvalues, top_n).tolist():
+            table_name, column_name, value = signatures.entry(row)
+            if table_name not in similar_values_trimmed:
+                similar_values_trimmed[table_name] = {}
+            if column_name not in similar_values_trimmed[table_name]:
+                similar_values_trimmed[table_name][column_name] = []
+            similar_values_trimmed[table_name][column_name].append(value)
+        results[keyword] = similar_values_trimmed
+    return [results[keyword] for keyword in keywords]
+
+def query_lsh(lsh: MinHashLSH, signatures: MinHashSignatures, keyword: str, 
               signature_size: int = 100, n_gram: int = 3, top_n: int = 10) -> Dict[str, Dict[str, List[str]]]:
     """
     Queries the LSH for similar values to the given keyword and returns the top results.
 
     Args:
         lsh (MinHashLSH): The LSH object.
-        minhashes (Dict[str, Tuple[MinHash, str, str, str]]): The dictionary of MinHashes.
+        signatures (MinHashSignatures): The signatures of the values in the LSH.
         keyword (str): The keyword to search for.
         signature_size (int, optional): The size of the MinHash signature.
         n_gram (int, optional): The n-gram size for the MinHash.
@@ -61,18 +111,4 @@ def query_lsh(lsh: MinHashLSH, minhashes: Dict[str, Tuple[MinHash, str, str, str
     Returns:
         Dict[str, Dict[str, List[str]]]: A dictionary containing the top similar values.
     """
-    query_minhash = _create_minhash(signature_size, keyword, n_gram)
-    results = lsh.query(query_minhash)
-    similarities = [(result, _jaccard_similarity(query_minhash, minhashes[result][0])) for result in results]
-    similarities = sorted(similarities, key=lambda x: x[1], reverse=True)[:top_n]
-
-    similar_values_trimmed: Dict[str, Dict[str, List[str]]] = {}
-    for result, similarity in similarities:
-        table_name, column_name, value = minhashes[result][1:]
-        if table_name not in similar_values_trimmed:
-            similar_values_trimmed[table_name] = {}
-        if column_name not in similar_values_trimmed[table_name]:
-            similar_values_trimmed[table_name][column_name] = []
-        similar_values_trimmed[table_name][column_name].append(value)
-
-    return similar_values_trimmed
+    return query_lsh_many(lsh, signatures, [keyword], signature_size, n_gram, top_n)[0]
@@ -0,0 +1,305 @@
+import os
+import json
+import numpy as np
+from pathlib import Path
+from datasketch import MinHash
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def load_array(path: Path) -> np.ndarray:
+    """Memory-maps an array saved as a `.npy` file."""
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Empty arrays cannot be memory-mapped.
+        return np.load(path)
+
+def save_array(path: Path, array: np.ndarray) -> None:
+    """Saves an array as a `.npy` file, replacing rather than overwriting it so that processes that memory-mapped the old file keep reading it."""
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(tmp_path, path)
+
+def value_index_path(db_directory_path: str) -> Path:
+    """
+    Returns the directory holding the current LSH, signatures and n-gram index of a database.
+
+    Each save writes a new version directory under `preprocessed/{db_id}_lsh_versions` and then
+    replaces the pointer file `preprocessed/{db_id}_lsh_version`, so readers always see a complete
+    set of files. Databases preprocessed before versioning keep their files in `preprocessed`.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+
+    Returns:
+        Path: The directory of the current version.
+    """
+    db_id = Path(db_directory_path).name
+    preprocessed_path = Path(db_directory_path) / "preprocessed"
+    pointer_path = preprocessed_path / f"{db_id}_lsh_version"
+    if not pointer_path.exists():
+        return preprocessed_path
+    return preprocessed_path / f"{db_id}_lsh_versions" / pointer_path.read_text().strip()
+
+class MinHashSignatures:
+    """
+    The MinHash signatures of a database's values stored as contiguous arrays.
+
+    Row `i` holds the signature of one value in `hashvalues[i]`, the index of its (table, column)
+    in `columns` in `column_ids[i]`, and its UTF-8 encoded value in
+    `value_bytes[value_offsets[i]:value_offsets[i + 1]]`. Saved as `.npy` files, the arrays are
+    memory-mapped on load, so loading is instant and worker processes share the same pages.
+
+    Attributes:
+        hashvalues (np.ndarray): The (num_values, signature_size) uint64 signature matrix.
+        column_ids (np.ndarray): The column index of each value.
+        value_offsets (np.ndarray): The start of each value in `value_bytes`, followed by the total length.
+        value_bytes (np.ndarray): The concatenated UTF-8 encoded values.
+        columns (List[Tuple[str, str]]): The (table, column) pairs.
+        key_index (Optional[Dict[str, int]]): The rows of the string keys of the legacy format, or None if the LSH keys are rows.
+    """
+
+    def __init__(self, hashvalues: np.ndarray, column_ids: np.ndarray, value_offsets: np.ndarray,
+                 value_bytes: np.ndarray, columns: List[Tuple[str, str]], key_index: Optional[Dict[str, int]] = None):
+        self.hashvalues = hashvalues
+        self.column_ids = column_ids
+        self.value_offsets = value_offsets
+        self.value_bytes = value_bytes
+        self.columns = columns
+        self.key_index = key_index
+
+    def __len__(self) -> int:
+        return len(self.column_ids)
+
+    @property
+    def memory_mapped(self) -> bool:
+        return isinstance(self.hashvalues, np.memmap)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[np.ndarray, str, str, str]], signature_size: int,
+                     keys: Optional[List[str]] = None) -> "MinHashSignatures":
+        """
+        Builds the arrays from (hashvalues, table, column, value) entries.
+
+        Args:
+            entries (Iterable[Tuple[np.ndarray, str, str, str]]): The signature and origin of each value.
+            signature_size (int): The size of the MinHash signatures.
+            keys (Optional[List[str]]): The string keys of the entries, for the legacy format.
+
+        Returns:
+            MinHashSignatures: The signatures.
+        """
+        hashvalues: List[np.ndarray] = []
+        column_ids: List[int] = []
+        encoded_values: List[bytes] = []
+        column_index: Dict[Tuple[str, str], int] = {}
+        for entry_hashvalues, table_name, column_name, value in entries:
+            hashvalues.append(entry_hashvalues)
+            column_ids.append(column_index.setdefault((table_name, column_name), len(column_index)))
+            encoded_values.append(value.encode("utf-8", errors="surrogatepass"))
+        value_offsets = np.zeros(len(encoded_values) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded_values], out=value_offsets[1:])
+        return cls(
+            hashvalues=np.array(hashvalues, dtype=np.uint64).reshape(len(hashvalues), signature_size),
+            column_ids=np.array(column_ids, dtype=np.int32),
+            value_offsets=value_offsets,
+            value_bytes=np.frombuffer(b"".join(encoded_values), dtype=np.uint8),
+            columns=list(column_index),
+            key_index={key: row for row, key in enumerate(keys)} if keys is not None else None,
+        )
+
+    @classmethod
+    def from_minhashes(cls, minhashes: Dict[str, Tuple[MinHash, str, str, str]]) -> "MinHashSignatures":
+        """Converts the legacy dictionary of MinHash objects keyed by string keys."""
+        signature_size = len(next(iter(minhashes.values()))[0].hashvalues) if minhashes else 0
+        entries = ((minhash.hashvalues, table_name, column_name, value) for minhash, table_name, column_name, value in minhashes.values())
+        return cls.from_entries(entries, signature_size, keys=list(minhashes))
+
+    def rows(self, keys: Iterable) -> np.ndarray:
+        """Returns the rows of the keys returned by the LSH."""
+        if self.key_index is not None:
+            return np.fromiter((self.key_index[key] for key in keys), dtype=np.int64)
+        return np.fromiter(keys, dtype=np.int64)
+
+    def jaccard(self, rows: np.ndarray, query_hashvalues: np.ndarray) -> np.ndarray:
+        """
+        Estimates the Jaccard similarity of a query signature to the signatures of the given rows.
+
+        Args:
+            rows (np.ndarray): The rows to compare with.
+            query_hashvalues (np.ndarray): The signature of the query.
+
+        Returns:
+            np.ndarray: The estimated similarity of each row, as `MinHash.jaccard` computes it.
+        """
+        return np.count_nonzero(self.hashvalues[rows] == query_hashvalues, axis=1) / self.hashvalues.shape[1]
+
+    def entry(self, row: int) -> Tuple[str, str, str]:
+        """Returns the (table, column, value) of a row."""
+        table_name, column_name = self.columns[self.column_ids[row]]
+        start, end = self.value_offsets[row], self.value_offsets[row + 1]
+        return table_name, column_name, self.value_bytes[start:end].tobytes().decode("utf-8", errors="surrogatepass")
+
+    def column_rows(self, table_name: str, column_name: str) -> Dict[str, int]:
+        """Returns the rows of a column's values, keyed by value."""
+        if (table_name, column_name) not in self.columns:
+            return {}
+        rows = np.nonzero(self.column_ids == self.columns.index((table_name, column_name)))[0]
+        return {self.entry(row)[2]: row for row in rows.tolist()}
+
+    def live_rows(self) -> np.ndarray:
+        """Returns the rows that were not removed."""
+        return np.nonzero(np.asarray(self.column_ids) >= 0)[0]
+
+    def extend(self, other: "MinHashSignatures") -> "MinHashSignatures":
+        """
+        Appends the rows of other signatures after the rows of these ones.
+
+        Args:
+            other (MinHashSignatures): The signatures to append.
+
+        Returns:
+            MinHashSignatures: New in-memory signatures whose first rows are these ones.
+        """
+        columns = list(self.columns)
+        column_index = {column: i for i, column in enumerate(columns)}
+        remap = np.array([column_index.setdefault(column, len(column_index)) for column in other.columns], dtype=np.int32)
+        columns = list(column_index)
+        return MinHashSignatures(
+            hashvalues=np.concatenate([self.hashvalues, other.hashvalues.astype(np.uint64).reshape(-1, self.hashvalues.shape[1])]),
+            column_ids=np.concatenate([self.column_ids, remap[other.column_ids] if len(other) else np.zeros(0, dtype=np.int32)]),
+            value_offsets=np.concatenate([self.value_offsets[:-1], other.value_offsets + self.value_offsets[-1]]),
+            value_bytes=np.concatenate([self.value_bytes, other.value_bytes]),
+            columns=columns,
+        )
+
+    def remove(self, rows: Iterable[int]) -> None:
+        """Marks rows as removed, keeping the row numbers of the others; the signatures must be in memory."""
+        self.column_ids[np.fromiter(rows, dtype=np.int64)] = -1
+
+    def compact(self) -> "MinHashSignatures":
+        """Returns in-memory signatures with the removed rows dropped and the others renumbered in order."""
+        rows = self.live_rows()
+        return MinHashSignatures.from_entries(
+            ((self.hashvalues[row], *self.entry(row)) for row in rows.tolist()), self.hashvalues.shape[1]
+        )
+
+    @staticmethod
+    def _paths(preprocessed_path: Path, db_id: str) -> Dict[str, Path]:
+        return {
+            name: preprocessed_path / f"{db_id}_{name}.npy"
+            for name in ("signatures", "value_column_ids", "value_offsets", "value_bytes")
+        }
+
+    @staticmethod
+    def exists(preprocessed_path: Path, db_id: str) -> bool:
+        return (preprocessed_path / f"{db_id}_value_columns.json").exists()
+
+    def save(self, preprocessed_path: Path, db_id: str) -> None:
+        """
+        Saves the signatures as `.npy` files and the (table, column) pairs as JSON.
+
+        Args:
+            preprocessed_path (Path): The preprocessed directory of the database.
+            db_id (str): The database identifier.
+        """
+        paths = self._paths(preprocessed_path, db_id)
+        (preprocessed_path / f"{db_id}_value_columns.json").unlink(missing_ok=True)
+        save_array(paths["signatures"], self.hashvalues)
+        save_array(paths["value_column_ids"], self.column_ids)
+        save_array(paths["value_offsets"], self.value_offsets)
+        save_array(paths["value_bytes"], self.value_bytes)
+        # Written last, so its presence marks a complete set of files.
+        with open(preprocessed_path / f"{db_id}_value_columns.json", "w") as file:
+            json.dump(self.columns, file)
+
+    @classmethod
+    def load(cls, preprocessed_path: Path, db_id: str) -> "MinHashSignatures":
+        """
+        Memory-maps the signatures saved by `save`.
+
+        Args:
+            preprocessed_path (Path): The preprocessed directory of the database.
+            db_id (str): The database identifier.
+
+        Returns:
+            MinHashSignatures: The signatures.
+        """
+        paths = cls._paths(preprocessed_path, db_id)
+        with open(preprocessed_path / f"{db_id}_value_columns.json", "r") as file:
+            columns = [tuple(column) for column in json.load(file)]
+        return cls(
+            hashvalues=load_array(paths["signatures"]),
+            column_ids=load_array(paths["value_column_ids"]),
+            value_offsets=load_array(paths["value_offsets"]),
+            value_bytes=load_array(paths["value_bytes"]),
+            columns=columns,
+        )
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    """Returns the array with room for at least `size` rows, doubling its capacity when it is too small."""
+    if size <= len(array):
+        return array
+    grown = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class SignatureBuilder:
+    """
+    Appends the signatures of columns to growing arrays as they are computed.
+
+    Each column is copied into the arrays when it is added, so its values and signature matrix can
+    be dropped right away instead of being kept until all columns are hashed.
+
+    Attributes:
+        signature_size (int): The size of the MinHash signatures.
+    """
+
+    def __init__(self, signature_size: int):
+        self.signature_size = signature_size
+        self._num_rows = 0
+        self._num_bytes = 0
+        self._hashvalues = np.empty((0, signature_size), dtype=np.uint64)
+        self._column_ids = np.empty(0, dtype=np.int32)
+        self._value_offsets = np.zeros(1, dtype=np.int64)
+        self._value_bytes = np.empty(0, dtype=np.uint8)
+        self._columns: List[Tuple[str, str]] = []
+
+    def add(self, table_name: str, column_name: str, values: List[str], hashvalues: np.ndarray) -> None:
+        """
+        Appends the values of a column and their (len(values), signature_size) signature matrix.
+
+        Args:
+            table_name (str): The name of the table.
+            column_name (str): The name of the column.
+            values (List[str]): The distinct values of the column.
+            hashvalues (np.ndarray): The signature of each value.
+        """
+        if not values:
+            return
+        encoded_values = [value.encode("utf-8", errors="surrogatepass") for value in values]
+        lengths = np.fromiter((len(value) for value in encoded_values), dtype=np.int64, count=len(encoded_values))
+        start, end = self._num_rows, self._num_rows + len(values)
+        bytes_end = self._num_bytes + int(lengths.sum())
+        self._hashvalues = _grow(self._hashvalues, end)
+        self._column_ids = _grow(self._column_ids, end)
+        self._value_offsets = _grow(self._value_offsets, end + 1)
+        self._value_bytes = _grow(self._value_bytes, bytes_end)
+        self._hashvalues[start:end] = hashvalues
+        self._column_ids[start:end] = len(self._columns)
+        np.cumsum(lengths, out=self._value_offsets[start + 1:end + 1])
+        self._value_offsets[start + 1:end + 1] += self._num_bytes
+        self._value_bytes[self._num_bytes:bytes_end] = np.frombuffer(b"".join(encoded_values), dtype=np.uint8)
+        self._columns.append((table_name, column_name))
+        self._num_rows, self._num_bytes = end, bytes_end
+
+    def build(self) -> MinHashSignatures:
+        """Returns the signatures of the columns added, in the order they were added; the arrays are handed over, not copied."""
+        # The arrays are only referenced by the builder, so they are shrunk to their rows in place.
+        self._hashvalues.resize((self._num_rows, self.signature_size), refcheck=False)
+        self._column_ids.resize(self._num_rows, refcheck=False)
+        self._value_offsets.resize(self._num_rows + 1, refcheck=False)
+        self._value_bytes.resize(self._num_bytes, refcheck=False)
+        signatures = MinHashSignatures(self._hashvalues, self._column_ids, self._value_offsets, self._value_bytes, self._columns)
+        self.__init__(self.signature_size)
+        return signatures
@@ -1,57 +1,423 @@
 import sqlite3
 import random
 import logging
-from typing import Any, Union, List, Dict
-from func_timeout import func_timeout, FunctionTimedOut
-from multiprocessing import Process, Queue
+from typing import Any, Union, List, Dict, Iterator, Optional, NamedTuple
+from contextlib import contextmanager
+import contextvars
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
 import threading
-from queue import Empty
+import time
 from enum import Enum
 
 import os
 
 from sqlglot import parse_one, exp
 
-class TimeoutException(Exception):
-    pass
-
-
-
-def execute_sql(db_path: str, sql: str, fetch: Union[str, int] = "all", timeout: int = 60) -> Any:
-    class QueryThread(threading.Thread):
-        def __init__(self):
-            threading.Thread.__init__(self)
-            self.result = None
-            self.exception = None
-
-        def run(self):
-            try:
-                with sqlite3.connect(db_path, timeout=60) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(sql)
-                    if fetch == "all":
-                        self.result = cursor.fetchall()
-                    elif fetch == "one":
-                        self.result = cursor.fetchone()
-                    elif fetch == "random":
-                        samples = cursor.fetchmany(10)
-                        self.result = random.choice(samples) if samples else []
-                    elif isinstance(fetch, int):
-                        self.result = cursor.fetchmany(fetch)
-                    else:
-                        raise ValueError("Invalid fetch argument. Must be 'all', 'one', 'random', or an integer.")
-            except Exception as e:
-                self.exception = e
-    query_thread = QueryThread()
-    query_thread.start()
-    query_thread.join(timeout)
-    if query_thread.is_alive():
-        raise TimeoutError(f"SQL query execution exceeded the timeout of {timeout} seconds.")
-    if query_thread.exception:
-        # logging.error(f"Error in execute_sql: {query_thread.exception}\nSQL: {sql}")
-        raise query_thread.exception
-    return query_thread.result
+from database_utils.connection_pool import get_connection_pool
+from database_utils.query_cost import estimate_query_cost
+from database_utils.shadow_db import find_shadow_db
+from database_utils.result_cache import get_result_cache, normalize_sql
+from database_utils.result_fingerprint import ResultHasher, result_set_fingerprint
+from database_utils.gold_cache import GOLD_STATUS_OK, GOLD_STATUS_ERROR, GOLD_STATUS_TIMEOUT, gold_sql_key, load_gold_results, save_gold_results, lookup_gold_result
 
+class QueryTooExpensiveError(Exception):
+    """Raised instead of executing a query whose estimated cost exceeds `MAX_QUERY_COST`."""
+
+    def __init__(self, estimated_cost: float, max_cost: float):
+        self.estimated_cost = estimated_cost
+        self.max_cost = max_cost
+        super().__init__(
+            f"The query was not executed: its plan is estimated to visit about {estimated_cost:.3g} rows "
+            f"(limit {max_cost:.3g}), which usually means an unintended cross join or a missing join condition."
+        )
+
+PROGRESS_HANDLER_STEPS = 1000
+FETCH_BATCH_SIZE = 1000
+MAX_RESULT_ROWS = int(os.getenv("SQL_MAX_RESULT_ROWS", 50000))
+MAX_RESULT_BYTES = int(os.getenv("SQL_MAX_RESULT_MB", 64)) * (1 << 20)
+MAX_QUERY_COST = float(os.getenv("SQL_MAX_QUERY_COST", 1e10))
+SHADOW_TRIAGE_TIMEOUT = float(os.getenv("SHADOW_TRIAGE_TIMEOUT", 2))
+# Errors SQLite raises while compiling a query, which the same query raises on every run.
+DETERMINISTIC_ERROR_PREFIXES = (
+    "no such table", "no such column", "no such function", "no such collation", "syntax error", "near \"",
+    "incomplete input", "unrecognized token", "ambiguous column name", "wrong number of arguments",
+    "misuse of aggregate", "misuse of window function", "sub-select returns", "selects to the left and right",
+    "order by term out of range", "1st order by term", "2nd order by term", "3rd order by term",
+    "a group by clause is required", "aggregate functions are not allowed", "row value misused",
+)
+
+class FetchBudget(NamedTuple):
+    """
+    A fetch mode that streams the result and keeps only the rows that fit in a row and byte budget.
+
+    Attributes:
+        max_rows (int): The maximum number of rows to keep.
+        max_bytes (int): The maximum estimated size in bytes of the rows to keep.
+    """
+    max_rows: int = MAX_RESULT_ROWS
+    max_bytes: int = MAX_RESULT_BYTES
+
+class CappedResult(NamedTuple):
+    """
+    The result of a query fetched with a `FetchBudget`.
+
+    Attributes:
+        rows (List[Any]): The leading rows of the result that fit in the budget.
+        row_count (int): The total number of rows of the result.
+        truncated (bool): Whether rows were dropped to stay within the budget.
+    """
+    rows: List[Any]
+    row_count: int
+    truncated: bool
+
+class QueryDeadline:
+    """
+    A point in time after which SQL execution must stop.
+
+    Every query executed while the deadline is active checks it from SQLite's progress handler,
+    so a query that runs past the deadline is aborted inside SQLite instead of being left running
+    on an abandoned thread. `cancel` stops the in-flight queries immediately via `Connection.interrupt()`.
+
+    Attributes:
+        timeout (float): The number of seconds the deadline allows.
+        expires_at (float): The monotonic time at which the deadline expires.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self._cancelled = False
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return self._cancelled or time.monotonic() > self.expires_at
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self) -> None:
+        """Expires the deadline and interrupts every query currently running under it."""
+        with self._lock:
+            self._cancelled = True
+            for conn in self._connections:
+                conn.interrupt()
+
+    def _register(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._connections.add(conn)
+
+    def _unregister(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._connections.discard(conn)
+
+_active_deadline: ContextVar[Optional[QueryDeadline]] = ContextVar("active_sql_deadline", default=None)
+
+@contextmanager
+def sql_deadline(timeout: float) -> Iterator[QueryDeadline]:
+    """
+    Applies a shared deadline to every `execute_sql` call made within the context.
+
+    Nested deadlines never extend an enclosing one.
+
+    Args:
+        timeout (float): The number of seconds the enclosed SQL work may take in total.
+
+    Yields:
+        QueryDeadline: The active deadline.
+    """
+    deadline = QueryDeadline(timeout)
+    outer_deadline = _active_deadline.get()
+    if outer_deadline is not None and outer_deadline.expires_at < deadline.expires_at:
+        deadline.expires_at = outer_deadline.expires_at
+    token = _active_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _active_deadline.reset(token)
+
+def _estimate_row_bytes(row: Any) -> int:
+    """Roughly estimates the memory taken by the values of a result row."""
+    size = 0
+    for value in row:
+        size += len(value) + 8 if isinstance(value, (str, bytes)) else 8
+    return size
+
+def _fetch_capped(cursor: sqlite3.Cursor, budget: FetchBudget) -> CappedResult:
+    """
+    Fetches rows until the budget is exhausted and counts the remaining rows without keeping them.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor the query was executed on.
+        budget (FetchBudget): The row and byte budget.
+
+    Returns:
+        CappedResult: The kept rows and the total row count.
+    """
+    rows = []
+    row_count = 0
+    size = 0
+    full = False
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        row_count += len(batch)
+        if full:
+            continue
+        for row in batch:
+            size += _estimate_row_bytes(row)
+            if len(rows) >= budget.max_rows or size > budget.max_bytes:
+                full = True
+                break
+            rows.append(row)
+    return CappedResult(rows, row_count, row_count > len(rows))
+
+def _fetch_results(cursor: sqlite3.Cursor, fetch: Union[str, int, FetchBudget]) -> Any:
+    """
+    Fetches the results of an executed cursor.
+
+    The "fingerprint" and "ordered_fingerprint" options hash the rows in batches as they are fetched
+    instead of materializing them; a `FetchBudget` keeps only the rows that fit in the budget.
+
+    Args:
+        cursor (sqlite3.Cursor): The cursor the query was executed on.
+        fetch (Union[str, int, FetchBudget]): How to fetch the results. Options are "all", "one", "random",
+            "fingerprint", "ordered_fingerprint", a FetchBudget, or an integer.
+
+    Returns:
+        Any: The fetched results based on the fetch argument; for the fingerprint options, the result
+            fingerprint and the number of rows; for a FetchBudget, a CappedResult.
+    """
+    if fetch == "all":
+        return cursor.fetchall()
+    elif fetch == "one":
+        return cursor.fetchone()
+    elif fetch == "random":
+        samples = cursor.fetchmany(10)
+        return random.choice(samples) if samples else []
+    elif isinstance(fetch, FetchBudget):
+        return _fetch_capped(cursor, fetch)
+    elif isinstance(fetch, int):
+        return cursor.fetchmany(fetch)
+    elif fetch in ("fingerprint", "ordered_fingerprint"):
+        hasher = ResultHasher(ordered=fetch == "ordered_fingerprint")
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            hasher.update_many(rows)
+        return hasher.hexdigest(), hasher.count
+    else:
+        raise ValueError("Invalid fetch argument. Must be 'all', 'one', 'random', 'fingerprint', 'ordered_fingerprint', a FetchBudget, or an integer.")
+
+def check_query_cost(db_path: str, sql: str) -> None:
+    """
+    Rejects a query whose EXPLAIN QUERY PLAN cost estimate exceeds `MAX_QUERY_COST`.
+
+    Setting the SQL_MAX_QUERY_COST environment variable to 0 disables the check.
+
+    Args:
+        db_path (str): The path to the database file.
+        sql (str): The SQL query to check.
+
+    Raises:
+        QueryTooExpensiveError: If the estimated cost exceeds the limit.
+    """
+    if MAX_QUERY_COST <= 0:
+        return
+    estimated_cost = estimate_query_cost(db_path, sql)
+    if estimated_cost > MAX_QUERY_COST:
+        raise QueryTooExpensiveError(estimated_cost, MAX_QUERY_COST)
+
+def execute_sql(db_path: str, sql: str, fetch: Union[str, int, FetchBudget] = "all", timeout: int = 60, use_cache: bool = True,
+                check_cost: bool = False) -> Any:
+    """
+    Executes an SQL query on a pooled read-only connection and fetches the results.
+
+    The query runs on the calling thread and is aborted by SQLite once the timeout, or the
+    deadline set by an enclosing `sql_deadline`, has passed. Results and compile errors are served
+    from the execution result cache when the same query was already run against the same database.
+
+    Args:
+        db_path (str): The path to the database file.
+        sql (str): The SQL query to execute.
+        fetch (Union[str, int, FetchBudget]): How to fetch the results. Options are "all", "one", "random",
+            "fingerprint", "ordered_fingerprint", a FetchBudget, or an integer.
+        timeout (int): The maximum number of seconds the query may run.
+        use_cache (bool): Whether to read and populate the execution result cache.
+        check_cost (bool): Whether to reject queries with an explosive plan before executing them.
+            Results that are already cached are returned regardless of their cost.
+
+    Returns:
+        Any: The fetched results based on the fetch argument.
+
+    Raises:
+        TimeoutError: If the query exceeds the timeout or the active deadline.
+        QueryTooExpensiveError: If check_cost is set and the query's plan is too expensive.
+        Exception: If an error occurs during SQL execution.
+    """
+    cache_key = None
+    if use_cache and fetch != "random":
+        result_cache = get_result_cache()
+        cache_key = result_cache.make_key(db_path, sql, fetch)
+        found, entry = result_cache.get(cache_key)
+        if found:
+            is_error, value = entry
+            if is_error:
+                raise value.with_traceback(None)
+            if isinstance(value, CappedResult):
+                return value._replace(rows=list(value.rows))
+            return list(value) if isinstance(value, list) else value
+    if check_cost:
+        check_query_cost(db_path, sql)
+    try:
+        result = _execute_sql(db_path, sql, fetch, timeout)
+    except sqlite3.Error as e:
+        # Transient errors such as a locked or unreadable database are retried on the next call.
+        if cache_key is not None and is_deterministic_error(e):
+            result_cache.put(cache_key, (True, e))
+        raise
+    if cache_key is not None:
+        result_cache.put(cache_key, (False, result))
+    return result
+
+def is_deterministic_error(error: sqlite3.Error) -> bool:
+    """Checks whether an SQL error comes from compiling the query rather than from the state of the database."""
+    return str(error).lower().startswith(DETERMINISTIC_ERROR_PREFIXES)
+
+def _execute_sql(db_path: str, sql: str, fetch: Union[str, int, FetchBudget], timeout: int) -> Any:
+    """Executes an SQL query on a pooled connection under the query and ambient deadlines."""
+    deadline = QueryDeadline(timeout)
+    outer_deadline = _active_deadline.get()
+
+    def _should_abort() -> bool:
+        return deadline.expired() or (outer_deadline is not None and outer_deadline.expired())
+
+    if outer_deadline is not None and outer_deadline.expired():
+        raise TimeoutError(f"SQL deadline of {outer_deadline.timeout} seconds expired before the query started.")
+    with get_connection_pool(db_path).connection() as conn:
+        if outer_deadline is not None:
+            outer_deadline._register(conn)
+        conn.set_progress_handler(_should_abort, PROGRESS_HANDLER_STEPS)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            return _fetch_results(cursor, fetch)
+        except sqlite3.OperationalError as e:
+            if deadline.expired():
+                raise TimeoutError(f"SQL query execution exceeded the timeout of {timeout} seconds.") from e
+            if outer_deadline is not None and outer_deadline._cancelled:
+                raise TimeoutError("SQL query execution was cancelled.") from e
+            if outer_deadline is not None and outer_deadline.expired():
+                raise TimeoutError(f"SQL query execution exceeded the deadline of {outer_deadline.timeout} seconds.") from e
+            raise
+        finally:
+            cursor.close()
+            conn.set_progress_handler(None, PROGRESS_HANDLER_STEPS)
+            if outer_deadline is not None:
+                outer_deadline._unregister(conn)
+
+
+EXECUTE_MANY_WORKERS = int(os.getenv("SQL_EXECUTE_MANY_WORKERS", 8))
+
+class ShadowTriage(NamedTuple):
+    """
+    The outcome of running a query on the shadow database.
+
+    Attributes:
+        error (Optional[Exception]): The compile error the query raised, which it also raises on the full database.
+        row_count (int): The number of rows returned on the shadow database.
+        signature (Optional[str]): The fingerprint of the shadow result, a cheap cluster signature, or None
+            if the query did not finish on the shadow database.
+    """
+    error: Optional[Exception]
+    row_count: int
+    signature: Optional[str]
+
+def triage_sqls(db_path: str, sqls: List[str], timeout: float = SHADOW_TRIAGE_TIMEOUT) -> Optional[List[ShadowTriage]]:
+    """
+    Runs queries on the sampled shadow database of a database built during preprocessing.
+
+    The shadow database has the same schema, so errors raised while compiling a query are final.
+    Other errors, such as a locked or interrupted database, and timeouts on the sample are not: the
+    triage timeout is much shorter than the execution timeout, so those queries are left for the
+    full database to decide. An empty shadow result or a
+    shared signature is only a hint, because a sample cannot prove that the full results agree.
+
+    Args:
+        db_path (str): The path to the database file.
+        sqls (List[str]): The SQL queries to triage.
+        timeout (float): The maximum number of seconds each query may run on the shadow database.
+
+    Returns:
+        Optional[List[ShadowTriage]]: The triage of each query, or None if there is no shadow database.
+    """
+    shadow_path = find_shadow_db(db_path)
+    if shadow_path is None or not sqls:
+        return None
+
+    def _triage(sql: str) -> ShadowTriage:
+        try:
+            signature, row_count = execute_sql(str(shadow_path), sql, "fingerprint", timeout)
+            return ShadowTriage(None, row_count, signature)
+        except sqlite3.Error as e:
+            # Errors that depend on the state or contents of the shadow database are left to the full one.
+            return ShadowTriage(e, 0, None) if is_deterministic_error(e) else ShadowTriage(None, 0, None)
+        except TimeoutError:
+            return ShadowTriage(None, 0, None)
+
+    with ThreadPoolExecutor(max_workers=min(EXECUTE_MANY_WORKERS, len(sqls))) as executor:
+        return list(executor.map(lambda sql: contextvars.copy_context().run(_triage, sql), sqls))
+
+def execute_many(db_path: str, sqls: List[str], fetch: Union[str, int, FetchBudget] = "all", timeout: int = 60,
+                 check_cost: bool = False, triage: bool = False) -> List[Any]:
+    """
+    Executes a set of SQL queries concurrently under one shared deadline.
+
+    Queries that normalize to the same SQL are executed once. The queries run on a bounded thread
+    pool; SQLite releases the GIL while a statement runs, so independent queries overlap.
+
+    Args:
+        db_path (str): The path to the database file.
+        sqls (List[str]): The SQL queries to execute.
+        fetch (Union[str, int, FetchBudget]): How to fetch the results. Options are "all", "one", "random",
+            "fingerprint", "ordered_fingerprint", a FetchBudget, or an integer.
+        timeout (int): The maximum number of seconds all queries together may take.
+        check_cost (bool): Whether to reject queries with an explosive plan before executing them.
+        triage (bool): Whether to run the queries on the shadow database first and execute only
+            those without SQL errors on the full database. Ignored if no shadow database was built.
+
+    Returns:
+        List[Any]: For each query, its result or the exception it raised.
+    """
+    if triage:
+        triaged = triage_sqls(db_path, sqls)
+        if triaged is not None:
+            survivors = [sql for sql, shadow in zip(sqls, triaged) if shadow.error is None]
+            survivor_results = iter(execute_many(db_path, survivors, fetch, timeout, check_cost))
+            return [shadow.error if shadow.error is not None else next(survivor_results) for shadow in triaged]
+    unique_sqls: Dict[str, str] = {}
+    for sql in sqls:
+        unique_sqls.setdefault(normalize_sql(sql), sql)
+    if not unique_sqls:
+        return []
+
+    def _run(sql: str) -> Any:
+        try:
+            return execute_sql(db_path, sql, fetch, timeout, check_cost=check_cost)
+        except Exception as e:
+            return e
+
+    with sql_deadline(timeout):
+        with ThreadPoolExecutor(max_workers=min(EXECUTE_MANY_WORKERS, len(unique_sqls))) as executor:
+            futures = {
+                normalized_sql: executor.submit(contextvars.copy_context().run, _run, sql)
+                for normalized_sql, sql in unique_sqls.items()
+            }
+            results = {normalized_sql: future.result() for normalized_sql, future in futures.items()}
+    return [results[normalize_sql(sql)] for sql in sqls]
 
 def _clean_sql(sql: str) -> str:
     """
@@ -65,104 +431,6 @@ def _clean_sql(sql: str) -> str:
     """
     return sql.replace('\n', ' ').replace('"', "'").strip("`.")
 
-def create_smaller_db(original_db_path, max_rows=100000):
-    if not os.path.exists(original_db_path):
-        raise FileNotFoundError("The specified database does not exist.")
-
-    base, ext = os.path.splitext(original_db_path)
-    new_db_path = f"{base}_small{ext}"
-    conn_orig = sqlite3.connect(original_db_path)
-    conn_new = sqlite3.connect(new_db_path)
-    cursor_orig = conn_orig.cursor()
-    cursor_orig.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor_orig.fetchall()
-    cursor_new = conn_new.cursor()
-    
-    for table in tables:
-        if table[0] == "sqlite_sequence":
-          continue
-        table_name = table[0]
-        cursor_orig.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-        ddl = cursor_orig.fetchone()[0]
-        cursor_new.execute(ddl)
-        cursor_orig.execute(f"SELECT * FROM `{table_name}` ORDER BY RANDOM() LIMIT {max_rows}")
-        rows = cursor_orig.fetchall()
-        cursor_new.executemany(f"INSERT INTO `{table_name}` VALUES ({','.join(['?' for _ in range(len(rows[0]))])})", rows)
-        conn_new.commit()
-
-    conn_orig.close()
-    conn_new.close()
-    return new_db_path
-
-def task(queue, db_path, sql, fetch):
-    try:
-        result = execute_sql(db_path, sql, fetch)
-        queue.put(result)
-    except Exception as e:
-        queue.put(e)
-
-def subprocess_sql_executor(db_path: str, sql: str, timeout: int = 60):
-    queue = Queue()
-    process = Process(target=task, args=(queue, db_path, sql, "all"))
-    process.start()
-    process.join(timeout)
-    if process.is_alive():
-        process.terminate()
-        process.join()
-        print("Time out in subprocess_sql_executor")
-        raise TimeoutError("Execution timed out.")
-    else:
-        try:
-            result = queue.get_nowait()
-        except Empty:
-            raise Exception("No data returned from the process.")
-        
-        if isinstance(result, Exception):
-            raise result
-        return result
-
-# def execute_sql(db_path: str, sql: str, fetch: Union[str, int] = "all") -> Any:
-#     """
-#     Executes an SQL query on a database and fetches results.
-    
-#     Args:
-#         db_path (str): The path to the database file.
-#         sql (str): The SQL query to execute.
-#         fetch (Union[str, int]): How to fetch the results. Options are "all", "one", "random", or an integer.
-        
-#     Returns:
-#         Any: The fetched results based on the fetch argument.
-    
-#     Raises:
-#         Exception: If an error occurs during SQL execution.
-#     """
-#     if fetch == "limited":
-#         original_db_path = db_path
-#         base, ext = os.path.splitext(db_path)
-#         db_path = f"{base}_small{ext}"
-#         if not os.path.exists(db_path):
-#             print("Creating the smaller db_path")
-#             create_smaller_db(original_db_path)
-#     try:
-#         with sqlite3.connect(db_path, timeout=60) as conn:
-#             cursor = conn.cursor()
-#             if fetch == "all":
-#                 return cursor.execute(sql).fetchall()
-#             elif fetch == "one":
-#                 return cursor.execute(sql).fetchone()
-#             elif fetch == "random":
-#                 samples = cursor.execute(sql).fetchmany(10)
-#                 return random.choice(samples) if samples else []
-#             elif isinstance(fetch, int):
-#                 return cursor.execute(sql).fetchmany(fetch)
-#             elif fetch == "limited":
-#                 return  cursor.execute(sql).fetchall()   
-#             else:
-#                 raise ValueError("Invalid fetch argument. Must be 'all', 'one', 'random', 'limited', or an integer.")
-#     except Exception as e:
-#         logging.error(f"Error in execute_sql: {e}\nSQL: {sql}, fetch: {fetch}")
-#         raise e
-
 def _compare_sqls_outcomes(db_path: str, predicted_sql: str, ground_truth_sql: str) -> int:
     """
     Compares the outcomes of two SQL queries to check for equivalence.
@@ -180,8 +448,15 @@ def _compare_sqls_outcomes(db_path: str, predicted_sql: str, ground_truth_sql: s
     """
     try:
         predicted_res = execute_sql(db_path, predicted_sql)
-        ground_truth_res = execute_sql(db_path, ground_truth_sql)
-        return int(set(predicted_res) == set(ground_truth_res))
+        gold_result = lookup_gold_result(db_path, ground_truth_sql)
+        if gold_result is None:
+            ground_truth_res = execute_sql(db_path, ground_truth_sql)
+            return int(set(predicted_res) == set(ground_truth_res))
+        if gold_result["status"] == GOLD_STATUS_TIMEOUT:
+            raise TimeoutError(gold_result["error"])
+        if gold_result["status"] == GOLD_STATUS_ERROR:
+            raise Exception(gold_result["error"])
+        return int(result_set_fingerprint(predicted_res) == gold_result["fingerprint"])
     except Exception as e:
         logging.critical(f"Error comparing SQL outcomes: {e}")
         raise e
@@ -201,9 +476,10 @@ def compare_sqls(db_path: str, predicted_sql: str, ground_truth_sql: str, meta_t
     """
     predicted_sql = _clean_sql(predicted_sql)
     try:
-        res = func_timeout(meta_time_out, _compare_sqls_outcomes, args=(db_path, predicted_sql, ground_truth_sql))
+        with sql_deadline(meta_time_out):
+            res = _compare_sqls_outcomes(db_path, predicted_sql, ground_truth_sql)
         error = "incorrect answer" if res == 0 else "--"
-    except FunctionTimedOut:
+    except TimeoutError:
         logging.warning("Comparison timed out.")
         error = "timeout"
         res = 0
@@ -213,6 +489,42 @@ def compare_sqls(db_path: str, predicted_sql: str, ground_truth_sql: str, meta_t
         res = 0
     return {'exec_res': res, 'exec_err': error}
 
+def _summarize_gold_sql(db_path: str, sql: str, timeout: int) -> Dict[str, Any]:
+    try:
+        result = execute_sql(db_path, sql, "all", timeout, use_cache=False)
+        return {"status": GOLD_STATUS_OK, "fingerprint": result_set_fingerprint(result), "num_rows": len(result)}
+    except TimeoutError as e:
+        return {"status": GOLD_STATUS_TIMEOUT, "error": str(e)}
+    except Exception as e:
+        return {"status": GOLD_STATUS_ERROR, "error": str(e)}
+
+def precompute_gold_results(db_path: str, gold_sqls: List[str], timeout: int = 120) -> int:
+    """
+    Executes every gold SQL query of a database once and stores the result fingerprints in the gold result cache,
+    which `compare_sqls` consults instead of re-executing the ground truth.
+
+    Queries already cached for the current version of the database are skipped.
+
+    Args:
+        db_path (str): The path to the database file.
+        gold_sqls (List[str]): The gold SQL queries of the database.
+        timeout (int): The maximum number of seconds each query may run.
+
+    Returns:
+        int: The number of queries executed.
+    """
+    gold_results = load_gold_results(db_path)
+    executed = 0
+    for sql in gold_sqls:
+        key = gold_sql_key(sql)
+        if key in gold_results:
+            continue
+        gold_results[key] = _summarize_gold_sql(db_path, sql, timeout)
+        executed += 1
+    save_gold_results(db_path, gold_results)
+    logging.info(f"Gold results for {db_path}: {executed} executed, {len(gold_results)} cached")
+    return executed
+
 def validate_sql_query(db_path: str, sql: str, max_returned_rows: int = 30) -> Dict[str, Union[str, Any]]:
     """
     Validates an SQL query by executing it and returning the result.
@@ -249,8 +561,7 @@ def aggregate_sqls(db_path: str, sqls: List[str]) -> str:
     # Group queries by unique result sets
     for result in results:
         if result['STATUS'] == 'OK':
-            # Using a frozenset as the key to handle unhashable types like lists
-            key = frozenset(tuple(row) for row in result['RESULT'])
+            key = result_set_fingerprint(result['RESULT'])
             if key in clusters:
                 clusters[key].append(result['SQL'])
             else:
@@ -273,6 +584,7 @@ class ExecutionStatus(Enum):
     ZERO_COUNT_RESULT = "ZERO_COUNT_RESULT"
     ALL_NONE_RESULT = "ALL_NONE_RESULT"
     SYNTACTICALLY_INCORRECT = "SYNTACTICALLY_INCORRECT"
+    EXCESSIVE_COST = "EXCESSIVE_COST"
     
 def get_execution_status(db_path: str, sql: str, execution_result: List = None) -> ExecutionStatus:
     """
@@ -286,8 +598,11 @@ def get_execution_status(db_path: str, sql: str, execution_result: List = None)
     """
     if not execution_result:
         try:
-            execution_result = execute_sql(db_path, sql, fetch="all")
-        except FunctionTimedOut:
+            # Telling an empty result apart only needs the first row.
+            execution_result = execute_sql(db_path, sql, fetch=1, check_cost=True)
+        except QueryTooExpensiveError:
+            return ExecutionStatus.EXCESSIVE_COST
+        except TimeoutError:
             print("Timeout in get_execution_status")
             return ExecutionStatus.SYNTACTICALLY_INCORRECT
         except Exception:
@@ -304,35 +619,3 @@ def get_execution_status(db_path: str, sql: str, execution_result: List = None)
     # elif all([all([val is None for val in res]) for res in execution_result]):
     #     return ExecutionStatus.ALL_NONE_RESULT
     return ExecutionStatus.SYNTACTICALLY_CORRECT
-
-def run_with_timeout(func, *args, timeouts=[3, 5]):
-    def wrapper(stop_event, *args):
-        try:
-            if not stop_event.is_set():
-                result[0] = func(*args)
-        except Exception as e:
-            result[1] = e
-
-    for attempt, timeout in enumerate(timeouts):
-        result = [None, None]
-        stop_event = threading.Event()
-        thread = threading.Thread(target=wrapper, args=(stop_event, *args))
-        thread.start()
-
-        # Wait for the thread to complete or timeout
-        thread.join(timeout)
-
-        if thread.is_alive():
-            logging.error(f"Function {func.__name__} timed out after {timeout} seconds on attempt {attempt + 1}/{len(timeouts)}")
-            stop_event.set()  # Signal the thread to stop
-            thread.join()  # Wait for the thread to recognize the stop event
-            if attempt == len(timeouts) - 1:
-                raise TimeoutException(
-                    f"Function {func.__name__} timed out after {timeout} seconds on attempt {attempt + 1}/{len(timeouts)}"
-                )
-        else:
-            if result[1] is not None:
-                raise result[1]
-            return result[0]
-
-    raise TimeoutException(f"Function {func.__name__} failed to complete after {len(timeouts)} attempts")
@@ -0,0 +1,108 @@
+import json
+import hashlib
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from database_utils.result_cache import normalize_sql
+from database_utils.connection_pool import database_file_signature
+
+GOLD_STATUS_OK = "ok"
+GOLD_STATUS_ERROR = "error"
+GOLD_STATUS_TIMEOUT = "timeout"
+
+_loaded_gold_results: Dict[str, Tuple[int, Dict[str, Dict[str, Any]]]] = {}
+_loaded_gold_results_lock = Lock()
+
+def gold_results_path(db_path: str) -> Path:
+    """
+    Returns the path of the gold result cache of a database.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        Path: The path to `preprocessed/{db_id}_gold_results.json` next to the database.
+    """
+    db_path = Path(db_path)
+    return db_path.parent / "preprocessed" / f"{db_path.stem}_gold_results.json"
+
+def gold_sql_key(sql: str) -> str:
+    """
+    Computes the cache key of a gold SQL query.
+
+    Args:
+        sql (str): The gold SQL query.
+
+    Returns:
+        str: The hash of the normalized query.
+    """
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+def _database_version(db_path: str) -> str:
+    return ":".join(map(str, database_file_signature(db_path)))
+
+def load_gold_results(db_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Loads the gold result cache of a database from disk.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The cached summaries keyed by `gold_sql_key`, or an empty dict if the
+        cache is missing or was computed against a different version of the database file.
+    """
+    cache_path = gold_results_path(db_path)
+    if not cache_path.exists():
+        return {}
+    with cache_path.open("r") as file:
+        cached = json.load(file)
+    if cached.get("db_version") != _database_version(db_path):
+        logging.warning(f"Ignoring stale gold result cache {cache_path}")
+        return {}
+    return cached["results"]
+
+def save_gold_results(db_path: str, gold_results: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Writes the gold result cache of a database to disk.
+
+    Args:
+        db_path (str): The path to the database file.
+        gold_results (Dict[str, Dict[str, Any]]): The summaries keyed by `gold_sql_key`.
+    """
+    cache_path = gold_results_path(db_path)
+    cache_path.parent.mkdir(exist_ok=True)
+    with cache_path.open("w") as file:
+        json.dump({"db_version": _database_version(db_path), "results": gold_results}, file, separators=(",", ":"))
+
+def lookup_gold_result(db_path: str, sql: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks up the precomputed result of a gold SQL query.
+
+    The cache is ignored if it was computed against a different version of the database file.
+
+    Args:
+        db_path (str): The path to the database file.
+        sql (str): The gold SQL query.
+
+    Returns:
+        Optional[Dict[str, Any]]: The cached summary, or None if the query was not precomputed.
+    """
+    cache_path = gold_results_path(db_path)
+    try:
+        cache_mtime = cache_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = str(cache_path)
+    with _loaded_gold_results_lock:
+        loaded = _loaded_gold_results.get(key)
+        if loaded is None or loaded[0] != cache_mtime:
+            try:
+                loaded = (cache_mtime, load_gold_results(db_path))
+            except Exception as e:
+                logging.error(f"Error loading gold result cache {cache_path}: {e}")
+                loaded = (cache_mtime, {})
+            _loaded_gold_results[key] = loaded
+    return loaded[1].get(gold_sql_key(sql))
@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+def manifest_path(db_directory_path: str) -> Path:
+    """
+    Returns the path of the manifest recording what the preprocessed indexes of a database were built from.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+
+    Returns:
+        Path: The path to `preprocessed/{db_id}_index_manifest.json`.
+    """
+    db_id = Path(db_directory_path).name
+    return Path(db_directory_path) / "preprocessed" / f"{db_id}_index_manifest.json"
+
+def load_manifest(db_directory_path: str) -> Dict[str, Any]:
+    """
+    Loads the index manifest of a database.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+
+    Returns:
+        Dict[str, Any]: The manifest sections keyed by index, empty if no manifest exists.
+    """
+    path = manifest_path(db_directory_path)
+    if not path.exists():
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+def save_manifest_section(db_directory_path: str, section: str, content: Dict[str, Any]) -> None:
+    """
+    Replaces one section of the index manifest of a database.
+
+    Args:
+        db_directory_path (str): The path to the database directory.
+        section (str): The index the section describes, e.g. "lsh" or "context_vector_db".
+        content (Dict[str, Any]): The new content of the section.
+    """
+    manifest = load_manifest(db_directory_path)
+    manifest[section] = content
+    path = manifest_path(db_directory_path)
+    path.parent.mkdir(exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, path)
+
+def fingerprint_values(values: Iterable[str]) -> str:
+    """
+    Fingerprints a set of distinct values independently of their order.
+
+    Args:
+        values (Iterable[str]): The values.
+
+    Returns:
+        str: The hex digest of the sorted values.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in sorted(values):
+        digest.update(value.encode("utf-8", errors="surrogatepass"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def fingerprint_file(path: Path) -> str:
+    """
+    Fingerprints the content of a file.
+
+    Args:
+        path (Path): The path to the file.
+
+    Returns:
+        str: The hex digest of the file's bytes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
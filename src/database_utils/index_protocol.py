@@ -0,0 +1,169 @@
+import json
+import time
+import socket
+import logging
+import numpy as np
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+LENGTH_PREFIX_BYTES = 4
+MAX_HEADER_BYTES = 64 << 20
+MAX_PAYLOAD_BYTES = 1 << 30
+CONNECT_TIMEOUT = 1.0
+RETRY_INTERVAL = 30.0
+
+def _encode(value: Any, buffers: List[Tuple[str, Any]]) -> Any:
+    """Replaces NumPy arrays and bytes by references to raw buffers sent after the JSON header."""
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        buffers.append(("array", array))
+        return {"__buffer__": len(buffers) - 1, "dtype": array.dtype.str, "shape": list(array.shape)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        buffers.append(("bytes", bytes(value)))
+        return {"__buffer__": len(buffers) - 1}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(key): _encode(item, buffers) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, buffers) for item in value]
+    return value
+
+def _decode(value: Any, buffers: List[bytes]) -> Any:
+    if isinstance(value, dict):
+        if "__buffer__" in value:
+            data = buffers[value["__buffer__"]]
+            if "dtype" not in value:
+                return data
+            dtype = np.dtype(value["dtype"])
+            if dtype.hasobject:
+                raise ValueError("Object arrays are not accepted")
+            return np.frombuffer(data, dtype=dtype).reshape(value["shape"]).copy()
+        return {key: _decode(item, buffers) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item, buffers) for item in value]
+    return value
+
+def send_message(conn: socket.socket, message: Any) -> None:
+    """
+    Sends a message as a length-prefixed JSON header followed by its raw binary buffers.
+
+    The message may contain JSON values, NumPy arrays and bytes. Arrays and bytes are sent as raw
+    buffers listed in the header, so no received data is ever executed.
+
+    Args:
+        conn (socket.socket): The connected socket.
+        message (Any): The message to send.
+    """
+    buffers: List[Tuple[str, Any]] = []
+    header = {"message": _encode(message, buffers), "buffers": []}
+    payloads = []
+    for kind, buffer in buffers:
+        data = buffer.tobytes() if kind == "array" else buffer
+        header["buffers"].append(len(data))
+        payloads.append(data)
+    header_bytes = json.dumps(header).encode("utf-8")
+    conn.sendall(len(header_bytes).to_bytes(LENGTH_PREFIX_BYTES, byteorder='big') + header_bytes)
+    for data in payloads:
+        conn.sendall(data)
+
+def _receive_exactly(conn: socket.socket, num_bytes: int, chunk_size: int) -> Optional[bytes]:
+    chunks = []
+    bytes_received = 0
+    while bytes_received < num_bytes:
+        chunk = conn.recv(min(num_bytes - bytes_received, chunk_size))
+        if not chunk:
+            if bytes_received == 0:
+                return None
+            raise ConnectionError("Connection lost")
+        chunks.append(chunk)
+        bytes_received += len(chunk)
+    return b''.join(chunks)
+
+def receive_message(conn: socket.socket, chunk_size: int = 1 << 16) -> Any:
+    """
+    Receives a message sent with `send_message`.
+
+    Args:
+        conn (socket.socket): The connected socket.
+        chunk_size (int): The maximum number of bytes read per call.
+
+    Returns:
+        Any: The message, or None if the peer closed the connection.
+
+    Raises:
+        ValueError: If the message is malformed or larger than the protocol allows.
+    """
+    length_bytes = _receive_exactly(conn, LENGTH_PREFIX_BYTES, LENGTH_PREFIX_BYTES)
+    if length_bytes is None:
+        return None
+    header_length = int.from_bytes(length_bytes, byteorder='big')
+    if header_length > MAX_HEADER_BYTES:
+        raise ValueError(f"Message header of {header_length} bytes exceeds {MAX_HEADER_BYTES} bytes")
+    header_bytes = _receive_exactly(conn, header_length, chunk_size) if header_length else b""
+    if header_bytes is None:
+        raise ConnectionError("Connection lost")
+    header = json.loads(header_bytes.decode("utf-8"))
+    buffer_lengths = header.get("buffers", [])
+    if not all(isinstance(length, int) and length >= 0 for length in buffer_lengths) or sum(buffer_lengths) > MAX_PAYLOAD_BYTES:
+        raise ValueError("Invalid message buffers")
+    buffers = []
+    for length in buffer_lengths:
+        data = _receive_exactly(conn, length, chunk_size) if length else b""
+        if data is None:
+            raise ConnectionError("Connection lost")
+        buffers.append(data)
+    return _decode(header["message"], buffers)
+
+class IndexServerClient:
+    """
+    A client of the index server that remembers when the server is unreachable.
+
+    The server listens on a Unix domain socket. Every read is bounded by `timeout`; after a failed
+    connection or a timeout the client reports the server as unavailable for `RETRY_INTERVAL`
+    seconds, so callers fall back to in-process indexes without paying a connection attempt per query.
+
+    Attributes:
+        socket_path (Optional[str]): The path of the server's socket, or None to never use it.
+        timeout (float): The maximum time in seconds to wait for the server to answer.
+    """
+
+    def __init__(self, socket_path: Optional[str], timeout: float):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._unavailable_until = 0.0
+        self._lock = Lock()
+
+    def available(self) -> bool:
+        return bool(self.socket_path) and time.monotonic() >= self._unavailable_until
+
+    def query(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Sends a batch of requests to the index server.
+
+        Args:
+            requests (List[Dict[str, Any]]): The requests, each with a "type" and its arguments.
+
+        Returns:
+            List[Dict[str, Any]]: For each request, {"status": "ok", "result": ...} or {"status": "error", "error": ...}.
+
+        Raises:
+            ConnectionError: If the server is unavailable or does not answer in time.
+        """
+        if not self.available():
+            raise ConnectionError("Index server is unavailable")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.settimeout(CONNECT_TIMEOUT)
+                conn.connect(self.socket_path)
+                conn.settimeout(self.timeout)
+                send_message(conn, {"type": "batch", "requests": requests})
+                responses = receive_message(conn)
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._unavailable_until = time.monotonic() + RETRY_INTERVAL
+            logging.info(f"Index server at {self.socket_path} is unavailable, using in-process indexes: {e}")
+            raise ConnectionError(f"Index server is unavailable: {e}") from e
+        if responses is None:
+            raise ConnectionError("Index server closed the connection")
+        return responses
@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+from threading import Lock, Timer
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from sqlglot import parse_one, exp
+
+from database_utils.connection_pool import get_connection_pool
+from database_utils.result_cache import database_fingerprint
+
+EQUALITY_SEARCH_ROWS = 10
+RANGE_SEARCH_SELECTIVITY = 0.25
+ROW_COUNT_TIMEOUT = float(os.getenv("SQL_ROW_COUNT_TIMEOUT", 10))
+
+_LOOP_PATTERN = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\S+)(?: AS (\S+))?(.*)$")
+_INDEX_PATTERN = re.compile(r"USING (?:COVERING )?INDEX (\S+) \((.*)\)$")
+_PRIMARY_KEY_PATTERN = re.compile(r"USING PRIMARY KEY \((.*)\)$")
+_CONTAINER_PATTERN = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (.+)$")
+
+_table_row_counts: Dict[str, Dict[str, int]] = {}
+_table_row_counts_lock = Lock()
+
+def _read_stat1_row_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Reads the table row counts recorded by ANALYZE, if the database was analyzed."""
+    try:
+        rows = conn.execute("SELECT tbl, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.Error:
+        return {}
+    row_counts: Dict[str, int] = {}
+    for table_name, stat in rows:
+        # The first number of every entry of a table is its row count.
+        count = (stat or "").split(" ", 1)[0]
+        if count.isdigit():
+            row_counts[table_name.lower()] = max(row_counts.get(table_name.lower(), 0), int(count))
+    return row_counts
+
+def get_table_row_counts(db_path: str) -> Dict[str, int]:
+    """
+    Retrieves the number of rows of every table, counted once per version of the database file.
+
+    The counts recorded in `sqlite_stat1` are used when the database was analyzed. The other tables
+    are counted with `COUNT(*)` within `ROW_COUNT_TIMEOUT` seconds in total; tables that could not
+    be counted in time are left out.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        Dict[str, int]: The row counts keyed by lower-cased table name.
+    """
+    fingerprint = database_fingerprint(db_path)
+    with _table_row_counts_lock:
+        if fingerprint in _table_row_counts:
+            return _table_row_counts[fingerprint]
+    expires_at = time.monotonic() + ROW_COUNT_TIMEOUT
+    with get_connection_pool(db_path).connection() as conn:
+        row_counts = _read_stat1_row_counts(conn)
+        table_names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        # COUNT(*) runs as a single step that the progress handler cannot stop, so it is interrupted instead.
+        interrupt_timer = Timer(ROW_COUNT_TIMEOUT, conn.interrupt)
+        interrupt_timer.start()
+        try:
+            for table_name in table_names:
+                if table_name.lower() in row_counts:
+                    continue
+                try:
+                    row_counts[table_name.lower()] = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+                except sqlite3.Error as e:
+                    if time.monotonic() > expires_at:
+                        logging.warning(f"Stopped counting the rows of {db_path} after {ROW_COUNT_TIMEOUT} seconds at {table_name}")
+                        break
+                    logging.warning(f"Could not count the rows of {table_name} in {db_path}: {e}")
+        finally:
+            interrupt_timer.cancel()
+    with _table_row_counts_lock:
+        _table_row_counts[fingerprint] = row_counts
+    return row_counts
+
+@lru_cache(maxsize=256)
+def _get_unique_keys(db_fingerprint: str, db_path: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Finds the indexes that identify a single row.
+
+    Returns:
+        Tuple[Dict[str, int], Dict[str, int]]: The number of columns of every unique, non-partial index
+            keyed by lower-cased index name, and of the primary key of every WITHOUT ROWID table keyed by
+            lower-cased table name.
+    """
+    unique_indexes: Dict[str, int] = {}
+    primary_keys: Dict[str, int] = {}
+    with get_connection_pool(db_path).connection() as conn:
+        table_names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for table_name in table_names:
+            try:
+                indexes = conn.execute(f'PRAGMA index_list("{table_name}")').fetchall()
+                for _, index_name, unique, origin, partial in indexes:
+                    if not unique or partial:
+                        continue
+                    num_columns = len(conn.execute(f'PRAGMA index_info("{index_name}")').fetchall())
+                    unique_indexes[index_name.lower()] = num_columns
+                    if origin == "pk":
+                        primary_keys[table_name.lower()] = num_columns
+            except sqlite3.Error as e:
+                logging.warning(f"Could not read the indexes of {table_name} in {db_path}: {e}")
+    return unique_indexes, primary_keys
+
+def _table_aliases(sql: str) -> Dict[str, str]:
+    """Maps the aliases used in a query to the names of the tables they refer to."""
+    try:
+        tree = parse_one(sql, read="sqlite")
+    except Exception:
+        return {}
+    return {table.alias_or_name.lower(): table.name.lower() for table in tree.find_all(exp.Table)}
+
+def _search_rows(constraint: str, table_name: str, table_rows: float,
+                 unique_keys: Tuple[Dict[str, int], Dict[str, int]]) -> float:
+    """Estimates the number of rows an index search visits per lookup."""
+    if "<" in constraint or ">" in constraint:
+        return max(1.0, table_rows * RANGE_SEARCH_SELECTIVITY)
+    if "=" not in constraint:
+        return 1.0
+    if "INTEGER PRIMARY KEY" in constraint:
+        return 1.0
+    unique_indexes, primary_keys = unique_keys
+    index = _INDEX_PATTERN.search(constraint)
+    primary_key = _PRIMARY_KEY_PATTERN.search(constraint)
+    if index:
+        key_columns, terms = unique_indexes.get(index.group(1).lower()), index.group(2)
+    elif primary_key:
+        key_columns, terms = primary_keys.get(table_name), primary_key.group(1)
+    else:
+        key_columns, terms = None, ""
+    # An equality on every column of a unique key finds at most one row.
+    if key_columns is not None and terms.count("=?") >= key_columns:
+        return 1.0
+    return max(1.0, min(table_rows, EQUALITY_SEARCH_ROWS))
+
+def _estimate_plan(plan: List[Tuple[int, int, str]], row_counts: Dict[str, int], aliases: Dict[str, str],
+                   unique_keys: Tuple[Dict[str, int], Dict[str, int]] = ({}, {})) -> float:
+    """
+    Estimates the number of row visits of a query plan.
+
+    Consecutive SCAN and SEARCH steps under the same parent are nested loops, so their row counts
+    multiply. Correlated subqueries run once per row of the enclosing loops; other subqueries run once.
+
+    Args:
+        plan (List[Tuple[int, int, str]]): The (id, parent, detail) rows of EXPLAIN QUERY PLAN.
+        row_counts (Dict[str, int]): The row counts keyed by lower-cased table name.
+        aliases (Dict[str, str]): The table names keyed by lower-cased alias.
+        unique_keys (Tuple[Dict[str, int], Dict[str, int]]): The unique indexes and primary keys of the database.
+
+    Returns:
+        float: The estimated number of row visits.
+    """
+    children: Dict[int, List[Tuple[int, str]]] = {}
+    for node_id, parent_id, detail in plan:
+        children.setdefault(parent_id, []).append((node_id, detail))
+    materialized_rows: Dict[str, float] = {}
+
+    def _estimate(parent_id: int) -> Tuple[float, float]:
+        work = 0.0
+        loop_rows = 1.0
+        has_loops = False
+        subquery_rows = 0.0
+        for node_id, detail in children.get(parent_id, []):
+            loop = _LOOP_PATTERN.match(detail)
+            container = _CONTAINER_PATTERN.match(detail)
+            if loop:
+                kind, name, alias, constraint = loop.groups()
+                name = name.lower()
+                name = aliases.get(name, name)
+                if name in materialized_rows:
+                    table_rows = materialized_rows[name]
+                else:
+                    table_rows = float(row_counts.get(name, 1))
+                if kind == "SCAN":
+                    rows = max(1.0, table_rows)
+                else:
+                    rows = _search_rows(constraint, name, table_rows, unique_keys)
+                    if "AUTOMATIC" in constraint:
+                        # SQLite builds a transient index over the whole table first.
+                        work += table_rows
+                loop_rows *= rows
+                work += loop_rows
+                has_loops = True
+            else:
+                sub_work, sub_rows = _estimate(node_id)
+                if container:
+                    materialized_rows[container.group(1).lower()] = sub_rows
+                if detail.startswith("CORRELATED "):
+                    work += loop_rows * sub_work
+                else:
+                    work += sub_work
+                subquery_rows += sub_rows
+        return work, loop_rows if has_loops else subquery_rows
+
+    return _estimate(0)[0]
+
+@lru_cache(maxsize=4096)
+def _cached_query_cost(db_fingerprint: str, db_path: str, sql: str) -> float:
+    with get_connection_pool(db_path).connection() as conn:
+        try:
+            plan = [(row[0], row[1], row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        except sqlite3.Error:
+            # The query itself will fail with the same error when it is executed.
+            return 0.0
+    if not plan:
+        return 0.0
+    return _estimate_plan(plan, get_table_row_counts(db_path), _table_aliases(sql), _get_unique_keys(db_fingerprint, db_path))
+
+def estimate_query_cost(db_path: str, sql: str) -> float:
+    """
+    Estimates how many rows executing a query visits, from its EXPLAIN QUERY PLAN and table row counts.
+
+    The estimate is rough but grows with the product of the tables in a nested-loop join, so
+    accidental cross joins stand out by orders of magnitude.
+
+    Args:
+        db_path (str): The path to the database file.
+        sql (str): The SQL query.
+
+    Returns:
+        float: The estimated number of row visits, or 0 if the query cannot be planned.
+    """
+    return _cached_query_cost(database_fingerprint(db_path), str(db_path), sql)
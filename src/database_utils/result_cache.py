@@ -0,0 +1,199 @@
+import os
+import pickle
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from threading import Lock
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Any, Optional, Tuple, Union
+
+from sqlglot import parse_one
+
+from database_utils.connection_pool import database_file_signature
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("SQL_RESULT_CACHE_MAX_MB", 256)) * (1 << 20)
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("SQL_RESULT_CACHE_MAX_ENTRY_MB", 16)) * (1 << 20)
+RESULT_CACHE_DIR = os.getenv("SQL_RESULT_CACHE_DIR")
+
+_SIZE_SAMPLE_ROWS = 256
+
+@lru_cache(maxsize=8192)
+def normalize_sql(sql: str) -> str:
+    """
+    Normalizes an SQL query so that formatting differences map to the same cache key.
+
+    Args:
+        sql (str): The SQL query string.
+
+    Returns:
+        str: The query as regenerated by sqlglot, or with collapsed whitespace if it cannot be parsed.
+    """
+    try:
+        return parse_one(sql, read="sqlite").sql(dialect="sqlite")
+    except Exception:
+        return " ".join(sql.split()).rstrip(";")
+
+def database_fingerprint(db_path: Union[str, Path]) -> str:
+    """
+    Identifies a database file by its path and the size and modification time of the file and its WAL.
+
+    Args:
+        db_path (Union[str, Path]): The path to the database file.
+
+    Returns:
+        str: The fingerprint of the database file.
+    """
+    return ":".join([os.path.realpath(db_path), *map(str, database_file_signature(db_path))])
+
+def _estimate_size(value: Any) -> int:
+    """Estimates the pickled size of a result from a sample of its rows."""
+    if isinstance(value, list) and len(value) > _SIZE_SAMPLE_ROWS:
+        sample_size = len(pickle.dumps(value[:_SIZE_SAMPLE_ROWS], protocol=pickle.HIGHEST_PROTOCOL))
+        return sample_size * len(value) // _SIZE_SAMPLE_ROWS
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+class ExecutionResultCache:
+    """
+    A bounded LRU cache of SQL execution results keyed by database fingerprint and normalized SQL.
+
+    The in-memory tier is evicted by total estimated size in bytes and is shared by all threads of a
+    process. When a cache directory is configured, every entry is also written to an SQLite file in
+    that directory, which worker processes share, and entries evicted from memory remain available
+    from disk.
+
+    Attributes:
+        max_bytes (int): The memory budget of the in-memory tier.
+        max_entry_bytes (int): Results larger than this are not cached.
+        cache_dir (Optional[str]): The directory of the shared on-disk tier.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, max_entry_bytes: int = RESULT_CACHE_MAX_ENTRY_BYTES,
+                 cache_dir: Optional[str] = RESULT_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_pid: Optional[int] = None
+        self._disk_lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(db_path: Union[str, Path], sql: str, fetch: Union[str, int]) -> str:
+        raw_key = f"{database_fingerprint(db_path)}\n{fetch}\n{normalize_sql(sql)}"
+        return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Looks up an entry, first in memory and then on disk.
+
+        Args:
+            key (str): The key returned by `make_key`.
+
+        Returns:
+            Tuple[bool, Any]: Whether the entry was found and the cached entry.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+        payload = self._disk_get(key)
+        if payload is not None:
+            entry = pickle.loads(payload)
+            self._memory_put(key, entry, len(payload))
+            with self._lock:
+                self.hits += 1
+            return True, entry
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key: str, entry: Any) -> None:
+        """
+        Stores an entry unless it exceeds the per-entry size limit.
+
+        Args:
+            key (str): The key returned by `make_key`.
+            entry (Any): The entry to cache.
+        """
+        size = _estimate_size(entry)
+        if size > self.max_entry_bytes:
+            return
+        self._memory_put(key, entry, size)
+        if self.cache_dir:
+            self._disk_put(key, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _memory_put(self, key: str, entry: Any, size: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (entry, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def _get_disk(self) -> Optional[sqlite3.Connection]:
+        if self._disk_pid != os.getpid():
+            # A connection inherited through fork must not be used by the child.
+            self._disk = None
+        if self._disk is None and self.cache_dir:
+            self._disk_pid = os.getpid()
+            try:
+                Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+                self._disk = sqlite3.connect(str(Path(self.cache_dir) / "sql_result_cache.sqlite"), timeout=30, check_same_thread=False)
+                self._disk.execute("PRAGMA journal_mode=WAL")
+                self._disk.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, payload BLOB)")
+                self._disk.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Could not open the SQL result cache in {self.cache_dir}: {e}")
+                self.cache_dir = None
+                self._disk = None
+        return self._disk
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        with self._disk_lock:
+            disk = self._get_disk()
+            if disk is None:
+                return None
+            try:
+                row = disk.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logging.warning(f"SQL result cache read failed: {e}")
+                return None
+            return row[0] if row else None
+
+    def _disk_put(self, key: str, payload: bytes) -> None:
+        with self._disk_lock:
+            disk = self._get_disk()
+            if disk is None:
+                return
+            try:
+                disk.execute("INSERT OR REPLACE INTO results (key, payload) VALUES (?, ?)", (key, payload))
+                disk.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"SQL result cache write failed: {e}")
+
+    def clear(self) -> None:
+        """Empties the in-memory tier."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+_result_cache: Optional[ExecutionResultCache] = None
+_result_cache_lock = Lock()
+
+def get_result_cache() -> ExecutionResultCache:
+    """Returns the process-wide execution result cache."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ExecutionResultCache()
+    return _result_cache
@@ -0,0 +1,97 @@
+import hashlib
+from typing import Any, Iterable, Tuple
+
+_MASK_128 = (1 << 128) - 1
+
+def _canonical_value(value: Any) -> Any:
+    """Maps values that compare equal in Python (e.g. 1 and 1.0) to a single representation."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def row_digest(row: Any) -> int:
+    """
+    Computes a 128-bit digest of a result row.
+
+    Args:
+        row (Any): A row returned by SQLite (usually a tuple).
+
+    Returns:
+        int: The digest of the row.
+    """
+    if isinstance(row, (tuple, list)):
+        row = tuple(_canonical_value(value) for value in row)
+    else:
+        row = _canonical_value(row)
+    return int.from_bytes(hashlib.blake2b(repr(row).encode("utf-8"), digest_size=16).digest(), "big")
+
+def _finalize(accumulator: int, count: int) -> str:
+    payload = count.to_bytes(8, "big") + accumulator.to_bytes(16, "big")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def result_set_fingerprint(rows: Iterable[Tuple]) -> str:
+    """
+    Computes an order- and duplicate-insensitive 128-bit fingerprint of a result.
+
+    Two results have the same fingerprint exactly when `set(rows)` is equal, up to hash collisions,
+    which is the equivalence used to compare predicted and gold SQL results.
+
+    Args:
+        rows (Iterable[Tuple]): The result rows.
+
+    Returns:
+        str: The fingerprint as a hex string.
+    """
+    digests = {row_digest(row) for row in rows}
+    return _finalize(sum(digests) & _MASK_128, len(digests))
+
+class ResultHasher:
+    """
+    Incrementally computes a 128-bit fingerprint of a result while its rows are fetched.
+
+    In the default unordered mode the fingerprint depends on the multiset of rows, so results that
+    only differ in row order match. In ordered mode the row order is part of the fingerprint.
+    Memory use is constant in both modes.
+
+    Attributes:
+        ordered (bool): Whether the row order is part of the fingerprint.
+        count (int): The number of rows seen so far.
+    """
+
+    def __init__(self, ordered: bool = False):
+        self.ordered = ordered
+        self.count = 0
+        self._accumulator = 0
+        self._ordered_hash = hashlib.blake2b(digest_size=16)
+
+    def update(self, row: Any) -> None:
+        digest = row_digest(row)
+        self.count += 1
+        if self.ordered:
+            self._ordered_hash.update(digest.to_bytes(16, "big"))
+        else:
+            self._accumulator = (self._accumulator + digest) & _MASK_128
+
+    def update_many(self, rows: Iterable[Any]) -> None:
+        for row in rows:
+            self.update(row)
+
+    def hexdigest(self) -> str:
+        if self.ordered:
+            return _finalize(int.from_bytes(self._ordered_hash.digest(), "big"), self.count)
+        return _finalize(self._accumulator, self.count)
+
+def result_fingerprint(rows: Iterable[Any], ordered: bool = False) -> str:
+    """
+    Computes the fingerprint of an already fetched result.
+
+    Args:
+        rows (Iterable[Any]): The result rows.
+        ordered (bool): Whether the row order is part of the fingerprint.
+
+    Returns:
+        str: The fingerprint as a hex string.
+    """
+    hasher = ResultHasher(ordered)
+    hasher.update_many(rows)
+    return hasher.hexdigest()
@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SHADOW_DB_ROWS = int(os.getenv("SHADOW_DB_ROWS", 1000))
+
+ForeignKey = Tuple[str, List[str], List[str]]
+
+def shadow_db_path(db_path: str, max_rows: int = SHADOW_DB_ROWS) -> Path:
+    """
+    Returns the path of the shadow database of a database.
+
+    Args:
+        db_path (str): The path to the database file.
+        max_rows (int): The number of rows sampled per table.
+
+    Returns:
+        Path: The path to `preprocessed/{db_id}_shadow_{max_rows}.sqlite` next to the database.
+    """
+    db_path = Path(db_path)
+    return db_path.parent / "preprocessed" / f"{db_path.stem}_shadow_{max_rows}.sqlite"
+
+def find_shadow_db(db_path: str) -> Optional[Path]:
+    """
+    Finds a shadow database built for a database.
+
+    The shadow database of `SHADOW_DB_ROWS` rows per table is preferred; otherwise the smallest
+    one built is used, whatever size it was built with.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        Optional[Path]: The path to the shadow database, or None if none was built.
+    """
+    preferred_path = shadow_db_path(db_path)
+    if preferred_path.exists():
+        return preferred_path
+    db_path = Path(db_path)
+    built_sizes = []
+    for path in (db_path.parent / "preprocessed").glob(f"{db_path.stem}_shadow_*.sqlite"):
+        max_rows = path.stem[len(f"{db_path.stem}_shadow_"):]
+        if max_rows.isdigit():
+            built_sizes.append((int(max_rows), path))
+    return min(built_sizes)[1] if built_sizes else None
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _columns(columns: List[str]) -> str:
+    return "(" + ", ".join(_quote(column) for column in columns) + ")"
+
+def _get_foreign_keys(conn: sqlite3.Connection, tables: Dict[str, str]) -> Dict[str, List[ForeignKey]]:
+    """
+    Reads the foreign keys of the source database.
+
+    Args:
+        conn (sqlite3.Connection): A connection with the source database attached as `src`.
+        tables (Dict[str, str]): The table names keyed by lower-cased name.
+
+    Returns:
+        Dict[str, List[ForeignKey]]: For each child table, its (parent table, child columns, parent columns) keys.
+    """
+    foreign_keys: Dict[str, List[ForeignKey]] = {table: [] for table in tables.values()}
+    for table in tables.values():
+        references: Dict[int, Tuple[str, List[str], List[Optional[str]]]] = {}
+        for row in conn.execute(f"PRAGMA src.foreign_key_list({_quote(table)})"):
+            key_id, _, parent, from_column, to_column = row[:5]
+            references.setdefault(key_id, (parent, [], []))
+            references[key_id][1].append(from_column)
+            references[key_id][2].append(to_column)
+        for parent, from_columns, to_columns in references.values():
+            parent_table = tables.get(parent.strip('"`[]').lower())
+            if parent_table is None:
+                logging.warning(f"Ignoring foreign key from {table} to unknown table {parent}")
+                continue
+            if any(to_column is None for to_column in to_columns):
+                # The key references the parent's primary key implicitly.
+                to_columns = [row[1] for row in sorted(conn.execute(f"PRAGMA src.table_info({_quote(parent_table)})"), key=lambda row: row[5]) if row[5] > 0]
+            if len(to_columns) != len(from_columns):
+                logging.warning(f"Ignoring malformed foreign key from {table} to {parent_table}")
+                continue
+            foreign_keys[table].append((parent_table, from_columns, to_columns))
+    return foreign_keys
+
+def _child_first_order(foreign_keys: Dict[str, List[ForeignKey]]) -> List[str]:
+    """
+    Orders the tables so that every table comes after the tables that reference it.
+
+    Reference cycles are broken at the table with the fewest unprocessed referencing tables.
+    """
+    referenced_by: Dict[str, set] = {table: set() for table in foreign_keys}
+    for child, keys in foreign_keys.items():
+        for parent, _, _ in keys:
+            if parent != child:
+                referenced_by[parent].add(child)
+    order: List[str] = []
+    remaining = set(foreign_keys)
+    while remaining:
+        table = min(remaining, key=lambda table: (len(referenced_by[table] & remaining), table))
+        order.append(table)
+        remaining.remove(table)
+    return order
+
+def _has_rowid(conn: sqlite3.Connection, table: str) -> bool:
+    try:
+        conn.execute(f"SELECT rowid FROM src.{_quote(table)} LIMIT 1").fetchall()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def _sample_table(conn: sqlite3.Connection, table: str, foreign_keys: Dict[str, List[ForeignKey]], max_rows: int) -> int:
+    """
+    Copies the rows of a table that sampled child rows reference, topped up with random rows.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the shadow database with the source attached as `src`.
+        table (str): The table to sample.
+        foreign_keys (Dict[str, List[ForeignKey]]): The foreign keys of every table.
+        max_rows (int): The number of rows to sample, unless more are needed for consistency.
+
+    Returns:
+        int: The number of rows copied.
+    """
+    incoming = [
+        (child, from_columns, to_columns)
+        for child, keys in foreign_keys.items()
+        for parent, from_columns, to_columns in keys
+        if parent == table
+    ]
+    source = f"src.{_quote(table)}"
+    if not _has_rowid(conn, table):
+        for child, from_columns, to_columns in incoming:
+            conn.execute(f"INSERT OR IGNORE INTO main.{_quote(table)} SELECT * FROM {source} "
+                         f"WHERE {_columns(to_columns)} IN (SELECT {', '.join(map(_quote, from_columns))} FROM main.{_quote(child)})")
+        count = conn.execute(f"SELECT COUNT(*) FROM main.{_quote(table)}").fetchone()[0]
+        conn.execute(f"INSERT OR IGNORE INTO main.{_quote(table)} SELECT * FROM {source} LIMIT ?", (max(0, max_rows - count),))
+        return conn.execute(f"SELECT COUNT(*) FROM main.{_quote(table)}").fetchone()[0]
+
+    conn.execute("DROP TABLE IF EXISTS temp.picked")
+    conn.execute("CREATE TEMP TABLE picked (rid INTEGER PRIMARY KEY)")
+    self_references = []
+    for child, from_columns, to_columns in incoming:
+        if child == table:
+            self_references.append((from_columns, to_columns))
+            continue
+        conn.execute(f"INSERT OR IGNORE INTO temp.picked SELECT rowid FROM {source} "
+                     f"WHERE {_columns(to_columns)} IN (SELECT {', '.join(map(_quote, from_columns))} FROM main.{_quote(child)})")
+    required = conn.execute("SELECT COUNT(*) FROM temp.picked").fetchone()[0]
+    total = conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+    needed = max_rows - required
+    if total <= max_rows:
+        conn.execute(f"INSERT OR IGNORE INTO temp.picked SELECT rowid FROM {source}")
+    elif needed > 0:
+        # Bernoulli sampling in a single scan instead of sorting the whole table by RANDOM().
+        conn.execute(f"INSERT OR IGNORE INTO temp.picked SELECT rowid FROM {source} WHERE abs(random() % ?) < ?", (total, needed))
+    # Follow self-references until every picked row's referenced row is picked as well.
+    added = 1 if self_references else 0
+    while added:
+        added = 0
+        for from_columns, to_columns in self_references:
+            added += conn.execute(
+                f"INSERT OR IGNORE INTO temp.picked SELECT rowid FROM {source} WHERE {_columns(to_columns)} IN "
+                f"(SELECT {', '.join(map(_quote, from_columns))} FROM {source} WHERE rowid IN (SELECT rid FROM temp.picked))"
+            ).rowcount
+    conn.execute(f"INSERT INTO main.{_quote(table)} SELECT * FROM {source} WHERE rowid IN (SELECT rid FROM temp.picked)")
+    copied = conn.execute("SELECT COUNT(*) FROM temp.picked").fetchone()[0]
+    conn.execute("DROP TABLE temp.picked")
+    return copied
+
+def build_shadow_db(db_path: str, max_rows: int = SHADOW_DB_ROWS) -> Path:
+    """
+    Builds a small, foreign-key-consistent sample of a database.
+
+    Tables are sampled child-first: every table first receives the rows its already sampled
+    referencing tables point to and is then topped up with random rows to `max_rows`, so joins
+    along foreign keys find their partners. The schema, indexes and views are copied unchanged,
+    so any query valid on the database is valid on the shadow database.
+
+    Args:
+        db_path (str): The path to the database file.
+        max_rows (int): The number of rows sampled per table.
+
+    Returns:
+        Path: The path to the shadow database.
+    """
+    target_path = shadow_db_path(db_path, max_rows)
+    target_path.parent.mkdir(exist_ok=True)
+    tmp_path = target_path.with_suffix(".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    # Opened as a URI so that the source can be attached read-only.
+    conn = sqlite3.connect(tmp_path.resolve().as_uri(), uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (f"{Path(db_path).resolve().as_uri()}?mode=ro",))
+        schema = conn.execute("SELECT type, name, sql FROM src.sqlite_master WHERE sql IS NOT NULL").fetchall()
+        tables = {name.lower(): name for kind, name, _ in schema if kind == "table" and not name.startswith("sqlite_")}
+        for kind, name, sql in schema:
+            if kind == "table" and name in tables.values():
+                conn.execute(sql)
+        foreign_keys = _get_foreign_keys(conn, tables)
+        for table in _child_first_order(foreign_keys):
+            copied = _sample_table(conn, table, foreign_keys, max_rows)
+            logging.info(f"Shadow database {target_path.name}: sampled {copied} rows of {table}")
+        conn.commit()
+        for kind, name, sql in schema:
+            if kind in ("index", "view"):
+                try:
+                    conn.execute(sql)
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not copy {kind} {name} to the shadow database: {e}")
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+    os.replace(tmp_path, target_path)
+    return target_path
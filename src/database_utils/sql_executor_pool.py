@@ -0,0 +1,232 @@
+import os
+import pickle
+import logging
+import itertools
+import multiprocessing
+from queue import Queue
+from threading import Lock
+from multiprocessing.connection import Connection
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from database_utils.execution import execute_sql
+from database_utils.connection_pool import get_connection_pool
+
+EXECUTOR_POOL_SIZE = int(os.getenv("SQL_EXECUTOR_POOL_SIZE", min(4, os.cpu_count() or 1)))
+RESPONSE_GRACE_PERIOD = 5
+
+SQLRequest = Tuple[str, str, Union[str, int], float]
+
+def _picklable_exception(exception: Exception) -> Exception:
+    # Exceptions whose constructor takes more than the message can be dumped but not loaded.
+    try:
+        pickle.loads(pickle.dumps(exception))
+        return exception
+    except Exception:
+        return Exception(f"{type(exception).__name__}: {exception}")
+
+def _worker_loop(conn: Connection, warm_db_paths: Sequence[str]) -> None:
+    """
+    Serves batches of SQL requests sent over a pipe until the pipe is closed.
+
+    Each request is executed with `execute_sql`, so the worker keeps one connection pool per db_path
+    open across requests and cancels timed-out queries inside SQLite. The result of each request of
+    a batch is sent back as soon as it is available, so the parent can tell which request got stuck.
+
+    Args:
+        conn (Connection): The worker's end of the pipe.
+        warm_db_paths (Sequence[str]): Databases to open connections for before serving requests.
+    """
+    for db_path in warm_db_paths:
+        try:
+            with get_connection_pool(db_path).connection():
+                pass
+        except Exception as e:
+            logging.warning(f"Could not pre-open {db_path} in SQL executor: {e}")
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        request_id, requests = message
+        for index, (db_path, sql, fetch, timeout) in enumerate(requests):
+            try:
+                response = (True, execute_sql(db_path, sql, fetch, timeout))
+            except Exception as e:
+                response = (False, _picklable_exception(e))
+            conn.send_bytes(pickle.dumps((request_id, index, response), protocol=pickle.HIGHEST_PROTOCOL))
+
+class _Worker:
+    def __init__(self, warm_db_paths: Sequence[str]):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_loop, args=(child_conn, list(warm_db_paths)), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class SQLExecutorPool:
+    """
+    A long-lived pool of pre-started processes that execute SQL queries.
+
+    Requests are dispatched to idle workers over pipes. A worker that does not answer within the
+    request deadline plus a grace period is killed and replaced, so a runaway query can never block
+    the pool.
+
+    Attributes:
+        num_workers (int): The number of worker processes.
+        warm_db_paths (List[str]): Databases every worker opens connections for at start-up.
+    """
+
+    def __init__(self, num_workers: int = EXECUTOR_POOL_SIZE, warm_db_paths: Sequence[str] = ()):
+        self.num_workers = max(1, num_workers)
+        self.warm_db_paths = [str(db_path) for db_path in warm_db_paths]
+        self._request_ids = itertools.count()
+        self._idle: Queue = Queue()
+        for _ in range(self.num_workers):
+            self._idle.put(_Worker(self.warm_db_paths))
+
+    def execute_batch(self, requests: List[SQLRequest]) -> List[Tuple[bool, Any]]:
+        """
+        Executes a batch of requests, on a single worker unless one of them gets stuck.
+
+        Every request must be answered within its own timeout plus a grace period. A worker that
+        misses it is replaced, the stuck request fails with a TimeoutError and the remaining requests
+        continue on the new worker.
+
+        Args:
+            requests (List[SQLRequest]): (db_path, sql, fetch, timeout) tuples.
+
+        Returns:
+            List[Tuple[bool, Any]]: For each request, whether it succeeded and its result or exception.
+        """
+        responses: List[Tuple[bool, Any]] = []
+        while len(responses) < len(requests):
+            responses.extend(self._execute_on_worker(requests[len(responses):]))
+        return responses
+
+    def _execute_on_worker(self, requests: List[SQLRequest]) -> List[Tuple[bool, Any]]:
+        """Executes requests on one idle worker until they are all answered or the worker fails on one of them."""
+        request_id = next(self._request_ids)
+        worker = self._idle.get()
+        responses: List[Tuple[bool, Any]] = []
+        failure = None
+        # The worker, or its replacement, always goes back to the pool, which would otherwise shrink until `get` blocks.
+        try:
+            try:
+                worker.conn.send((request_id, [(str(db_path), sql, fetch, timeout) for db_path, sql, fetch, timeout in requests]))
+                for index, request in enumerate(requests):
+                    wait = request[3] + RESPONSE_GRACE_PERIOD
+                    if not worker.conn.poll(wait):
+                        failure = TimeoutError(f"SQL executor worker {worker.process.pid} did not respond in {wait} seconds")
+                        break
+                    response_id, response_index, response = pickle.loads(worker.conn.recv_bytes())
+                    if (response_id, response_index) != (request_id, index):
+                        failure = Exception(f"SQL executor returned response {response_id}.{response_index} for request {request_id}.{index}")
+                        break
+                    responses.append(response)
+            except Exception as e:
+                failure = Exception(f"SQL executor worker {worker.process.pid} failed: {type(e).__name__}: {e}")
+            if failure is not None:
+                logging.error(f"{failure}, respawning it")
+                worker.kill()
+                worker = _Worker(self.warm_db_paths)
+                responses.append((False, TimeoutError("Execution timed out.") if isinstance(failure, TimeoutError) else failure))
+        finally:
+            self._idle.put(worker)
+        return responses
+
+    def execute(self, db_path: str, sql: str, fetch: Union[str, int] = "all", timeout: float = 60) -> Any:
+        """
+        Executes a single SQL query on a worker process.
+
+        Returns:
+            Any: The fetched results based on the fetch argument.
+
+        Raises:
+            Exception: The error raised by the query, or TimeoutError.
+        """
+        success, result = self.execute_batch([(db_path, sql, fetch, timeout)])[0]
+        if not success:
+            raise result
+        return result
+
+    def close(self) -> None:
+        """Stops all worker processes."""
+        for _ in range(self.num_workers):
+            worker = self._idle.get()
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(RESPONSE_GRACE_PERIOD)
+            if worker.process.is_alive():
+                worker.kill()
+
+_pool: Optional[SQLExecutorPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = Lock()
+
+def get_sql_executor_pool() -> Optional[SQLExecutorPool]:
+    """
+    Returns this process's SQL executor pool, starting it on first use.
+
+    Returns:
+        Optional[SQLExecutorPool]: The pool, or None if this process is daemonic and may not start children.
+            The run workers are not daemonic, so this only happens for callers outside the runner.
+    """
+    global _pool, _pool_pid
+    if multiprocessing.current_process().daemon:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SQLExecutorPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+def subprocess_sql_executor(db_path: str, sql: str, timeout: int = 60):
+    """
+    Executes an SQL query on the persistent SQL executor pool.
+
+    Falls back to executing in-process when called from a daemonic worker, which cannot have children.
+
+    Args:
+        db_path (str): The path to the database file.
+        sql (str): The SQL query to execute.
+        timeout (int): The maximum number of seconds the query may run.
+
+    Returns:
+        Any: All rows returned by the query.
+    """
+    pool = get_sql_executor_pool()
+    if pool is None:
+        return execute_sql(db_path, sql, "all", timeout)
+    return pool.execute(db_path, sql, "all", timeout)
+
+def subprocess_sql_batch_executor(db_path: str, sqls: List[str], fetch: Union[str, int] = "all", timeout: int = 60) -> List[Any]:
+    """
+    Executes several SQL queries on one worker of the SQL executor pool in a single round trip.
+
+    Args:
+        db_path (str): The path to the database file.
+        sqls (List[str]): The SQL queries to execute.
+        fetch (Union[str, int]): How to fetch the results. Options are "all", "one", "random", or an integer.
+        timeout (int): The maximum number of seconds each query may run.
+
+    Returns:
+        List[Any]: The result of each query, or the exception it raised.
+    """
+    pool = get_sql_executor_pool()
+    if pool is None:
+        results = []
+        for sql in sqls:
+            try:
+                results.append(execute_sql(db_path, sql, fetch, timeout))
+            except Exception as e:
+                results.append(e)
+        return results
+    return [result for _, result in pool.execute_batch([(db_path, sql, fetch, timeout) for sql in sqls])]
@@ -7,6 +7,7 @@ from sqlglot import parse_one, exp
 from sqlglot.optimizer.qualify import qualify
 
 from database_utils.execution import execute_sql
+from database_utils.value_fts import find_value
 from database_utils.db_info import get_table_all_columns, get_db_all_tables
 
 def format_sql_query(query, meta_time_out = 10):
@@ -152,6 +153,9 @@ def get_sql_columns_dict(db_path: str, sql: str) -> Dict[str, List[str]]:
 def _check_value_exists(db_path: str, table_name: str, column_name: str, value: str) -> Optional[str]:
     """
     Checks if a value exists in a column of a table in the database.
+
+    The lookup is answered by the full-text value index built during preprocessing when it covers
+    the column, and by scanning the table otherwise.
     
     Args:
         db_path (str): Path to the database file.
@@ -162,6 +166,9 @@ def _check_value_exists(db_path: str, table_name: str, column_name: str, value:
     Returns:
         Optional[str]: The value if it exists, otherwise None.
     """
+    covered, match = find_value(db_path, table_name, column_name, value)
+    if covered:
+        return match
     query = f"SELECT `{column_name}` FROM `{table_name}` WHERE `{column_name}` LIKE '%{value}%' LIMIT 1"
     result = execute_sql(db_path, query, "one")
     return result[0] if result else None
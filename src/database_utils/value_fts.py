@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from database_utils.connection_pool import FileSignature, database_file_signature, get_connection_pool
+
+ColumnRange = Tuple[int, int]
+
+_columns_cache: Dict[str, Tuple[FileSignature, FileSignature, Dict[Tuple[str, str], ColumnRange]]] = {}
+_columns_lock = Lock()
+
+def value_fts_path(db_path: str) -> Path:
+    """
+    Returns the path of the full-text value index of a database.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        Path: The path to `preprocessed/{db_id}_values_fts.sqlite` next to the database.
+    """
+    db_path = Path(db_path)
+    return db_path.parent / "preprocessed" / f"{db_path.stem}_values_fts.sqlite"
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _has_text_affinity(declared_type: str) -> bool:
+    declared_type = (declared_type or "").upper()
+    return any(name in declared_type for name in ("CHAR", "CLOB", "TEXT"))
+
+def build_value_fts(db_path: str) -> Path:
+    """
+    Builds an FTS5 trigram index of the distinct values of every text column of a database.
+
+    The distinct values of each column are stored under a contiguous range of rowids, recorded in
+    the `indexed_columns` table, so a lookup in one column is an index query restricted to its range.
+    The trigram tokenizer answers `LIKE` patterns from the index with the same matching rules as
+    SQLite's `LIKE`, including its ASCII-only case folding. The size and modification time of the
+    database and its WAL are recorded, and lookups fall back to scanning once the database changes.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        Path: The path to the value index.
+    """
+    target_path = value_fts_path(db_path)
+    target_path.parent.mkdir(exist_ok=True)
+    tmp_path = target_path.with_suffix(".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    # Opened as a URI so that the source can be attached read-only.
+    conn = sqlite3.connect(tmp_path.resolve().as_uri(), uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (f"{Path(db_path).resolve().as_uri()}?mode=ro",))
+        conn.execute("CREATE VIRTUAL TABLE column_values USING fts5(value, tokenize='trigram', detail='none')")
+        conn.execute("CREATE TABLE indexed_columns (table_name TEXT, column_name TEXT, first_rowid INTEGER, last_rowid INTEGER, "
+                     "PRIMARY KEY (table_name, column_name))")
+        conn.execute("CREATE TABLE source (db_size INTEGER, db_mtime_ns INTEGER, wal_size INTEGER, wal_mtime_ns INTEGER)")
+        conn.execute("INSERT INTO source VALUES (?, ?, ?, ?)", database_file_signature(Path(db_path)))
+        table_names = [row[0] for row in conn.execute("SELECT name FROM src.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+        next_rowid = 1
+        for table_name in table_names:
+            columns = conn.execute(f"PRAGMA src.table_info({_quote(table_name)})").fetchall()
+            for column in columns:
+                column_name, declared_type = column[1], column[2]
+                if not _has_text_affinity(declared_type):
+                    continue
+                inserted = conn.execute(
+                    f"INSERT INTO column_values(rowid, value) "
+                    f"SELECT ? + ROW_NUMBER() OVER () - 1, value FROM "
+                    f"(SELECT DISTINCT {_quote(column_name)} AS value FROM src.{_quote(table_name)} WHERE typeof({_quote(column_name)}) = 'text')",
+                    (next_rowid,)
+                ).rowcount
+                conn.execute("INSERT INTO indexed_columns VALUES (?, ?, ?, ?)",
+                             (table_name, column_name, next_rowid, next_rowid + inserted - 1))
+                next_rowid += inserted
+            conn.commit()
+        conn.execute("INSERT INTO column_values(column_values) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+        logging.info(f"Value index {target_path.name}: {next_rowid - 1} distinct values")
+    finally:
+        conn.close()
+    os.replace(tmp_path, target_path)
+    return target_path
+
+def _get_indexed_columns(fts_path: Path) -> Tuple[FileSignature, Dict[Tuple[str, str], ColumnRange]]:
+    """
+    Reads the database signature the index was built from and the rowid ranges of the indexed columns,
+    keyed by lowercased (table, column). The result is cached until the index is rebuilt.
+    """
+    key = str(fts_path)
+    signature = database_file_signature(fts_path)
+    cached = _columns_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+    with get_connection_pool(fts_path).connection() as conn:
+        source_signature = tuple(conn.execute("SELECT db_size, db_mtime_ns, wal_size, wal_mtime_ns FROM source").fetchone())
+        rows = conn.execute("SELECT table_name, column_name, first_rowid, last_rowid FROM indexed_columns").fetchall()
+    columns = {(table_name.lower(), column_name.lower()): (first_rowid, last_rowid) for table_name, column_name, first_rowid, last_rowid in rows}
+    with _columns_lock:
+        _columns_cache[key] = (signature, source_signature, columns)
+    return source_signature, columns
+
+def is_value_fts_current(db_path: str) -> bool:
+    """
+    Checks whether the value index of a database exists and was built from its current version.
+
+    Args:
+        db_path (str): The path to the database file.
+
+    Returns:
+        bool: True if the index can answer lookups, False if it is missing or outdated.
+    """
+    fts_path = value_fts_path(db_path)
+    if not fts_path.exists():
+        return False
+    try:
+        source_signature, _ = _get_indexed_columns(fts_path)
+    except sqlite3.Error as e:
+        logging.warning(f"Could not read the value index {fts_path}: {e}")
+        return False
+    return source_signature == database_file_signature(Path(db_path))
+
+def find_value(db_path: str, table_name: str, column_name: str, value: str) -> Tuple[bool, Optional[str]]:
+    """
+    Looks up a value of a column that contains the given string, as `LIKE '%value%'` would match it.
+
+    Args:
+        db_path (str): The path to the database file.
+        table_name (str): The name of the table.
+        column_name (str): The name of the column.
+        value (str): The string to search for.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the value index covers the column, and a matching value or None.
+            When the index does not cover the column, the caller has to scan the table itself.
+    """
+    if not is_value_fts_current(db_path):
+        return False, None
+    fts_path = value_fts_path(db_path)
+    try:
+        column_range = _get_indexed_columns(fts_path)[1].get((table_name.lower(), column_name.lower()))
+        if column_range is None:
+            return False, None
+        with get_connection_pool(fts_path).connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM column_values WHERE value LIKE ? AND rowid BETWEEN ? AND ? LIMIT 1",
+                (f"%{value}%", *column_range)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logging.warning(f"Value index lookup failed for {table_name}.{column_name}: {e}")
+        return False, None
+    return True, row[0] if row else None
@@ -0,0 +1,159 @@
+import os
+import argparse
+import logging
+import socketserver
+from pathlib import Path
+from threading import Lock
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from typing import Any, Dict, List, Tuple
+
+from database_utils.index_protocol import send_message, receive_message
+from database_utils.db_values.search import load_db_lsh, query_lsh, query_lsh_many
+from database_utils.db_values.signatures import value_index_path
+from database_utils.db_values.ngram_index import NgramIndex, load_db_ngram_index, query_ngram_index_many
+from database_utils.db_catalog.search import query_vector_db
+from database_utils.db_catalog.preprocess import EMBEDDING_FUNCTION
+
+load_dotenv(override=True)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class IndexStore:
+    """
+    Loads the preprocessed LSH, n-gram indexes and context vector databases once and keeps them for all clients.
+
+    Attributes:
+        db_root_path (Path): The root directory that served database directories must be inside.
+    """
+
+    def __init__(self, db_root_path: str):
+        self.db_root_path = Path(db_root_path).resolve()
+        self._lsh: Dict[str, Tuple[Any, Any]] = {}
+        self._ngram_indexes: Dict[str, NgramIndex] = {}
+        self._vector_dbs: Dict[str, Any] = {}
+        self._lock = Lock()
+
+    def _check_path(self, db_directory_path: str) -> str:
+        resolved = Path(db_directory_path).resolve()
+        if self.db_root_path not in resolved.parents:
+            raise ValueError(f"{db_directory_path} is not inside {self.db_root_path}")
+        return str(resolved)
+
+    def get_lsh(self, db_directory_path: str) -> Tuple[Any, Any]:
+        key = self._check_path(db_directory_path)
+        with self._lock:
+            if key not in self._lsh:
+                logging.info(f"Loading LSH of {key}")
+                self._lsh[key] = load_db_lsh(key)
+            return self._lsh[key]
+
+    def get_ngram_index(self, db_directory_path: str) -> NgramIndex:
+        key = self._check_path(db_directory_path)
+        with self._lock:
+            if key not in self._ngram_indexes:
+                logging.info(f"Loading n-gram index of {key}")
+                self._ngram_indexes[key] = load_db_ngram_index(key)
+            return self._ngram_indexes[key]
+
+    def get_vector_db(self, db_directory_path: str) -> Any:
+        key = self._check_path(db_directory_path)
+        with self._lock:
+            if key not in self._vector_dbs:
+                logging.info(f"Loading context vector database of {key}")
+                self._vector_dbs[key] = Chroma(persist_directory=str(Path(key) / "context_vector_db"), embedding_function=EMBEDDING_FUNCTION)
+            return self._vector_dbs[key]
+
+    def preload(self) -> None:
+        """Loads the indexes of every preprocessed database under the root directory."""
+        for db_directory_path in sorted(self.db_root_path.iterdir()):
+            lsh_path = value_index_path(str(db_directory_path))
+            if (lsh_path / f"{db_directory_path.name}_lsh.pkl").exists():
+                self.get_lsh(str(db_directory_path))
+            if NgramIndex.exists(lsh_path, db_directory_path.name):
+                self.get_ngram_index(str(db_directory_path))
+            if (db_directory_path / "context_vector_db").exists():
+                self.get_vector_db(str(db_directory_path))
+
+    def handle(self, request: Dict[str, Any]) -> Any:
+        """
+        Answers a single request.
+
+        Args:
+            request (Dict[str, Any]): A "query_lsh", "query_lsh_many", "query_ngram_index_many" or "query_vector_db" request.
+
+        Returns:
+            Any: The result of the query.
+        """
+        if request["type"] == "query_lsh":
+            lsh, signatures = self.get_lsh(request["db_directory_path"])
+            return query_lsh(lsh, signatures, request["keyword"], request.get("signature_size", 100),
+                             request.get("n_gram", 3), request.get("top_n", 10))
+        if request["type"] == "query_lsh_many":
+            lsh, signatures = self.get_lsh(request["db_directory_path"])
+            return query_lsh_many(lsh, signatures, request["keywords"], request.get("signature_size", 100),
+                                  request.get("n_gram", 3), request.get("top_n", 10))
+        if request["type"] == "query_ngram_index_many":
+            ngram_index = self.get_ngram_index(request["db_directory_path"])
+            return query_ngram_index_many(ngram_index, request["keywords"], request.get("top_n", 10))
+        if request["type"] == "query_vector_db":
+            vector_db = self.get_vector_db(request["db_directory_path"])
+            return query_vector_db(vector_db, request["keyword"], request["top_k"])
+        raise ValueError(f"Unknown request type: {request['type']}")
+
+class IndexRequestHandler(socketserver.BaseRequestHandler):
+    """Serves batches of length-prefixed requests on one connection until the client disconnects."""
+
+    def handle(self):
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (ValueError, OSError) as e:
+                logging.warning(f"Dropping a connection with an invalid message: {e}")
+                break
+            if message is None:
+                break
+            requests: List[Dict[str, Any]] = message["requests"] if message.get("type") == "batch" else [message]
+            responses = []
+            for request in requests:
+                try:
+                    responses.append({"status": "ok", "result": self.server.store.handle(request)})
+                except Exception as e:
+                    logging.error(f"Error answering {request.get('type')} for {request.get('db_id')}: {e}")
+                    responses.append({"status": "error", "error": str(e)})
+            send_message(self.request, responses)
+
+class IndexServer(socketserver.ThreadingUnixStreamServer):
+    """Serves an `IndexStore` on a Unix socket that only the user running the server can connect to."""
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, store: IndexStore):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+        # The socket is created with mode 0600 rather than restricted after binding.
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, IndexRequestHandler)
+        finally:
+            os.umask(previous_umask)
+        self.store = store
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+if __name__ == '__main__':
+    args_parser = argparse.ArgumentParser()
+    args_parser.add_argument('--db_root_directory', type=str, required=True, help="Root directory of the databases")
+    args_parser.add_argument('--socket_path', type=str, default=os.getenv("INDEX_SERVER_SOCKET", "./data/index_server.sock"), help="Unix socket to listen on")
+    args_parser.add_argument('--no_preload', action='store_true', help="Load each index on its first request instead of before serving")
+    args = args_parser.parse_args()
+
+    store = IndexStore(args.db_root_directory)
+    if not args.no_preload:
+        store.preload()
+    with IndexServer(args.socket_path, store) as server:
+        logging.info(f"Index server listening on {args.socket_path}")
+        server.serve_forever()
@@ -0,0 +1,216 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+
+# The repository's data directory, so the default cache does not depend on the working directory.
+DATA_DIRECTORY = Path(__file__).resolve().parents[2] / "data"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(DATA_DIRECTORY / "embedding_cache.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500000))
+# Evicting after every batch would count the table each time, so it is checked every so many inserts.
+EVICTION_CHECK_INTERVAL = 1000
+SQLITE_MAX_PARAMETERS = 900
+# Eviction only needs coarse recency, so a hit refreshes its last use at most once per interval (seconds).
+RECENCY_UPDATE_INTERVAL = 3600
+
+class EmbeddingCache:
+    """
+    A content-addressed store of embeddings in a SQLite table shared by all processes.
+
+    Each vector is stored as float32 bytes under the SHA-256 of the model name, the kind of embedding
+    ("document" or "query") and the text. Lookups refresh the last use of the vectors they find
+    when it is older than `RECENCY_UPDATE_INTERVAL`, and once the table holds more than
+    `max_entries` vectors the least recently used ones are evicted.
+
+    Attributes:
+        path (Path): The path to the SQLite file.
+        max_entries (int): The number of vectors kept after eviction.
+    """
+
+    def __init__(self, path: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._inserts_lock = threading.Lock()
+        self._inserts_since_check = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns this thread's connection; connections inherited through fork are not reused.
+
+        The connection is in autocommit mode, so writes open their transactions with an explicit BEGIN.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def key(model_name: str, kind: str, text: str) -> bytes:
+        """Returns the key of the embedding of a text by a model."""
+        return hashlib.sha256(f"{model_name}\x00{kind}\x00{text}".encode("utf-8", errors="surrogatepass")).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Looks up vectors and marks the ones not used recently as used, in one transaction.
+
+        Args:
+            keys (List[bytes]): The keys to look up.
+
+        Returns:
+            Dict[bytes, np.ndarray]: The float32 vectors found, keyed by key.
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        stale: List[bytes] = []
+        conn = self._connection()
+        now = int(time.time())
+        for start in range(0, len(keys), SQLITE_MAX_PARAMETERS):
+            chunk = keys[start:start + SQLITE_MAX_PARAMETERS]
+            placeholders = ", ".join("?" * len(chunk))
+            for key, vector, last_used in conn.execute(f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", chunk):
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+                if last_used < now - RECENCY_UPDATE_INTERVAL:
+                    stale.append(key)
+        if stale:
+            with conn:
+                conn.execute("BEGIN")
+                for start in range(0, len(stale), SQLITE_MAX_PARAMETERS):
+                    chunk = stale[start:start + SQLITE_MAX_PARAMETERS]
+                    conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({', '.join('?' * len(chunk))})", [now, *chunk])
+        return found
+
+    def put_many(self, items: List[Tuple[bytes, np.ndarray]]) -> None:
+        """
+        Stores vectors, evicting the least recently used ones if the cache grew too large.
+
+        Args:
+            items (List[Tuple[bytes, np.ndarray]]): The keys and float32 vectors to store.
+        """
+        if not items:
+            return
+        conn = self._connection()
+        now = int(time.time())
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                             [(key, vector.astype(np.float32).tobytes(), now) for key, vector in items])
+        with self._inserts_lock:
+            self._inserts_since_check += len(items)
+            if self._inserts_since_check < EVICTION_CHECK_INTERVAL:
+                return
+            self._inserts_since_check = 0
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used vectors beyond `max_entries`.
+
+        Returns:
+            int: The number of vectors deleted.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess <= 0:
+                return 0
+            conn.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+        logging.info(f"Evicted {excess} embeddings from {self.path}")
+        return excess
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so that texts already embedded by the same model are read from an `EmbeddingCache`.
+
+    Each call embeds the distinct texts missing from the cache in one request to the client. Cache
+    errors are logged and the texts are embedded by the client instead.
+
+    Attributes:
+        client (Any): The wrapped embeddings client.
+        model_name (str): The model name the cache keys are computed with.
+        cache (EmbeddingCache): The cache.
+    """
+
+    def __init__(self, client: Any, model_name: str, cache: EmbeddingCache):
+        self.client = client
+        self.model_name = model_name
+        self.cache = cache
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = {text: EmbeddingCache.key(self.model_name, kind, text) for text in texts}
+        try:
+            vectors = self.cache.get_many(list(dict.fromkeys(keys.values())))
+        except sqlite3.Error as e:
+            logging.warning(f"Embedding cache lookup failed, embedding without the cache: {e}")
+            vectors = {}
+        missing = [text for text in keys if keys[text] not in vectors]
+        if missing:
+            embedded = self.client.embed_documents(missing) if kind == "document" else [self.client.embed_query(missing[0])]
+            new_items = [(keys[text], np.asarray(vector, dtype=np.float32)) for text, vector in zip(missing, embedded)]
+            vectors.update(new_items)
+            try:
+                self.cache.put_many(new_items)
+            except sqlite3.Error as e:
+                logging.warning(f"Could not store embeddings in the cache: {e}")
+        # Cached and new vectors are both returned as float32 values, so results do not depend on hits.
+        return [vectors[keys[text]].tolist() for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(path: Optional[str] = EMBEDDING_CACHE_PATH) -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide embedding cache stored at a path.
+
+    Args:
+        path (Optional[str]): The path to the SQLite file; an empty path disables caching.
+
+    Returns:
+        Optional[EmbeddingCache]: The cache, or None if caching is disabled or the file cannot be opened.
+    """
+    if not path:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            try:
+                _caches[path] = EmbeddingCache(path)
+            except (sqlite3.Error, OSError) as e:
+                logging.warning(f"Could not open the embedding cache at {path}, embedding without it: {e}")
+                return None
+        return _caches[path]
+
+def cached_embeddings(client: Any, model_name: str) -> Any:
+    """
+    Wraps an embeddings client with the embedding cache unless caching is disabled.
+
+    Args:
+        client (Any): The embeddings client.
+        model_name (str): The model the client embeds with, part of the cache keys.
+
+    Returns:
+        Any: The wrapped client, or the client itself if caching is disabled.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return client
+    return CachedEmbeddings(client, model_name, cache)
@@ -4,6 +4,25 @@ import math
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_google_vertexai import VertexAIEmbeddings
 
+from llm.embedding_cache import cached_embeddings
+
+
+def embedding_model_id(model: str, provider: str = "vertexai") -> str:
+    """
+    Returns the stable identifier of an embedding model, used to key cached and saved embeddings.
+
+    Args:
+        model (str): Embedding model name, e.g. "text-embedding-004".
+        provider (str): "vertexai" (default) or "google_genai".
+
+    Returns:
+        str: The identifier "{provider}/{model}".
+    """
+    provider = (provider or "vertexai").lower()
+    if provider == "vertexai":
+        model = model or "text-embedding-004"
+    return f"{provider}/{model}"
+
 
 def get_embedding_client(
     model: str,
@@ -23,18 +42,19 @@ def get_embedding_client(
         max_length (int, optional): Truncation length. Only used by provider "huggingface".
 
     Returns:
-        Any: Embeddings client instance with an embed_documents method.
+        Any: Embeddings client instance with an embed_documents method, reading and storing its
+            embeddings in the embedding cache unless EMBEDDING_CACHE_PATH is empty.
     """
     provider = (provider or "vertexai").lower()
     if provider == "google_genai":
         params_gg: Dict[str, Any] = {"model": model}
         if api_key:
             params_gg["google_api_key"] = api_key
-        return GoogleGenerativeAIEmbeddings(**params_gg)
+        return cached_embeddings(GoogleGenerativeAIEmbeddings(**params_gg), embedding_model_id(model, provider))
     elif provider == "vertexai":
         # Default to Vertex AI text-embedding-004 if model is not provided
         model_name = model or "text-embedding-004"
-        return VertexAIEmbeddings(model_name=model_name)
+        return cached_embeddings(VertexAIEmbeddings(model_name=model_name), embedding_model_id(model_name, provider))
 
     else:
         raise ValueError(f"Unsupported embeddings provider: {provider}")
@@ -0,0 +1,61 @@
+import json
+import argparse
+import multiprocessing
+from typing import List
+from dotenv import load_dotenv
+import logging
+
+from database_utils.execution import precompute_gold_results
+
+load_dotenv(override=True)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def worker_initializer(db_id: str, gold_sqls: List[str], args: argparse.Namespace):
+    """
+    Executes the gold SQL queries of a database and caches their results.
+
+    Args:
+        db_id (str): The database ID.
+        gold_sqls (List[str]): The gold SQL queries of the database.
+        args (argparse.Namespace): The command line arguments.
+    """
+    db_path = f"{args.db_root_directory}/{db_id}/{db_id}.sqlite"
+    logging.info(f"Precomputing {len(gold_sqls)} gold results for {db_id}")
+    precompute_gold_results(db_path, gold_sqls, timeout=args.timeout)
+    logging.info(f"Gold results for {db_id} precomputed.")
+
+if __name__ == '__main__':
+    args_parser = argparse.ArgumentParser()
+    args_parser.add_argument('--data_path', type=str, required=True, help="Path to the dataset with the gold SQL queries")
+    args_parser.add_argument('--db_root_directory', type=str, required=True, help="Root directory of the databases")
+    args_parser.add_argument('--num_workers', type=int, default=1, help="Number of databases processed in parallel")
+    args_parser.add_argument('--timeout', type=int, default=120, help="Timeout in seconds for each gold SQL query")
+
+    args = args_parser.parse_args()
+
+    with open(args.data_path, 'r') as file:
+        dataset = json.load(file)
+    gold_sqls_per_db = {}
+    for data in dataset:
+        if data.get("SQL"):
+            gold_sqls_per_db.setdefault(data["db_id"], []).append(data["SQL"])
+
+    # Databases with the most questions first, so the longest job does not start last.
+    db_ids = sorted(gold_sqls_per_db, key=lambda db_id: len(gold_sqls_per_db[db_id]), reverse=True)
+    with multiprocessing.Pool(args.num_workers) as pool:
+        async_results = {db_id: pool.apply_async(worker_initializer, args=(db_id, gold_sqls_per_db[db_id], args)) for db_id in db_ids}
+        pool.close()
+        failed_db_ids = []
+        for db_id, async_result in async_results.items():
+            try:
+                async_result.get()
+            except Exception as e:
+                logging.error(f"Precomputing the gold results for {db_id} failed: {e}")
+                failed_db_ids.append(db_id)
+        pool.join()
+
+    if failed_db_ids:
+        raise SystemExit(f"Gold result precomputation failed for {len(failed_db_ids)} databases: {', '.join(failed_db_ids)}")
+    logging.info("Gold result precomputation is complete.")
@@ -4,11 +4,14 @@ import multiprocessing
 from dotenv import load_dotenv
 import logging
 
-from database_utils.db_values.preprocess import make_db_lsh
-from database_utils.db_catalog.preprocess import make_db_context_vec_db
+from database_utils.db_values.preprocess import make_db_lsh, update_db_lsh
+from database_utils.db_values.ngram_index import make_db_ngram_index
+from database_utils.db_catalog.preprocess import make_db_context_vec_db, update_db_context_vec_db
+from database_utils.db_catalog.column_embeddings import make_db_column_embeddings
+from database_utils.shadow_db import build_shadow_db
+from database_utils.value_fts import build_value_fts, is_value_fts_current
 
 load_dotenv(override=True)
-NUM_WORKERS = 1
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -22,17 +25,39 @@ def worker_initializer(db_id: str, args: argparse.Namespace):
         args (argparse.Namespace): The command line arguments.
     """
     db_directory_path = f"{args.db_root_directory}/{db_id}"
+    build_lsh = update_db_lsh if args.incremental else make_db_lsh
+    build_context_vec_db = update_db_context_vec_db if args.incremental else make_db_context_vec_db
     logging.info(f"Creating LSH for {db_id}")
-    make_db_lsh(db_directory_path, 
-                signature_size=args.signature_size, 
-                n_gram=args.n_gram, 
-                threshold=args.threshold,
-                verbose=args.verbose)
+    build_lsh(db_directory_path, 
+              signature_size=args.signature_size, 
+              n_gram=args.n_gram, 
+              threshold=args.threshold,
+              verbose=args.verbose,
+              num_workers=args.num_workers if args.parallel_mode == "column" else 1)
     logging.info(f"LSH for {db_id} created.")
+    if args.ngram_index:
+        logging.info(f"Creating n-gram index for {db_id}")
+        make_db_ngram_index(db_directory_path, n_gram=args.n_gram)
+        logging.info(f"N-gram index for {db_id} created.")
     logging.info(f"Creating context vectors for {db_id}")
-    make_db_context_vec_db(db_directory_path,
-                           use_value_description=args.use_value_description)
+    build_context_vec_db(db_directory_path,
+                         use_value_description=args.use_value_description)
     logging.info(f"Context vectors for {db_id} created.")
+    logging.info(f"Creating column embeddings for {db_id}")
+    make_db_column_embeddings(db_directory_path)
+    logging.info(f"Column embeddings for {db_id} created.")
+    if not args.skip_value_fts:
+        db_path = f"{db_directory_path}/{db_id}.sqlite"
+        if args.incremental and is_value_fts_current(db_path):
+            logging.info(f"Value index for {db_id} is up to date")
+        else:
+            logging.info(f"Creating value index for {db_id}")
+            build_value_fts(db_path)
+            logging.info(f"Value index for {db_id} created.")
+    for max_rows in args.shadow_db_rows:
+        logging.info(f"Creating shadow database with {max_rows} rows per table for {db_id}")
+        build_shadow_db(f"{db_directory_path}/{db_id}.sqlite", max_rows)
+        logging.info(f"Shadow database for {db_id} created.")
 
 if __name__ == '__main__':
     # Setup argument parser
@@ -44,11 +69,26 @@ if __name__ == '__main__':
     args_parser.add_argument('--db_id', type=str, default='all', help="Database ID or 'all' to process all databases")
     args_parser.add_argument('--verbose', type=bool, default=True, help="Enable verbose logging")
     args_parser.add_argument('--use_value_description', type=bool, default=True, help="Include value descriptions")
+    args_parser.add_argument('--num_workers', type=int, default=1, help="Number of worker processes")
+    args_parser.add_argument('--parallel_mode', type=str, choices=["database", "column"], default="database",
+                             help="Process several databases at once, or the tables of one database at a time in parallel, each scanned once for all its columns")
+    args_parser.add_argument('--incremental', action='store_true',
+                             help="Only re-index the columns and description files that changed since the last run")
+    args_parser.add_argument('--ngram_index', action='store_true',
+                             help="Also build the exact n-gram index of the values, used by retrieve_entity with value_index: ngram")
+    args_parser.add_argument('--skip_value_fts', action='store_true',
+                             help="Do not build the FTS5 index of text values used to check the literals of SQL queries")
+    args_parser.add_argument('--shadow_db_rows', type=lambda sizes: [int(size) for size in sizes.split(",") if size], default=[],
+                             help="Comma-separated rows per table of the sampled shadow databases to build, e.g. 1000")
 
     args = args_parser.parse_args()
 
-    if args.db_id == 'all':
-        with multiprocessing.Pool(NUM_WORKERS) as pool:
+    if args.db_id == 'all' and args.parallel_mode == "column":
+        for db_id in sorted(os.listdir(args.db_root_directory)):
+            if os.path.isdir(f"{args.db_root_directory}/{db_id}"):
+                worker_initializer(db_id, args)
+    elif args.db_id == 'all':
+        with multiprocessing.Pool(args.num_workers) as pool:
             for db_id in os.listdir(args.db_root_directory):
                 # check if the db_id is a directory
                 if os.path.isdir(f"{args.db_root_directory}/{db_id}"):
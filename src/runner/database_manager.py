@@ -1,50 +1,157 @@
 import os
-import socket
-import pickle
+import logging
 from threading import Lock
 from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from typing import Callable, Dict, List, Any
-import time
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
 
 from database_utils.schema import DatabaseSchema
 from database_utils.schema_generator import DatabaseSchemaGenerator
-from database_utils.execution import execute_sql, compare_sqls, validate_sql_query, aggregate_sqls, get_execution_status, subprocess_sql_executor
+from database_utils.execution import execute_sql, execute_many, compare_sqls, validate_sql_query, aggregate_sqls, get_execution_status
+from database_utils.sql_executor_pool import subprocess_sql_executor, subprocess_sql_batch_executor
+from database_utils.connection_pool import load_memory_replica, release_memory_replica
+from database_utils.index_protocol import IndexServerClient
 from database_utils.db_info import get_db_all_tables, get_table_all_columns, get_db_schema
 from database_utils.sql_parser import get_sql_tables, get_sql_columns_dict, get_sql_condition_literals
-from database_utils.db_values.search import query_lsh
+from database_utils.db_values.search import load_db_lsh, query_lsh, query_lsh_many
+from database_utils.db_values.ngram_index import load_db_ngram_index, query_ngram_index_many
+from database_utils.db_values.signatures import value_index_path
 from database_utils.db_catalog.search import query_vector_db
 from database_utils.db_catalog.preprocess import EMBEDDING_FUNCTION
+from database_utils.db_catalog.column_embeddings import ColumnEmbeddings, load_db_column_embeddings
 from database_utils.db_catalog.csv_utils import load_tables_description
 
 load_dotenv(override=True)
 DB_ROOT_PATH = Path(os.getenv("DB_ROOT_PATH"))
 
-INDEX_SERVER_HOST = os.getenv("INDEX_SERVER_HOST")
-INDEX_SERVER_PORT = int(os.getenv("INDEX_SERVER_PORT"))
+INDEX_SERVER_SOCKET = os.getenv("INDEX_SERVER_SOCKET")
+INDEX_SERVER_TIMEOUT = float(os.getenv("INDEX_SERVER_TIMEOUT", 30))
+DATABASE_MANAGER_MEMORY_BUDGET = int(os.getenv("DATABASE_MANAGER_MEMORY_BUDGET_MB", 4096)) * (1 << 20)
+
+INDEX_SERVER_CLIENT = IndexServerClient(INDEX_SERVER_SOCKET, INDEX_SERVER_TIMEOUT)
 
 class DatabaseManager:
     """
-    A singleton class to manage database operations including schema generation, 
+    A registry of per-database managers handling database operations including schema generation, 
     querying LSH and vector databases, and managing column profiles.
+
+    `DatabaseManager(db_mode, db_id)` returns the resident manager of that database, creating it if
+    needed, and makes it the current manager of the running task; `DatabaseManager()` returns the
+    current manager and raises if the calling context has none. `DatabaseManager.use` additionally
+    protects the manager from being unloaded while a task runs on it. Managers of several databases stay resident, and the least recently used ones
+    are unloaded once their loaded indexes exceed DATABASE_MANAGER_MEMORY_BUDGET_MB.
     """
-    _instance = None
-    _lock = Lock()
+    _instances: "OrderedDict[Tuple[str, str], DatabaseManager]" = OrderedDict()
+    _registry_lock = Lock()
+    _current: ContextVar[Optional["DatabaseManager"]] = ContextVar("current_database_manager", default=None)
 
     def __new__(cls, db_mode=None, db_id=None):
         if (db_mode is not None) and (db_id is not None):
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(DatabaseManager, cls).__new__(cls)
-                    cls._instance._init(db_mode, db_id)
-                elif cls._instance.db_id != db_id:
-                    cls._instance._init(db_mode, db_id)
-                return cls._instance
+            instance = cls._activate(db_mode, db_id)
+            cls._enforce_memory_budget()
+            return instance
         else:
-            if cls._instance is None:
-                raise ValueError("DatabaseManager instance has not been initialized yet.")
-            return cls._instance
+            instance = cls._current.get()
+            if instance is None:
+                raise ValueError("No DatabaseManager is active in this context; activate one with DatabaseManager(db_mode, db_id) "
+                                 "or run the thread in a copy of the task's context.")
+            return instance
+
+    @classmethod
+    def _activate(cls, db_mode: str, db_id: str, users: int = 0) -> "DatabaseManager":
+        """Returns the resident manager of a database, creating it if needed, and makes it the current manager."""
+        with cls._registry_lock:
+            key = (db_mode, db_id)
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = super(DatabaseManager, cls).__new__(cls)
+                instance._init(db_mode, db_id)
+                cls._instances[key] = instance
+            cls._instances.move_to_end(key)
+            instance._users += users
+            cls._current.set(instance)
+        return instance
+
+    @classmethod
+    @contextmanager
+    def use(cls, db_mode: str, db_id: str) -> Iterator["DatabaseManager"]:
+        """
+        Activates the manager of a database and keeps it from being unloaded until the context exits.
+
+        Args:
+            db_mode (str): The mode of the database (e.g., 'train', 'test').
+            db_id (str): The database identifier.
+
+        Yields:
+            DatabaseManager: The current manager.
+        """
+        instance = cls._activate(db_mode, db_id, users=1)
+        try:
+            cls._enforce_memory_budget()
+            yield instance
+        finally:
+            with cls._registry_lock:
+                instance._users -= 1
+
+    @classmethod
+    def _enforce_memory_budget(cls) -> None:
+        """
+        Unloads the least recently used managers until the resident indexes fit the memory budget.
+
+        Managers in use by a `use` context, current in the calling context or loading an index are kept.
+        """
+        with cls._registry_lock:
+            resident_bytes = sum(instance.resident_bytes() for instance in cls._instances.values())
+            for key in list(cls._instances):
+                if resident_bytes <= DATABASE_MANAGER_MEMORY_BUDGET:
+                    break
+                instance = cls._instances[key]
+                if instance._users > 0 or instance is cls._current.get() or instance._lock.locked():
+                    continue
+                resident_bytes -= instance.resident_bytes()
+                del cls._instances[key]
+                instance.unload()
+                logging.info(f"Unloaded the resources of {instance.db_id} to stay within the memory budget")
+
+    def resident_bytes(self) -> int:
+        """
+        Returns the estimated memory held by the loaded LSH, minhashes, n-gram index and vector database.
+
+        The estimate is measured when an index is loaded or unloaded, so checking the memory budget
+        does not touch the filesystem.
+
+        Returns:
+            int: The on-disk size of the loaded artifacts, used as a proxy for their memory use.
+        """
+        return self._resident_bytes
+
+    def _measure_resident_bytes(self) -> None:
+        """Measures the on-disk size of the loaded artifacts; the vector database is measured once when it is loaded."""
+        artifacts = set()
+        preprocessed_path = value_index_path(str(self.db_directory_path))
+        if self.lsh not in (None, "error"):
+            artifacts.add(preprocessed_path / f"{self.db_id}_lsh.pkl")
+        # Memory-mapped signatures and n-gram arrays live in the page cache shared by all processes.
+        for signatures in (self.minhashes, getattr(self.ngram_index, "signatures", None)):
+            if signatures not in (None, "error") and not signatures.memory_mapped:
+                artifacts.add(preprocessed_path / f"{self.db_id}_minhashes.pkl")
+        self._resident_bytes = sum(path.stat().st_size for path in artifacts if path.exists()) + self._vector_db_bytes
+
+    def unload(self) -> None:
+        """Drops the loaded LSH, minhashes, n-gram index, vector database, column embeddings and in-memory replica of the database."""
+        with self._lock:
+            self.lsh = None
+            self.minhashes = None
+            self.ngram_index = None
+            self.vector_db = None
+            self.column_embeddings = None
+            self._resident_bytes = 0
+            self._vector_db_bytes = 0
+        release_memory_replica(self.db_path)
 
     def _init(self, db_mode: str, db_id: str):
         """
@@ -56,10 +163,19 @@ class DatabaseManager:
         """
         self.db_mode = db_mode
         self.db_id = db_id
+        self._lock = Lock()
+        self._users = 0
+        self._resident_bytes = 0
+        self._vector_db_bytes = 0
         self._set_paths()
         self.lsh = None
         self.minhashes = None
+        self.ngram_index = None
         self.vector_db = None
+        self.column_embeddings = None
+        if self.db_path.exists():
+            # Serves all reads of this process from RAM when SQLITE_MEMORY_BUDGET_MB allows it.
+            load_memory_replica(self.db_path)
 
     def _set_paths(self):
         """Sets the paths for the database files and directories."""
@@ -67,26 +183,57 @@ class DatabaseManager:
         self.db_directory_path = DB_ROOT_PATH / f"{self.db_mode}_databases" / self.db_id
 
     def set_lsh(self) -> str:
-        """Sets the LSH and minhashes attributes by loading from pickle files."""
+        """Sets the LSH and minhashes attributes by loading the LSH and memory-mapping the signatures."""
         with self._lock:
             if self.lsh is None:
                 try:
-                    start_time = time.time()
-                    with (self.db_directory_path / "preprocessed" / f"{self.db_id}_lsh.pkl").open("rb") as file:
-                        self.lsh = pickle.load(file)
-                    after_lsh_time = time.time()
-                    with (self.db_directory_path / "preprocessed" / f"{self.db_id}_minhashes.pkl").open("rb") as file:
-                        self.minhashes = pickle.load(file)
-                    return "success"
+                    self.lsh, self.minhashes = load_db_lsh(str(self.db_directory_path))
                 except Exception as e:
                     self.lsh = "error"
                     self.minhashes = "error"
                     print(f"Error loading LSH for {self.db_id}: {e}")
                     return "error"
+                self._measure_resident_bytes()
             elif self.lsh == "error":
                 return "error"
             else:
                 return "success"
+        self._enforce_memory_budget()
+        return "success"
+
+    def set_ngram_index(self) -> str:
+        """Sets the ngram_index attribute by memory-mapping the n-gram index."""
+        with self._lock:
+            if self.ngram_index is None:
+                try:
+                    self.ngram_index = load_db_ngram_index(str(self.db_directory_path))
+                except Exception as e:
+                    self.ngram_index = "error"
+                    print(f"Error loading n-gram index for {self.db_id}: {e}")
+                    return "error"
+                self._measure_resident_bytes()
+            elif self.ngram_index == "error":
+                return "error"
+            else:
+                return "success"
+        self._enforce_memory_budget()
+        return "success"
+
+    def get_column_embeddings(self) -> Optional[ColumnEmbeddings]:
+        """
+        Memory-maps the column-name embeddings computed during preprocessing.
+
+        Returns:
+            Optional[ColumnEmbeddings]: The column embeddings, or None if they are missing or outdated.
+        """
+        with self._lock:
+            if self.column_embeddings is None:
+                try:
+                    self.column_embeddings = load_db_column_embeddings(str(self.db_directory_path))
+                except Exception as e:
+                    self.column_embeddings = "error"
+                    logging.warning(f"No column embeddings for {self.db_id}, embedding the columns per question: {e}")
+            return None if self.column_embeddings == "error" else self.column_embeddings
 
     def set_vector_db(self) -> str:
         """Sets the vector_db attribute by loading from the context vector database."""
@@ -94,6 +241,10 @@ class DatabaseManager:
             try:
                 vector_db_path = self.db_directory_path / "context_vector_db"
                 self.vector_db = Chroma(persist_directory=str(vector_db_path), embedding_function=EMBEDDING_FUNCTION)
+                with self._lock:
+                    self._vector_db_bytes = sum(path.stat().st_size for path in vector_db_path.rglob("*") if path.is_file())
+                    self._measure_resident_bytes()
+                self._enforce_memory_budget()
                 return "success"
             except Exception as e:
                 self.vector_db = "error"
@@ -117,27 +268,72 @@ class DatabaseManager:
         Returns:
             Dict[str, List[str]]: The dictionary of similar values.
         """
-        
-        # try:
-        #     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        #         s.connect((INDEX_SERVER_HOST, INDEX_SERVER_PORT))
-        #         s.sendall(pickle.dumps({
-        #             "db_directory_path": str(self.db_directory_path),
-        #             "db_id": self.db_id,
-        #             "type": "query_lsh",
-        #             "keyword": keyword
-        #         }))
-        #         return receive_data_in_chunks(s)
-        # except ConnectionRefusedError:
-        #     print(f"Connection refused for {self.db_id}")
+        result = self._query_index_server({
+            "type": "query_lsh",
+            "keyword": keyword,
+            "signature_size": signature_size,
+            "n_gram": n_gram,
+            "top_n": top_n
+        })
+        if result is not None:
+            return result
         lsh_status = self.set_lsh()
         if lsh_status == "success":
             return query_lsh(self.lsh, self.minhashes, keyword, signature_size, n_gram, top_n)
         else:
             raise Exception(f"Error loading LSH for {self.db_id}")
-        # except Exception as e:
-        #     print(f"Error querying LSH for {self.db_id}: {e}")
-        #     raise Exception(f"Error querying LSH for {self.db_id}: {e}")
+
+    def query_lsh_many(self, keywords: List[str], signature_size: int = 100, n_gram: int = 3, top_n: int = 10) -> List[Dict[str, Dict[str, List[str]]]]:
+        """
+        Queries the LSH for values similar to each of the given keywords in one batch.
+
+        Args:
+            keywords (List[str]): The keywords to search for.
+            signature_size (int, optional): The size of the MinHash signature. Defaults to 100.
+            n_gram (int, optional): The n-gram size for the MinHash. Defaults to 3.
+            top_n (int, optional): The number of top results to return per keyword. Defaults to 10.
+
+        Returns:
+            List[Dict[str, Dict[str, List[str]]]]: For each keyword, the dictionary of similar values.
+        """
+        result = self._query_index_server({
+            "type": "query_lsh_many",
+            "keywords": keywords,
+            "signature_size": signature_size,
+            "n_gram": n_gram,
+            "top_n": top_n
+        })
+        if result is not None:
+            return result
+        lsh_status = self.set_lsh()
+        if lsh_status == "success":
+            return query_lsh_many(self.lsh, self.minhashes, keywords, signature_size, n_gram, top_n)
+        else:
+            raise Exception(f"Error loading LSH for {self.db_id}")
+
+    def query_ngram_index_many(self, keywords: List[str], top_n: int = 10) -> List[Dict[str, Dict[str, List[str]]]]:
+        """
+        Queries the n-gram index for the values most similar to each of the given keywords.
+
+        Args:
+            keywords (List[str]): The keywords to search for.
+            top_n (int, optional): The number of top results to return per keyword. Defaults to 10.
+
+        Returns:
+            List[Dict[str, Dict[str, List[str]]]]: For each keyword, the dictionary of similar values.
+        """
+        result = self._query_index_server({
+            "type": "query_ngram_index_many",
+            "keywords": keywords,
+            "top_n": top_n
+        })
+        if result is not None:
+            return result
+        ngram_index_status = self.set_ngram_index()
+        if ngram_index_status == "success":
+            return query_ngram_index_many(self.ngram_index, keywords, top_n)
+        else:
+            raise Exception(f"Error loading n-gram index for {self.db_id}")
 
     def query_vector_db(self, keyword: str, top_k: int) -> Dict[str, Any]:
         """
@@ -150,26 +346,40 @@ class DatabaseManager:
         Returns:
             Dict[str, Any]: The dictionary of similar values.
         """
-        
-        # try:
-        #     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        #         s.connect((INDEX_SERVER_HOST, INDEX_SERVER_PORT))
-        #         s.sendall(pickle.dumps({
-        #             "db_directory_path": str(self.db_directory_path),
-        #             "db_id": self.db_id,
-        #             "type": "query_vector_db",
-        #             "keyword": keyword,
-        #             "top_k": top_k
-        #         }))
-        #         return receive_data_in_chunks(s)
-        # except ConnectionRefusedError:
+        result = self._query_index_server({
+            "type": "query_vector_db",
+            "keyword": keyword,
+            "top_k": top_k
+        })
+        if result is not None:
+            return result
         vector_db_status = self.set_vector_db()
         if vector_db_status == "success":
             return query_vector_db(self.vector_db, keyword, top_k)
         else:
             raise Exception(f"Error loading Vector DB for {self.db_id}")
-        # except Exception as e:
-        #     raise Exception(f"Error querying Vector DB for {self.db_id}: {e}")
+
+    def _query_index_server(self, request: Dict[str, Any]) -> Optional[Any]:
+        """
+        Sends a query to the index server, which keeps the indexes of all databases loaded once.
+
+        Args:
+            request (Dict[str, Any]): The query without the database fields.
+
+        Returns:
+            Optional[Any]: The result, or None if the query should be answered in-process instead.
+        """
+        if not INDEX_SERVER_CLIENT.available():
+            return None
+        request = {**request, "db_directory_path": str(self.db_directory_path), "db_id": self.db_id}
+        try:
+            response = INDEX_SERVER_CLIENT.query([request])[0]
+        except ConnectionError:
+            return None
+        if response["status"] == "ok":
+            return response["result"]
+        logging.warning(f"Index server failed to answer {request['type']} for {self.db_id}: {response['error']}")
+        return None
 
     def get_column_profiles(self, schema_with_examples: Dict[str, Dict[str, List[str]]],
                             use_value_description: bool, with_keys: bool, 
@@ -293,7 +503,9 @@ class DatabaseManager:
 # List of functions to be added to the class
 functions_to_add = [
     subprocess_sql_executor,
+    subprocess_sql_batch_executor,
     execute_sql, 
+    execute_many,
     compare_sqls,
     validate_sql_query,
     aggregate_sqls,
@@ -308,19 +520,3 @@ functions_to_add = [
 
 # Adding methods to the class
 DatabaseManager.add_methods_to_class(functions_to_add)
-
-# Auxiliary function for interacting with the index server
-def receive_data_in_chunks(conn, chunk_size=1024):
-            length_bytes = conn.recv(4)
-            if not length_bytes:
-                return None
-            data_length = int.from_bytes(length_bytes, byteorder='big')
-            chunks = []
-            bytes_received = 0
-            while bytes_received < data_length:
-                chunk = conn.recv(min(data_length - bytes_received, chunk_size))
-                if not chunk:
-                    raise ConnectionError("Connection lost")
-                chunks.append(chunk)
-                bytes_received += len(chunk)
-            return pickle.loads(b''.join(chunks))
\ No newline at end of file
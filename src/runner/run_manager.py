@@ -1,16 +1,17 @@
 import os
 import json
 from pathlib import Path
-from multiprocessing import Pool
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 from langgraph.graph import StateGraph
 
 from runner.logger import Logger
 from runner.task import Task
 from runner.database_manager import DatabaseManager
 from runner.statistics_manager import StatisticsManager
+from runner.scheduler import run_with_locality
 from workflow.team_builder import build_team
 from database_utils.execution import ExecutionStatus
+from database_utils.result_cache import get_result_cache
 from workflow.system_state import SystemState
 import fcntl
 
@@ -24,6 +25,7 @@ class RunManager:
         self.tasks: List[Task] = []
         self.total_number_of_tasks = 0
         self.processed_tasks = 0
+        self.cache_stats: Dict[str, Dict[str, int]] = {}
 
     def get_result_directory(self) -> str:
         """
@@ -88,20 +90,41 @@ class RunManager:
         print(f"Total number of tasks: {self.total_number_of_tasks}")
 
     def run_tasks(self):
-        """Runs the tasks using a pool of workers."""
+        """
+        Runs the tasks, keeping the tasks of each database on the same worker where possible.
+
+        With several workers, tasks are scheduled by database with work stealing; a single worker
+        processes the tasks grouped by database.
+        """
         print(f"Running tasks with {self.args.num_workers} workers.")
         if self.args.num_workers > 1:
-            with Pool(self.args.num_workers) as pool:
-                for task in self.tasks:
-                    pool.apply_async(self.worker, args=(task,), callback=self.task_done)
-                pool.close()
-                pool.join()
+            run_with_locality(self.tasks, self.args.num_workers, self.worker, self._locality_task_done)
         else:
-            for task in self.tasks:
+            first_index = {}
+            for index, task in enumerate(self.tasks):
+                first_index.setdefault(task.db_id, index)
+            for task in sorted(self.tasks, key=lambda task: first_index[task.db_id]):
                 log = self.worker(task)
                 self.task_done(log)
+        self.dump_cache_stats()
+
+    def _locality_task_done(self, task: Task, log: Optional[Tuple[Any, str, int, Dict[str, int]]]):
+        if log is not None:
+            self.task_done(log)
+
+    def preload_database(self) -> None:
+        """Loads the indexes the configured tools use into the current database manager."""
+        database_manager = DatabaseManager()
+        retriever_tools = self.args.config.get("team_agents", {}).get("information_retriever", {}).get("tools") or {}
+        if "retrieve_entity" in retriever_tools:
+            if (retriever_tools["retrieve_entity"] or {}).get("value_index") == "ngram":
+                database_manager.set_ngram_index()
+            else:
+                database_manager.set_lsh()
+        if "retrieve_context" in retriever_tools:
+            database_manager.set_vector_db()
 
-    def worker(self, task: Task) -> Tuple[Any, str, int]:
+    def worker(self, task: Task) -> Tuple[Any, str, int, Dict[str, int]]:
         """
         Worker function to process a single task.
         
@@ -109,26 +132,35 @@ class RunManager:
             task (Task): The task to be processed.
         
         Returns:
-            tuple: The state of the task processing and task identifiers.
+            tuple: The state of the task processing, task identifiers and the task's cache statistics.
         """
         print(f"Initializing task: {task.db_id} {task.question_id}")
-        DatabaseManager(db_mode=self.args.data_mode, db_id=task.db_id)
-        logger = Logger(db_id=task.db_id, question_id=task.question_id, result_directory=self.result_directory)
-        logger._set_log_level(self.args.log_level)
-        logger.log(f"Processing task: {task.db_id} {task.question_id}", "info")
-
-        team = build_team(self.args.config)
-        thread_id = f"{self.args.run_start_time}_{task.db_id}_{task.question_id}"
-        thread_config = {"configurable": {"thread_id": thread_id}}
-        state_values =  SystemState(task=task, 
-                                    tentative_schema=DatabaseManager().get_db_schema(), 
-                                    execution_history=[])
-        thread_config["recursion_limit"] = 50
-        for state_dict in team.stream(state_values, thread_config, stream_mode="values"):
-            logger.log("________________________________________________________________________________________")
-            continue
+        result_cache = get_result_cache()
+        result_cache_hits, result_cache_misses = result_cache.hits, result_cache.misses
+        index_hit = (self.args.data_mode, task.db_id) in DatabaseManager._instances
+        with DatabaseManager.use(self.args.data_mode, task.db_id):
+            self.preload_database()
+            logger = Logger(db_id=task.db_id, question_id=task.question_id, result_directory=self.result_directory)
+            logger._set_log_level(self.args.log_level)
+            logger.log(f"Processing task: {task.db_id} {task.question_id}", "info")
+
+            team = build_team(self.args.config)
+            thread_id = f"{self.args.run_start_time}_{task.db_id}_{task.question_id}"
+            thread_config = {"configurable": {"thread_id": thread_id}}
+            state_values =  SystemState(task=task, 
+                                        tentative_schema=DatabaseManager().get_db_schema(), 
+                                        execution_history=[])
+            thread_config["recursion_limit"] = 50
+            for state_dict in team.stream(state_values, thread_config, stream_mode="values"):
+                logger.log("________________________________________________________________________________________")
+                continue
         system_state = SystemState(**state_dict)
-        return system_state, task.db_id, task.question_id
+        cache_stats = {
+            "index_hits": int(index_hit),
+            "result_cache_hits": result_cache.hits - result_cache_hits,
+            "result_cache_misses": result_cache.misses - result_cache_misses,
+        }
+        return system_state, task.db_id, task.question_id, cache_stats
 
     def pick_final_sql(self, state: SystemState):
         """
@@ -190,16 +222,20 @@ class RunManager:
         state.execution_history.append(final_validation_result)
         Logger().dump_history_to_file(state.execution_history)
 
-    def task_done(self, log: Tuple[SystemState, str, int]):
+    def task_done(self, log: Tuple[SystemState, str, int, Dict[str, int]]):
         """
         Callback function when a task is done.
         
         Args:
             log (tuple): The log information of the task processing.
         """
-        state, db_id, question_id = log
+        state, db_id, question_id, cache_stats = log
         if state is None:
             return
+        database_cache_stats = self.cache_stats.setdefault(db_id, {"tasks": 0, "index_hits": 0, "result_cache_hits": 0, "result_cache_misses": 0})
+        database_cache_stats["tasks"] += 1
+        for key, value in cache_stats.items():
+            database_cache_stats[key] += value
         for step in state.execution_history:
             if "tool_name" in step and step["tool_name"] == "evaluation":
                 validation_result = step
@@ -215,6 +251,19 @@ class RunManager:
         self.processed_tasks += 1
         self.plot_progress()
 
+    def dump_cache_stats(self):
+        """Writes the per-database index and execution result cache hit rates to the result directory."""
+        report = {}
+        for db_id, stats in self.cache_stats.items():
+            result_cache_lookups = stats["result_cache_hits"] + stats["result_cache_misses"]
+            report[db_id] = {
+                **stats,
+                "index_hit_rate": stats["index_hits"] / stats["tasks"] if stats["tasks"] else 0.0,
+                "result_cache_hit_rate": stats["result_cache_hits"] / result_cache_lookups if result_cache_lookups else 0.0,
+            }
+        with open(os.path.join(self.result_directory, "-cache_stats.json"), 'w') as f:
+            json.dump(report, f, indent=4)
+
     def plot_progress(self, bar_length: int = 100):
         """
         Plots the progress of task processing.
@@ -0,0 +1,159 @@
+import logging
+import multiprocessing
+from queue import Empty
+from collections import deque, OrderedDict
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from runner.task import Task
+
+WORKER_POLL_INTERVAL = 5
+
+class LocalityScheduler:
+    """
+    Assigns tasks to workers so that each worker keeps working on the same database.
+
+    Every worker has a home database and receives its tasks while any are left. A worker whose
+    database ran out moves to the unclaimed database with the most remaining tasks, and once every
+    database with remaining tasks is claimed it steals from the one with the most tasks per worker,
+    so a dominant database is shared instead of leaving workers idle.
+
+    Attributes:
+        pending (OrderedDict[str, Deque[Task]]): The remaining tasks of each database.
+        home (Dict[int, str]): The database each worker is currently working on.
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.pending: "OrderedDict[str, Deque[Task]]" = OrderedDict()
+        for task in tasks:
+            self.pending.setdefault(task.db_id, deque()).append(task)
+        self.home: Dict[int, str] = {}
+        self._owners: Dict[str, Set[int]] = {db_id: set() for db_id in self.pending}
+
+    def next_task(self, worker_id: int) -> Optional[Task]:
+        """
+        Picks the next task of a worker.
+
+        Args:
+            worker_id (int): The worker asking for work.
+
+        Returns:
+            Optional[Task]: The task to run, or None if no tasks are left.
+        """
+        db_id = self.home.get(worker_id)
+        if db_id is None or not self.pending.get(db_id):
+            db_id = self._choose_database()
+            if db_id is None:
+                return None
+            self._move(worker_id, db_id)
+        task = self.pending[db_id].popleft()
+        if not self.pending[db_id]:
+            del self.pending[db_id]
+        return task
+
+    def _choose_database(self) -> Optional[str]:
+        if not self.pending:
+            return None
+        unclaimed = [db_id for db_id in self.pending if not self._owners[db_id]]
+        if unclaimed:
+            return max(unclaimed, key=lambda db_id: len(self.pending[db_id]))
+        return max(self.pending, key=lambda db_id: len(self.pending[db_id]) / len(self._owners[db_id]))
+
+    def _move(self, worker_id: int, db_id: str) -> None:
+        previous = self.home.get(worker_id)
+        if previous is not None:
+            self._owners[previous].discard(worker_id)
+        self.home[worker_id] = db_id
+        self._owners[db_id].add(worker_id)
+
+    def release(self, worker_id: int) -> None:
+        """Forgets a worker that stopped."""
+        previous = self.home.pop(worker_id, None)
+        if previous is not None:
+            self._owners[previous].discard(worker_id)
+
+def _worker_loop(worker_id: int, run_task: Callable[[Task], Any], task_queue: multiprocessing.Queue,
+                 result_queue: multiprocessing.Queue) -> None:
+    """
+    Runs the tasks sent to a worker until it receives None.
+
+    Args:
+        worker_id (int): The worker's identifier.
+        run_task (Callable[[Task], Any]): The function that processes one task.
+        task_queue (multiprocessing.Queue): The queue the worker's tasks arrive on.
+        result_queue (multiprocessing.Queue): The queue the (worker_id, task, result) tuples are sent on.
+    """
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        try:
+            result = run_task(task)
+        except Exception as e:
+            logging.error(f"Task {task.db_id} {task.question_id} failed: {e}")
+            result = None
+        result_queue.put((worker_id, task, result))
+
+def run_with_locality(tasks: List[Task], num_workers: int, run_task: Callable[[Task], Any],
+                      task_done: Callable[[Task, Any], None]) -> None:
+    """
+    Runs tasks on worker processes scheduled by `LocalityScheduler`.
+
+    Tasks are handed out one at a time, so a worker that finishes early can immediately take over
+    part of another database's tasks. A worker that dies is replaced and its task is reported as
+    failed. Workers are not daemonic, so each can start its own SQL executor pool; they are
+    terminated if this function exits with an error.
+
+    Args:
+        tasks (List[Task]): The tasks to run.
+        num_workers (int): The number of worker processes.
+        run_task (Callable[[Task], Any]): The function that processes one task in a worker.
+        task_done (Callable[[Task, Any], None]): Called in this process with each task and its result,
+            which is None if the task failed.
+    """
+    scheduler = LocalityScheduler(tasks)
+    result_queue = multiprocessing.Queue()
+    workers: Dict[int, multiprocessing.Process] = {}
+    task_queues: Dict[int, multiprocessing.Queue] = {}
+    running: Dict[int, Task] = {}
+
+    def _start_worker(worker_id: int) -> None:
+        task_queues[worker_id] = multiprocessing.Queue()
+        workers[worker_id] = multiprocessing.Process(
+            target=_worker_loop, args=(worker_id, run_task, task_queues[worker_id], result_queue)
+        )
+        workers[worker_id].start()
+
+    def _dispatch(worker_id: int) -> None:
+        task = scheduler.next_task(worker_id)
+        if task is None:
+            scheduler.release(worker_id)
+            task_queues[worker_id].put(None)
+        else:
+            running[worker_id] = task
+            task_queues[worker_id].put(task)
+
+    try:
+        for worker_id in range(num_workers):
+            _start_worker(worker_id)
+            _dispatch(worker_id)
+        while running:
+            try:
+                worker_id, task, result = result_queue.get(timeout=WORKER_POLL_INTERVAL)
+            except Empty:
+                for worker_id, task in list(running.items()):
+                    if not workers[worker_id].is_alive():
+                        logging.error(f"Worker {worker_id} died while running {task.db_id} {task.question_id}, restarting it")
+                        del running[worker_id]
+                        task_done(task, None)
+                        _start_worker(worker_id)
+                        _dispatch(worker_id)
+                continue
+            del running[worker_id]
+            task_done(task, result)
+            _dispatch(worker_id)
+    except BaseException:
+        for process in workers.values():
+            process.terminate()
+        raise
+    for process in workers.values():
+        process.join()
@@ -0,0 +1,150 @@
+import difflib
+import numpy as np
+from typing import List, Sequence
+
+WORD_BITS = 64
+MAX_CHUNK_BITS = 1 << 24
+A_PADDING = np.uint32(0xFFFFFFFF)
+B_PADDING = np.uint32(0xFFFFFFFE)
+
+def _codes(strings: Sequence[str], length: int, padding: np.uint32) -> np.ndarray:
+    """Returns the (len(strings), length) matrix of the strings' code points, padded with `padding`."""
+    codes = np.full((len(strings), length), padding, dtype=np.uint32)
+    lengths = np.array([len(string) for string in strings], dtype=np.int64)
+    rows = np.repeat(np.arange(len(strings)), lengths)
+    positions = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    codes[rows, positions] = np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32)
+    return codes
+
+def _add_words(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Adds two (num_pairs, num_words) little-endian multi-word integers, dropping the final carry."""
+    result = np.empty_like(x)
+    carry = np.zeros(len(x), dtype=np.uint64)
+    for word in range(x.shape[1]):
+        partial = x[:, word] + y[:, word]
+        total = partial + carry
+        carry = ((partial < x[:, word]) | (total < partial)).astype(np.uint64)
+        result[:, word] = total
+    return result
+
+def _chunk_lcs_lengths(a: Sequence[str], b: Sequence[str]) -> np.ndarray:
+    """Computes the LCS lengths of one chunk of pairs whose `a` strings are the longer ones."""
+    a_lengths = np.array([len(string) for string in a], dtype=np.int64)
+    num_words = max(1, -(-int(a_lengths.max(initial=0)) // WORD_BITS))
+    a_codes = _codes(a, num_words * WORD_BITS, A_PADDING)
+    b_codes = _codes(b, max((len(string) for string in b), default=0), B_PADDING)
+    # match_words[p, j] has bit i set where a[p][i] == b[p][j]; padding never matches.
+    matches = a_codes[:, None, :] == b_codes[:, :, None]
+    match_words = np.packbits(matches, axis=-1, bitorder="little").view(np.uint64)
+    v = np.full((len(a), num_words), np.uint64(0xFFFFFFFFFFFFFFFF), dtype=np.uint64)
+    for j in range(b_codes.shape[1]):
+        u = v & match_words[:, j]
+        v = _add_words(v, u) | (v ^ u)
+    # The LCS length is the number of zero bits of V within the length of `a`.
+    a_mask = np.arange(num_words * WORD_BITS) < a_lengths[:, None]
+    ones = np.unpackbits(v.view(np.uint8), axis=-1, bitorder="little").astype(bool)
+    return a_lengths - np.count_nonzero(ones & a_mask, axis=1)
+
+def lcs_lengths(a: Sequence[str], b: Sequence[str]) -> np.ndarray:
+    """
+    Computes the length of the longest common subsequence of each pair (a[i], b[i]).
+
+    Uses the bit-parallel algorithm of Hyyrö (2004): the longer string of each pair is encoded as a
+    bit vector of one or more 64-bit words, and each character of the shorter string updates the
+    vectors of all pairs at once. Pairs are processed in chunks of similar lengths to bound memory.
+
+    Args:
+        a (Sequence[str]): The first strings.
+        b (Sequence[str]): The second strings, as many as the first.
+
+    Returns:
+        np.ndarray: The LCS length of each pair.
+    """
+    if len(a) != len(b):
+        raise ValueError(f"Expected as many first as second strings, got {len(a)} and {len(b)}")
+    longer = [x if len(x) >= len(y) else y for x, y in zip(a, b)]
+    shorter = [y if len(x) >= len(y) else x for x, y in zip(a, b)]
+    longer_words = np.array([len(string) for string in longer], dtype=np.int64) // WORD_BITS + 1
+    shorter_lengths = np.array([len(string) for string in shorter], dtype=np.int64)
+    order = np.lexsort((shorter_lengths, longer_words))
+    lengths = np.zeros(len(longer), dtype=np.int64)
+    start = 0
+    while start < len(order):
+        num_words = longer_words[order[start]]
+        # The chunk ends at the next word count or when its match bits exceed MAX_CHUNK_BITS.
+        end = start + int(np.searchsorted(longer_words[order[start:]], num_words, side="right"))
+        chunk_bits = np.arange(1, end - start + 1) * (shorter_lengths[order[start:end]] + 1) * num_words * WORD_BITS
+        end = start + max(1, int(np.searchsorted(chunk_bits, MAX_CHUNK_BITS, side="right")))
+        chunk = order[start:end]
+        lengths[chunk] = _chunk_lcs_lengths([longer[i] for i in chunk], [shorter[i] for i in chunk])
+        start = end
+    return lengths
+
+def lcs_ratios(a: Sequence[str], b: Sequence[str]) -> np.ndarray:
+    """
+    Computes 2 * LCS / (len(a[i]) + len(b[i])) for each pair, 1.0 for two empty strings.
+
+    This is the ratio `difflib.SequenceMatcher` reports when its matching blocks form a longest
+    common subsequence. `SequenceMatcher` finds its blocks greedily, so its ratio is never above it.
+
+    Args:
+        a (Sequence[str]): The first strings.
+        b (Sequence[str]): The second strings, as many as the first.
+
+    Returns:
+        np.ndarray: The ratio of each pair.
+    """
+    total_lengths = np.array([len(x) + len(y) for x, y in zip(a, b)], dtype=np.float64)
+    lengths = lcs_lengths(a, b)
+    return np.divide(2.0 * lengths, total_lengths, out=np.ones(len(total_lengths)), where=total_lengths > 0)
+
+def sequence_matcher_ratios(a: Sequence[str], b: Sequence[str], threshold: float) -> np.ndarray:
+    """
+    Computes `difflib.SequenceMatcher(None, a[i], b[i]).ratio()` for the pairs that can reach a threshold.
+
+    The LCS ratios of all pairs are computed at once and bound the `SequenceMatcher` ratios from
+    above, so only the pairs whose bound reaches the threshold are scored with `difflib`. Comparing
+    the result with the threshold therefore gives exactly the same decisions as `difflib` alone.
+    Pairs whose lengths alone rule out the threshold are skipped before computing the LCS.
+
+    Args:
+        a (Sequence[str]): The first strings.
+        b (Sequence[str]): The second strings, as many as the first.
+        threshold (float): The lowest ratio of interest.
+
+    Returns:
+        np.ndarray: The `difflib` ratio of each pair whose bound reaches the threshold, 0.0 for the others.
+    """
+    if len(a) != len(b):
+        raise ValueError(f"Expected as many first as second strings, got {len(a)} and {len(b)}")
+    ratios = np.zeros(len(a), dtype=np.float64)
+    a_lengths = np.array([len(string) for string in a], dtype=np.float64)
+    b_lengths = np.array([len(string) for string in b], dtype=np.float64)
+    total_lengths = a_lengths + b_lengths
+    length_bounds = np.divide(2.0 * np.minimum(a_lengths, b_lengths), total_lengths, out=np.ones(len(a)), where=total_lengths > 0)
+    pairs = np.flatnonzero(length_bounds >= threshold)
+    lcs_bounds = lcs_ratios([a[i] for i in pairs], [b[i] for i in pairs])
+    candidates: List[int] = pairs[lcs_bounds >= threshold].tolist()
+    for i in candidates:
+        ratios[i] = difflib.SequenceMatcher(None, a[i], b[i]).ratio()
+    return ratios
+
+def sequence_matcher_ratio_matrix(a: Sequence[str], b: Sequence[str], threshold: float) -> np.ndarray:
+    """
+    Computes `sequence_matcher_ratios` for every pair of a string of `a` and a string of `b`.
+
+    Args:
+        a (Sequence[str]): The first strings.
+        b (Sequence[str]): The second strings.
+        threshold (float): The lowest ratio of interest.
+
+    Returns:
+        np.ndarray: The (len(a), len(b)) matrix of ratios, 0.0 for the pairs that cannot reach the threshold.
+    """
+    # Duplicate strings are scored once.
+    unique_a = {string: i for i, string in enumerate(dict.fromkeys(a))}
+    unique_b = {string: i for i, string in enumerate(dict.fromkeys(b))}
+    pairs_a = [x for x in unique_a for _ in unique_b]
+    pairs_b = list(unique_b) * len(unique_a)
+    ratios = sequence_matcher_ratios(pairs_a, pairs_b, threshold).reshape(len(unique_a), len(unique_b))
+    return ratios[np.ix_([unique_a[x] for x in a], [unique_b[y] for y in b])]
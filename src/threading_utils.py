@@ -1,4 +1,5 @@
 import queue
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
 import logging
 
@@ -45,7 +46,8 @@ def ordered_concurrent_function_calls(call_list: list) -> list:
         for idx, call in enumerate(call_list):
             func = _threaded(call['function'])
             kwargs = call['kwargs']
-            executor.submit(func, thread_id=idx, result_queue=result_queue, **kwargs)
+            # Each call runs in a copy of the caller's context, so it sees the current DatabaseManager.
+            executor.submit(contextvars.copy_context().run, func, thread_id=idx, result_queue=result_queue, **kwargs)
 
     results = []
     while not result_queue.empty():
@@ -40,6 +40,7 @@ class Revise(Tool):
             SQL_id = self.tool_name + "_1"  
         state.SQL_meta_infos[SQL_id] = []
         request_list = []
+        SQLMetaInfo.execute_all(target_SQL_meta_infos)
         for SQL_meta_info in target_SQL_meta_infos:
             try:
                 execution_status = SQL_meta_info.execution_status
@@ -114,6 +115,7 @@ class Revise(Tool):
         key_to_check = list(state.SQL_meta_infos.keys())[-1]
         SQL_meta_infos = state.SQL_meta_infos[key_to_check]
         needs_fixing = False
+        SQLMetaInfo.execute_all(SQL_meta_infos)
         for SQL_meta_info in SQL_meta_infos:
             try:
                 execution_status = SQL_meta_info.execution_status
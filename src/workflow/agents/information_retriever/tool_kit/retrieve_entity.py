@@ -1,8 +1,6 @@
 import numpy as np
-import difflib
 from typing import List, Dict, Any, Tuple, Optional
 
-from langchain_google_vertexai import VertexAIEmbeddings
 from google.oauth2 import service_account
 from google.cloud import aiplatform
 import vertexai
@@ -20,18 +18,30 @@ if GCP_CREDENTIALS and GCP_PROJECT and GCP_REGION:
     )
     vertexai.init(project=GCP_PROJECT, location=GCP_REGION, credentials=service_account.Credentials.from_service_account_file(GCP_CREDENTIALS))
 
+from llm.embeddings import get_embedding_client
 from runner.database_manager import DatabaseManager
+from database_utils.db_catalog.preprocess import EMBEDDING_MODEL, EMBEDDING_PROVIDER
+from database_utils.db_catalog.column_embeddings import column_string
+from string_similarity import sequence_matcher_ratio_matrix, sequence_matcher_ratios
 from workflow.system_state import SystemState
 from workflow.agents.tool import Tool
 
 class RetrieveEntity(Tool):
     """
     Tool for retrieving entities and columns similar to given keywords from the question and hint.
+
+    Args:
+        value_index (str): The index candidate values are looked up in, "lsh" for the MinHash LSH or
+            "ngram" for the exact n-gram index. Defaults to "lsh".
     """
 
-    def __init__(self):
+    def __init__(self, value_index: str = "lsh"):
         super().__init__()
-        self.embedding_function = VertexAIEmbeddings(model="text-embedding-004")
+        if value_index not in ("lsh", "ngram"):
+            raise ValueError(f"Unknown value index: {value_index}")
+        self.value_index = value_index
+        # The question is embedded with the model the column embeddings were computed with.
+        self.embedding_function = get_embedding_client(model=EMBEDDING_MODEL, provider=EMBEDDING_PROVIDER)
         self.edit_distance_threshold = 0.3
         self.embedding_similarity_threshold = 0.6
         
@@ -111,6 +121,10 @@ class RetrieveEntity(Tool):
                     paranthesis_matches.append(found_string)
         return paranthesis_matches
 
+    def _normalize_column_name(self, name: str) -> str:
+        """Lowercases a keyword or column name and drops spaces, underscores and a trailing plural s."""
+        return name.lower().replace(" ", "").replace("_", "").rstrip("s")
+
     def _does_keyword_match_column(self, keyword: str, column_name: str, threshold: float = 0.9) -> bool:
         """
         Checks if a keyword matches a column name based on similarity.
@@ -123,10 +137,48 @@ class RetrieveEntity(Tool):
         Returns:
             bool: True if the keyword matches the column name, False otherwise.
         """
-        keyword = keyword.lower().replace(" ", "").replace("_", "").rstrip("s")
-        column_name = column_name.lower().replace(" ", "").replace("_", "").rstrip("s")
-        similarity = difflib.SequenceMatcher(None, column_name, keyword).ratio()
-        return similarity >= threshold
+        return bool(self._match_keywords_to_columns([keyword], [column_name], threshold)[0, 0])
+
+    def _match_keywords_to_columns(self, keywords: List[str], column_names: List[str], threshold: float = 0.9) -> np.ndarray:
+        """
+        Checks every keyword against every column name in one batch.
+
+        Args:
+            keywords (List[str]): The keywords to match.
+            column_names (List[str]): The column names to match against.
+            threshold (float, optional): The similarity threshold. Defaults to 0.9.
+
+        Returns:
+            np.ndarray: The (len(column_names), len(keywords)) boolean matrix of matches.
+        """
+        ratios = sequence_matcher_ratio_matrix(
+            [self._normalize_column_name(column_name) for column_name in column_names],
+            [self._normalize_column_name(keyword) for keyword in keywords],
+            threshold
+        )
+        return ratios >= threshold
+
+    def _embed_columns_and_question(self, table_columns: List[Tuple[str, str]], question_hint_string: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gets the embeddings of columns from the preprocessed column embeddings and embeds the question.
+
+        Args:
+            table_columns (List[Tuple[str, str]]): The (table, column) pairs to get the embeddings of.
+            question_hint_string (str): The question and hint.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The embedding of each column and the embedding of the question.
+        """
+        precomputed = DatabaseManager().get_column_embeddings()
+        rows = precomputed.rows() if precomputed is not None else {}
+        missing = [table_column for table_column in table_columns if table_column not in rows]
+        embeddings = self.embedding_function.embed_documents([column_string(*table_column) for table_column in missing] + [question_hint_string])
+        embedded = dict(zip(missing, embeddings[:-1]))
+        column_embeddings = np.array([
+            precomputed.embeddings[rows[table_column]] if table_column in rows else embedded[table_column]
+            for table_column in table_columns
+        ])
+        return column_embeddings, np.array(embeddings[-1])
 
     def _get_similar_column_names(self, keywords: str, question: str, hint: str) -> List[Tuple[str, str]]:
         """
@@ -154,31 +206,20 @@ class RetrieveEntity(Tool):
             if " " in keyword:
                 potential_column_names.extend(part.strip() for part in keyword.split())
         schema = DatabaseManager().get_db_schema()
-        
-        to_embed_strings = []
-
-        # Prepare the list of strings to embed
-        column_strings = [f"`{table}`.`{column}`" for table, columns in schema.items() for column in columns]
-        question_hint_string = f"{question} {hint}"
-
-        to_embed_strings.extend(column_strings)
-        to_embed_strings.append(question_hint_string)
-
-        # Get embeddings
-        embeddings = self.embedding_function.embed_documents(to_embed_strings)
+        table_columns = [(table, column) for table, columns in schema.items() for column in columns]
+        matches = self._match_keywords_to_columns(potential_column_names, [column for _, column in table_columns])
+        matched_columns = [table_columns[i] for i in np.flatnonzero(matches.any(axis=1))]
+        if not matched_columns:
+            return []
 
-        # Separate embeddings
-        column_embeddings = embeddings[:-1]  # All except the last one
-        question_hint_embedding = embeddings[-1]  # The last one
+        # Only the question and the columns without precomputed embeddings are embedded
+        column_embeddings, question_hint_embedding = self._embed_columns_and_question(matched_columns, f"{question} {hint}")
 
         # Compute similarities
         similar_column_names = []
-        for i, column_embedding in enumerate(column_embeddings):
-            table, column = column_strings[i].split('.')[0].strip('`'), column_strings[i].split('.')[1].strip('`')
-            for potential_column_name in potential_column_names:
-                if self._does_keyword_match_column(potential_column_name, column):
-                    similarity_score = np.dot(column_embedding, question_hint_embedding)
-                    similar_column_names.append((table, column, similarity_score))
+        for (table, column), column_embedding in zip(matched_columns, column_embeddings):
+            similarity_score = np.dot(column_embedding, question_hint_embedding)
+            similar_column_names.append((table, column, similarity_score))
 
         similar_column_names.sort(key=lambda x: x[2], reverse=True)
         table_column_pairs = list(set([(table, column) for table, column, _ in similar_column_names]))
@@ -251,10 +292,16 @@ class RetrieveEntity(Tool):
     
     def _get_similar_entities_via_LSH(self, substring_packets: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         similar_entities_via_LSH = []
-        for packet in substring_packets:
+        substrings = [packet["substring"] for packet in substring_packets]
+        if not substrings:
+            all_similar_values = []
+        elif self.value_index == "ngram":
+            all_similar_values = DatabaseManager().query_ngram_index_many(keywords=substrings, top_n=10)
+        else:
+            all_similar_values = DatabaseManager().query_lsh_many(keywords=substrings, signature_size=100, top_n=10)
+        for packet, unique_similar_values in zip(substring_packets, all_similar_values):
             keyword = packet["keyword"]
             substring = packet["substring"]
-            unique_similar_values = DatabaseManager().query_lsh(keyword=substring, signature_size=100, top_n=10)
             for table_name, column_values in unique_similar_values.items():
                 for column_name, values in column_values.items():
                     for value in values:
@@ -267,8 +314,12 @@ class RetrieveEntity(Tool):
     
     def _get_similar_entities_via_edit_distance(self, similar_entities_via_LSH: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         similar_entities_via_edit_distance_similarity = []
-        for entity_packet in similar_entities_via_LSH:
-            edit_distance_similarity = difflib.SequenceMatcher(None, entity_packet["substring"].lower(), entity_packet["similar_value"].lower()).ratio()
+        edit_distance_similarities = sequence_matcher_ratios(
+            [entity_packet["substring"].lower() for entity_packet in similar_entities_via_LSH],
+            [entity_packet["similar_value"].lower() for entity_packet in similar_entities_via_LSH],
+            self.edit_distance_threshold
+        )
+        for entity_packet, edit_distance_similarity in zip(similar_entities_via_LSH, edit_distance_similarities.tolist()):
             if edit_distance_similarity >= self.edit_distance_threshold:
                 entity_packet["edit_distance_similarity"] = edit_distance_similarity
                 similar_entities_via_edit_distance_similarity.append(entity_packet)
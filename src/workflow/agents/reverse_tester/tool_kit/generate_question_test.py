@@ -226,7 +226,7 @@ class GenerateQuestionTest(Tool):
         clusters: Dict[str, List[SQLMetaInfo]] = {}
         for query in candidate_queries:
             try:
-                result = str(query.execution_result) if isinstance(query.execution_result, str) else repr(query.execution_result)
+                result = query.execution_fingerprint(ordered=True)
             except Exception:
                 continue
             if result not in clusters:
@@ -57,6 +57,7 @@ class Evaluate(Tool):
             self.scores = [1]
             self.comparison_matrix = [[1]]
             return
+        SQLMetaInfo.execute_all(target_SQL_meta_infos)
         candidates_clusters = self.execution_based_clustering(target_SQL_meta_infos)
         formatted_candidates = ""
         for index, candidate_query in enumerate(target_SQL_meta_infos):
@@ -162,18 +163,11 @@ class Evaluate(Tool):
             sql_meta_info (SQLMetaInfo): The SQL meta information.
         """
         try:
-            execution_result = sql_meta_info.execution_result
-            if execution_result is None:
-                return "No results"
-            if not isinstance(execution_result, list):
-                execution_result = list(execution_result)
-            number_of_rows = len(execution_result)
+            execution_result, number_of_rows, _ = sql_meta_info.execution_result_head(20)
             if number_of_rows == 0:
                 number_of_columns = 0
             else:
                 number_of_columns = len(execution_result[0])
-            if number_of_rows > 20:
-                execution_result = execution_result[:20]
             formatted_result = (
                 f"Rows: {number_of_rows}, Columns: {number_of_columns}, Results:"
                 f" {execution_result}"
@@ -192,7 +186,7 @@ class Evaluate(Tool):
         clusters = {}
         for query in candidate_queries:
             try:
-                result = str(query.execution_result) if isinstance(query.execution_result, str) else repr(query.execution_result)
+                result = query.execution_fingerprint(ordered=True)
             except Exception:
                 continue
             if result not in clusters:
@@ -37,6 +37,7 @@ class GenerateUnitTest(Tool):
                 [sql_meta_info.SQL for sql_meta_info in target_SQL_meta_infos]
             )
         formatted_candidates = ""
+        SQLMetaInfo.execute_all(target_SQL_meta_infos)
         clusters = self.execution_based_clustering(target_SQL_meta_infos)
         self.candidates = target_SQL_meta_infos
         if len(clusters) == 1:
@@ -85,7 +86,7 @@ class GenerateUnitTest(Tool):
         exceptions = []
         for query in candidate_queries:
             try:
-                result = str(query.execution_result) if isinstance(query.execution_result, str) else repr(query.execution_result)
+                result = query.execution_fingerprint(ordered=True)
             except Exception as e:
                 exceptions.append(str(e))
                 continue
@@ -104,18 +105,11 @@ class GenerateUnitTest(Tool):
         Args:
             sql_meta_info (SQLMetaInfo): The SQL meta information.
         """
-        execution_result = sql_meta_info.execution_result
-        if execution_result is None:
-            return "No results"
-        if not isinstance(execution_result, list):
-            execution_result = list(execution_result)
-        number_of_rows = len(execution_result)
+        execution_result, number_of_rows, _ = sql_meta_info.execution_result_head(20)
         if number_of_rows == 0:
             number_of_columns = 0
         else:
             number_of_columns = len(execution_result[0])
-        if number_of_rows > 20:
-            execution_result = execution_result[:20]
         formatted_result = (
             f"Rows: {number_of_rows}, Columns: {number_of_columns}, Results:"
             f" {execution_result}"
@@ -1,11 +1,9 @@
 from pydantic import BaseModel, PrivateAttr
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Union
 
 from runner.database_manager import DatabaseManager
-from database_utils.execution import ExecutionStatus
-from func_timeout import func_timeout, FunctionTimedOut
-
-LAZY_RESULT_TOKEN = "$$$LAZY$$$"
+from database_utils.execution import ExecutionStatus, FetchBudget, CappedResult, QueryTooExpensiveError
+from database_utils.result_fingerprint import result_fingerprint
 
 class SQLMetaInfo(BaseModel):
     SQL: str
@@ -17,29 +15,116 @@ class SQLMetaInfo(BaseModel):
     feedbacks: List[str] = []
     needs_refinement: bool = False
     refinement_steps: List[str] = []
-    
+
     _execution_result: List[Any] = PrivateAttr(default=[])
+    _execution_row_count: int = PrivateAttr(default=0)
+    _execution_truncated: bool = PrivateAttr(default=False)
+    _execution_error: Exception = PrivateAttr(default=None)
+    _executed: bool = PrivateAttr(default=False)
     _execution_status: ExecutionStatus = PrivateAttr(default=None)
+    _execution_fingerprints: Dict[bool, str] = PrivateAttr(default={})
+
+    @staticmethod
+    def execute_all(sql_meta_infos: List["SQLMetaInfo"], timeout: int = 60) -> None:
+        """
+        Executes the SQL of every not yet executed SQLMetaInfo in one concurrent batch.
+
+        Candidates are triaged on the shadow database when one was built, so failing candidates
+        do not reach the full database.
+
+        Args:
+            sql_meta_infos (List[SQLMetaInfo]): The SQL meta infos to populate.
+            timeout (int): The maximum number of seconds the whole batch may take.
+        """
+        pending = [sql_meta_info for sql_meta_info in sql_meta_infos if not sql_meta_info._executed]
+        if not pending:
+            return
+        results = DatabaseManager().execute_many([sql_meta_info.SQL for sql_meta_info in pending], FetchBudget(), timeout,
+                                                 check_cost=True, triage=True)
+        for sql_meta_info, result in zip(pending, results):
+            if isinstance(result, Exception):
+                sql_meta_info._execution_error = result
+                sql_meta_info._executed = True
+            else:
+                sql_meta_info.execution_result = result
 
-    
     @property
     def execution_result(self) -> List[Any]:
-        if self._execution_result == []:
-            try:    
-                result = DatabaseManager().execute_sql(self.SQL, "all")
-            except FunctionTimedOut:
-                print("Timeout in execution_result")
-                result = []
-            self._execution_result = result
-            return result
-        elif self._execution_result == LAZY_RESULT_TOKEN:
-            return self._retrieve_lazy_result()
-        else:
-            return self._execution_result
-        
+        """
+        The rows of the execution result.
+
+        Only the leading rows that fit in the default `FetchBudget` are kept; `execution_row_count`
+        holds the true number of rows.
+        """
+        if not self._executed:
+            try:
+                self.execution_result = DatabaseManager().execute_sql(self.SQL, FetchBudget(), check_cost=True)
+            except Exception as e:
+                self._execution_error = e
+                self._executed = True
+        if self._execution_error is not None:
+            raise self._execution_error.with_traceback(None)
+        return self._execution_result
+
+    @property
+    def execution_row_count(self) -> int:
+        """The total number of rows of the execution result."""
+        self.execution_result
+        return self._execution_row_count
+
+    def execution_result_head(self, num_rows: int) -> CappedResult:
+        """
+        Returns the first rows of the execution result and its total row count.
+
+        If the SQL query was not executed yet, only the requested rows are fetched and the full
+        result is left to be fetched on demand.
+
+        Args:
+            num_rows (int): The number of rows to return.
+
+        Returns:
+            CappedResult: The first `num_rows` rows and the total row count.
+
+        Raises:
+            Exception: The error raised when executing the SQL query.
+        """
+        if not self._executed:
+            return DatabaseManager().execute_sql(self.SQL, FetchBudget(max_rows=num_rows), check_cost=True)
+        rows = self.execution_result[:num_rows]
+        return CappedResult(rows, self._execution_row_count, self._execution_row_count > len(rows))
+
+    def execution_fingerprint(self, ordered: bool = False) -> str:
+        """
+        Returns a 128-bit fingerprint of the execution result, computed once and stored.
+
+        Args:
+            ordered (bool): Whether the row order is part of the fingerprint.
+
+        Returns:
+            str: The fingerprint as a hex string.
+
+        Raises:
+            Exception: The error raised when executing the SQL query.
+        """
+        if ordered not in self._execution_fingerprints:
+            if not self._executed or self._execution_error is not None:
+                self.execution_result
+            if self._execution_truncated:
+                # Hash the rows while streaming them instead of materializing the whole result.
+                fetch = "ordered_fingerprint" if ordered else "fingerprint"
+                fingerprint, _ = DatabaseManager().execute_sql(self.SQL, fetch)
+            else:
+                fingerprint = result_fingerprint(self._execution_result, ordered)
+            self._execution_fingerprints[ordered] = fingerprint
+        return self._execution_fingerprints[ordered]
+
     @property
     def execution_status(self) -> ExecutionStatus:
         if self._execution_status is None:
+            if isinstance(self._execution_error, QueryTooExpensiveError):
+                return ExecutionStatus.EXCESSIVE_COST
+            if self._execution_error is not None:
+                return ExecutionStatus.SYNTACTICALLY_INCORRECT
             try:
                 result = self._execution_result
             except Exception:
@@ -48,22 +133,15 @@ class SQLMetaInfo(BaseModel):
         return self._execution_status
 
     @execution_result.setter
-    def execution_result(self, result: List[Any]):
-        # Customize the setter to store "lazy" if the result is too long
-        if self._is_too_long(result):
-            self._execution_result = LAZY_RESULT_TOKEN
+    def execution_result(self, result: Union[List[Any], CappedResult]):
+        if isinstance(result, CappedResult):
+            self._execution_result = result.rows
+            self._execution_row_count = result.row_count
+            self._execution_truncated = result.truncated
         else:
             self._execution_result = result
-
-    def _is_too_long(self, result: List[Any]) -> bool:
-        #TODO: customize this method's logic
-        return len(result) > 50000
-
-    def _retrieve_lazy_result(self) -> List[Any]:
-        try:    
-            result = DatabaseManager().execute_sql(self.SQL, "all")
-        except FunctionTimedOut:
-            print("Timeout in execution_result")
-            result = []
-        return result
-
+            self._execution_row_count = len(result)
+            self._execution_truncated = False
+        self._execution_fingerprints = {}
+        self._execution_error = None
+        self._executed = True